@@ -2,9 +2,16 @@ from pathlib import Path
 import os
 from datetime import timedelta
 
+from .database import database_settings
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
+# A few defaults below differ for the test suite (query budgets enforced, throttling off,
+# quieter logs). Set by `manage.py test`; other runners (pytest, a custom script) must export
+# DJANGO_TESTING=True themselves
+RUNNING_TESTS = os.getenv("DJANGO_TESTING", "False") == "True"
+
 # ---------------------------------------------------------------------
 # SECURITY SETTINGS
 # ---------------------------------------------------------------------
@@ -41,6 +48,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "product.instrumentation.InstrumentationMiddleware",  # Query count, DB/serializer time and latency of every request (first, so it times the others)
     "django.middleware.security.SecurityMiddleware",  # Security enhancements
     "django.contrib.sessions.middleware.SessionMiddleware",  # Manages sessions across requests
     "django.middleware.common.CommonMiddleware",  # Common HTTP middleware
@@ -74,12 +82,57 @@ WSGI_APPLICATION = "Ecommerce_api.wsgi.application"  # WSGI application entry po
 # DATABASE CONFIGURATION
 # ---------------------------------------------------------------------
 
-# Using SQLite for simplicity; suitable for development and small deployments
-DATABASES = {
+# Configured from the environment (see Ecommerce_api/database.py): DATABASE_URL for the
+# primary, DATABASE_REPLICA_URLS for read replicas, DATABASE_CONN_MAX_AGE for persistent
+# connections and DATABASE_POOL for PostgreSQL connection pooling.
+# Without any variable this is the SQLite file db.sqlite3, suitable for development
+# and small edge deployments
+
+# SQLite profile applied on every new connection. WAL lets readers run while a write is in
+# progress, synchronous=NORMAL is crash safe in WAL mode (only the last commits may be lost
+# on power failure), busy_timeout makes a writer wait for the lock instead of failing with
+# "database is locked", mmap and a bigger page cache spare read syscalls.
+# Order placement also starts its transactions with BEGIN IMMEDIATE (product/services.py).
+# WAL is stored in the database file and leaves -wal/-shm files next to it, so the db.sqlite3
+# committed with the project stays in the default rollback journal (and synchronous=FULL)
+# unless SQLITE_JOURNAL_MODE says otherwise; a DATABASE_URL database gets WAL
+SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL" if os.getenv("DATABASE_URL") else "DELETE")
+SQLITE_TUNING = {
+    "ENABLED": os.getenv("SQLITE_TUNING", "True") == "True",
+    "JOURNAL_MODE": SQLITE_JOURNAL_MODE,
+    "SYNCHRONOUS": os.getenv("SQLITE_SYNCHRONOUS", "NORMAL" if SQLITE_JOURNAL_MODE.upper() == "WAL" else "FULL"),
+    "BUSY_TIMEOUT": int(os.getenv("SQLITE_BUSY_TIMEOUT", 5000)),  # Milliseconds
+    "MMAP_SIZE": int(os.getenv("SQLITE_MMAP_SIZE", 256 * 1024 * 1024)),  # Bytes
+    "CACHE_SIZE": int(os.getenv("SQLITE_CACHE_SIZE", -64 * 1024)),  # Negative: KiB, i.e. 64 MiB
+}
+
+DATABASES, DATABASE_REPLICAS = database_settings(BASE_DIR, sqlite_tuning=SQLITE_TUNING)
+
+# Catalog reads (product, category and review endpoints) go to the replicas, everything
+# else to the primary (product/routing.py)
+DATABASE_ROUTERS = ["product.routing.PrimaryReplicaRouter"]
+
+# After a user writes (e.g. places an order), their reads stay on the primary for this many
+# seconds, longer than the replication lag, so they always see their own writes
+REPLICA_PIN_SECONDS = int(os.getenv("DATABASE_REPLICA_PIN_SECONDS", 10))
+
+# ---------------------------------------------------------------------
+# CACHE CONFIGURATION
+# ---------------------------------------------------------------------
+
+# Local memory by default; point the "catalog" alias at any Django cache backend
+# (memcached, redis, database...) to share the catalog cache between processes. With more
+# than one process this is required: the cache versions are how the processes tell each other
+# that the catalog changed, local memory only invalidates the process that made the write
+CACHES = {
     "default": {
-        "ENGINE": "django.db.backends.sqlite3",  # Database engine
-        "NAME": BASE_DIR / "db.sqlite3",  # Database file path
-    }
+        "BACKEND": os.getenv("CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"),
+        "LOCATION": os.getenv("CACHE_LOCATION", ""),
+    },
+    "catalog": {
+        "BACKEND": os.getenv("CATALOG_CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"),
+        "LOCATION": os.getenv("CATALOG_CACHE_LOCATION", "catalog"),
+    },
 }
 
 # ---------------------------------------------------------------------
@@ -131,10 +184,36 @@ MEDIA_ROOT = os.path.join(BASE_DIR, "media")  # Directory to store uploaded medi
 
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": [
-        "rest_framework_simplejwt.authentication.JWTAuthentication",  # Use JWT authentication
+        "product.authentication.FastJWTAuthentication",  # JWT authentication, resolves the user from the token claims
     ],
     "DEFAULT_PAGINATION_CLASS": "rest_framework.pagination.PageNumberPagination",  # Enable pagination
     "PAGE_SIZE": 10,  # Default number of items per page
+    # Token bucket throttles (product/throttling.py): a client may burst up to the number of
+    # requests of its rate, then gets one more each time a token refills
+    "DEFAULT_THROTTLE_CLASSES": [
+        "product.throttling.AnonBucketThrottle",  # Anonymous clients, per IP address
+        "product.throttling.UserBucketThrottle",  # Logged in users, per user
+        "product.throttling.ScopedBucketThrottle",  # Per-route rates of the views with a throttle_scope
+    ],
+    "DEFAULT_THROTTLE_RATES": {
+        "anon": os.getenv("THROTTLE_ANON_RATE", "300/min"),
+        "user": os.getenv("THROTTLE_USER_RATE", "1200/min"),
+        # Product and category endpoints: below "user" for logged in users, below "anon" for scrapers
+        "catalog": os.getenv("THROTTLE_CATALOG_RATE", "600/min"),
+        "catalog_anon": os.getenv("THROTTLE_CATALOG_ANON_RATE", "120/min"),
+        "token": os.getenv("THROTTLE_TOKEN_RATE", "10/min"),  # Login and token refresh
+        "export": os.getenv("THROTTLE_EXPORT_RATE", "5/min"),  # Whole table exports (/export/)
+    },
+    "NUM_PROXIES": int(os.getenv("NUM_PROXIES", 0)) or None,  # Proxies in front of the app, for the client IP
+}
+
+# Where the throttle buckets live: "local" (this process, fastest, limits are per process)
+# or "cache" (CACHE_ALIAS of CACHES, shared by the processes using that backend)
+THROTTLING = {
+    "ENABLED": os.getenv("THROTTLING_ENABLED", str(not RUNNING_TESTS)) == "True",  # The throttling tests turn it on
+    "STORE": os.getenv("THROTTLE_STORE", "local"),
+    "CACHE_ALIAS": os.getenv("THROTTLE_CACHE_ALIAS", "default"),
+    "EVICT_INTERVAL": 60,  # Seconds between two sweeps of the idle local buckets
 }
 
 # ---------------------------------------------------------------------
@@ -144,8 +223,27 @@ REST_FRAMEWORK = {
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(minutes=30),  # Access token lifespan
     "REFRESH_TOKEN_LIFETIME": timedelta(days=1),  # Refresh token lifespan
+    "TOKEN_OBTAIN_SERIALIZER": "product.authentication.ClaimsTokenObtainPairSerializer",  # Adds username/is_staff/is_active claims
     # Add other settings as needed
 }
+
+# How FastJWTAuthentication builds request.user (product/authentication.py).
+# The "claims" mode trusts the token until the user's revocation mark says otherwise, so every
+# process must read the marks written by the others: it is only the default when the
+# revocation cache is shared (not local memory), or in the single process of the test suite.
+# Otherwise the default is "cached", where another process sees a user change (is_staff
+# removed...) after at most CACHE_TTL seconds.
+JWT_REVOCATION_CACHE_ALIAS = os.getenv("JWT_REVOCATION_CACHE_ALIAS", "default")
+JWT_REVOCATION_CACHE_SHARED = CACHES[JWT_REVOCATION_CACHE_ALIAS]["BACKEND"] not in (
+    "django.core.cache.backends.locmem.LocMemCache",
+    "django.core.cache.backends.dummy.DummyCache",
+)
+JWT_USER_RESOLUTION = {
+    # "claims", "cached" or "database"
+    "MODE": os.getenv("JWT_USER_RESOLUTION", "claims" if JWT_REVOCATION_CACHE_SHARED or RUNNING_TESTS else "cached"),
+    "CACHE_TTL": int(os.getenv("JWT_USER_CACHE_TTL", 10)),  # Seconds a fully loaded user stays in the process cache
+    "REVOCATION_CACHE_ALIAS": JWT_REVOCATION_CACHE_ALIAS,  # Which entry of CACHES keeps the revocation marks
+}
 # ---------------------------------------------------------------------
 # SECURITY SETTINGS FOR PRODUCTION
 # ---------------------------------------------------------------------
@@ -172,6 +270,84 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"  # Default primary key fiel
 
 # Add any additional settings or third-party configurations below
 
+# Retry policy used by product.services.place_order when the database reports lock contention
+ORDER_PLACEMENT = {
+    "MAX_ATTEMPTS": int(os.getenv("ORDER_MAX_ATTEMPTS", 5)),  # Total tries before giving up
+    "BASE_DELAY": float(os.getenv("ORDER_BASE_DELAY", 0.01)),  # First backoff delay in seconds
+    "MAX_DELAY": float(os.getenv("ORDER_MAX_DELAY", 0.5)),  # Upper bound for a single backoff delay
+    "JITTER": True,  # Randomize delays so racing checkouts do not retry in lockstep
+}
+
+# Checkout holds (Reservation, see product/services.py)
+RESERVATIONS = {
+    "TTL": int(os.getenv("RESERVATION_TTL", 600)),  # Seconds a hold keeps its units before it expires
+    "SWEEP_INTERVAL": int(os.getenv("RESERVATION_SWEEP_INTERVAL", 30)),  # Seconds between two expiry sweeps
+    "SWEEP_BATCH_SIZE": 500,  # Expired holds released per transaction
+    # Sweep in a daemon thread of every web process instead of (or on top of) the
+    # expire_reservations command
+    "SWEEPER_THREAD": os.getenv("RESERVATION_SWEEPER_THREAD", "False") == "True",
+}
+
+# Transactional outbox for the side effects of an order (OutboxEvent, see product/outbox.py and workers.py)
+OUTBOX = {
+    "WORKERS": int(os.getenv("OUTBOX_WORKERS", 4)),  # Handler threads of a worker pool
+    "BATCH_SIZE": 100,  # Events claimed per query
+    "POLL_INTERVAL": float(os.getenv("OUTBOX_POLL_INTERVAL", 1.0)),  # Seconds an idle pool waits before polling again
+    # Seconds a claimed event stays hidden from the other workers; the events of a worker
+    # that died come back after it (at-least-once delivery)
+    "LEASE": int(os.getenv("OUTBOX_LEASE", 60)),
+    "MAX_ATTEMPTS": int(os.getenv("OUTBOX_MAX_ATTEMPTS", 8)),  # Failed attempts before an event is dead
+    "RETRY_BASE_DELAY": 2.0,  # First retry delay in seconds, doubled at every attempt
+    "RETRY_MAX_DELAY": 600.0,  # Upper bound for a single retry delay
+    "METRICS_INTERVAL": 60,  # Seconds between two metrics lines of a running pool
+    # Run a worker pool in every web process instead of (or on top of) the run_outbox_worker command
+    "WORKER_THREADS": os.getenv("OUTBOX_WORKER_THREADS", "False") == "True",
+    "LOW_STOCK_THRESHOLD": int(os.getenv("LOW_STOCK_THRESHOLD", 5)),  # Units left that trigger a stock alert
+}
+
+# Read-through cache for product list and detail responses (product/cache.py)
+CATALOG_CACHE = {
+    "ENABLED": os.getenv("CATALOG_CACHE_ENABLED", "True") == "True",
+    "ALIAS": "catalog",  # Which entry of CACHES stores the responses
+    "TIMEOUT": int(os.getenv("CATALOG_CACHE_TIMEOUT", 300)),  # Seconds an entry may live
+    # Seconds before the in-process category registry is reloaded even without invalidation,
+    # the bound on its staleness when the "catalog" cache is not shared between processes
+    "REGISTRY_MAX_AGE": int(os.getenv("CATEGORY_REGISTRY_MAX_AGE", 60)),
+}
+
+# Per-request instrumentation (product/instrumentation.py): Server-Timing header, one JSON
+# log line per request and the query budgets of the views, which fail the test suite
+INSTRUMENTATION = {
+    "ENABLED": os.getenv("INSTRUMENTATION_ENABLED", "True") == "True",
+    "SERVER_TIMING": os.getenv("INSTRUMENTATION_SERVER_TIMING", "True") == "True",  # Hide it from public clients if needed
+    "ENFORCE_QUERY_BUDGETS": os.getenv("ENFORCE_QUERY_BUDGETS", str(RUNNING_TESTS)) == "True",  # Raise instead of logging a warning
+}
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "formatters": {
+        "message": {"format": "%(message)s"},  # The instrumentation lines are already JSON
+    },
+    "handlers": {
+        "console": {"class": "logging.StreamHandler", "formatter": "message"},
+    },
+    "loggers": {
+        "product.instrumentation": {
+            "handlers": ["console"],
+            # Per-request lines at INFO, budget overruns at WARNING
+            "level": os.getenv("INSTRUMENTATION_LOG_LEVEL", "WARNING" if RUNNING_TESTS else "INFO"),
+            "propagate": False,
+        },
+        "product.outbox": {
+            "handlers": ["console"],
+            # Metrics lines and stock alerts at INFO/WARNING, failed handlers at ERROR
+            "level": os.getenv("OUTBOX_LOG_LEVEL", "ERROR" if RUNNING_TESTS else "INFO"),
+            "propagate": False,
+        },
+    },
+}
+
 # ---------------------------------------------------------------------
 # NOTE
 # ---------------------------------------------------------------------
@@ -7,6 +7,9 @@ import sys
 def main():
     """Run administrative tasks."""
     os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Ecommerce_api.settings')
+    # `manage.py test` turns on the test defaults of the settings (see RUNNING_TESTS there)
+    if sys.argv[1:2] == ['test']:
+        os.environ.setdefault('DJANGO_TESTING', 'True')
     try:
         from django.core.management import execute_from_command_line
     except ImportError as exc:
@@ -1,7 +1,31 @@
 from django.contrib import admin
-from .models import Product, Review, Order, Category
+from .models import Product, Review, Order, Category, OutboxEvent, Reservation
+
+
+# Review.__str__ and Order.__str__ read related rows, join them in the change list query
+@admin.register(Review)
+class ReviewAdmin(admin.ModelAdmin):
+    list_select_related = ("user", "product")
+
+
+@admin.register(Order)
+class OrderAdmin(admin.ModelAdmin):
+    list_select_related = ("user",)
+
+
+@admin.register(Reservation)
+class ReservationAdmin(admin.ModelAdmin):
+    list_display = ("id", "user", "product", "quantity", "status", "expires_at")
+    list_filter = ("status",)
+    list_select_related = ("user", "product")
+
+
+# dead events show why they failed, they can be retried by setting them back to pending
+@admin.register(OutboxEvent)
+class OutboxEventAdmin(admin.ModelAdmin):
+    list_display = ("id", "topic", "status", "attempts", "created_at", "available_at")
+    list_filter = ("status", "topic")
+
 
-admin.site.register(Review)
-admin.site.register(Order)
 admin.site.register(Product)
 admin.site.register(Category)
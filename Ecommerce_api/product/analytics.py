@@ -0,0 +1,126 @@
+from datetime import datetime, time
+
+from django.db.models import Count, F, Max, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import DailyCategorySales, DailyProductSales, Order
+from .outbox import ORDER_PLACED, handles
+from .services import write_transaction
+
+# Rows written per INSERT by the rebuild
+REBUILD_BATCH_SIZE = 1000
+
+
+# --------------------
+# INCREMENTAL UPDATE
+# --------------------
+@handles(ORDER_PLACED)
+def roll_up_order(payload):
+    """
+    Count a placed order in the daily sales of its product and of the product's category.
+    Runs in an outbox worker, in the transaction that deletes the event, so checkout never
+    waits for it. The rolled_up flag of the order is set first: when it was already set (the
+    event was delivered again, or rebuild_sales_rollups counted the order) nothing is added.
+    """
+    if not Order.objects.filter(pk=payload["order"], rolled_up=False).update(rolled_up=True):
+        return
+    category_id = Order.objects.filter(pk=payload["order"]).values_list("product__category_id", flat=True).first()
+    day = timezone.localdate(datetime.fromisoformat(payload["ordered_at"]))
+    units, revenue = payload["quantity"], payload["line_total"]
+    DailyProductSales.objects.add_sale(day, units, revenue, product_id=payload["product"])
+    DailyCategorySales.objects.add_sale(day, units, revenue, category_id=category_id)
+
+
+# --------------------
+# BATCH REBUILD
+# --------------------
+def rebuild_sales_rollups(since=None):
+    """
+    Recompute the daily sales from the orders, for the days from `since` on (every day by
+    default): in one transaction the rollup rows of those days are deleted, rebuilt with one
+    GROUP BY query per table, and their orders flagged as counted. Needed to backfill, and
+    after orders were changed or deleted by staff or created without the order services.
+    Sales go to the current category of each product.
+
+    The orders counted are fixed before anything is grouped: the ones up to the highest order
+    id at the start, flagged first, and the GROUP BY queries read the flagged ones only. An
+    order placed while the rebuild runs is neither flagged nor counted, its ORDER_PLACED
+    event counts it: no order is counted twice or lost.
+    Returns the number of (product rows, category rows) written.
+    """
+    orders = Order.objects.order_by()
+    product_rows = DailyProductSales.objects.all()
+    category_rows = DailyCategorySales.objects.all()
+    if since is not None:
+        orders = orders.filter(ordered_at__gte=timezone.make_aware(datetime.combine(since, time.min)))
+        product_rows = product_rows.filter(day__gte=since)
+        category_rows = category_rows.filter(day__gte=since)
+
+    totals = {"units": Sum("quantity"), "revenue": Sum("line_total"), "orders": Count("id")}
+    with write_transaction():
+        max_id = orders.aggregate(max_id=Max("id"))["max_id"] or 0
+        orders = orders.filter(id__lte=max_id)
+        orders.filter(rolled_up=False).update(rolled_up=True)
+        by_day = orders.filter(rolled_up=True).annotate(day=TruncDate("ordered_at"))
+        product_rows.delete()
+        category_rows.delete()
+        written = (
+            _insert(DailyProductSales, by_day.values("day", "product_id").annotate(**totals)),
+            _insert(DailyCategorySales, by_day.values("day", category_id=F("product__category_id")).annotate(**totals)),
+        )
+    return written
+
+
+def _insert(model, rows):
+    batch, written = [], 0
+    for row in rows.iterator(chunk_size=REBUILD_BATCH_SIZE):
+        batch.append(model(**row))
+        if len(batch) == REBUILD_BATCH_SIZE:
+            written += len(model.objects.bulk_create(batch))
+            batch = []
+    if batch:
+        written += len(model.objects.bulk_create(batch))
+    return written
+
+
+# --------------------
+# REPORTS
+# --------------------
+# Both reports read the rollup tables only: a year of a product is 365 rows on its
+# (product, day) index whatever the number of orders, and the orders table is never scanned.
+TOTALS = {"units": Sum("units"), "revenue": Sum("revenue"), "orders": Sum("orders")}
+
+
+def product_sales(start, end, product=None, category=None, totals=False):
+    """
+    Units, revenue and orders per product and day between start and end (inclusive), or per
+    product over the whole range (totals, best sellers first). `category` (a Category with its
+    path) keeps the products of the category and its subcategories.
+    """
+    rows = DailyProductSales.objects.filter(day__gte=start, day__lte=end)
+    if product is not None:
+        rows = rows.filter(product_id=product)
+    if category is not None:
+        rows = rows.filter(product__category__path__gte=category.path, product__category__path__lt=category.path[:-1] + "0")
+    if totals:
+        return rows.values("product_id", name=F("product__name")).annotate(**TOTALS).order_by("-revenue", "product_id")
+    return rows.values("day", "product_id", "units", "revenue", "orders", name=F("product__name")).order_by("day", "product_id")
+
+
+def category_sales(start, end, category=None, totals=False):
+    """
+    Units, revenue and orders per category and day between start and end (inclusive), or per
+    category over the whole range (totals). A category counts the sales of its own products.
+    With `category`, the rows are the sums of the category and all its subcategories instead:
+    per day, or a single row with totals.
+    """
+    rows = DailyCategorySales.objects.filter(day__gte=start, day__lte=end)
+    if category is not None:
+        subtree = rows.filter(category__path__gte=category.path, category__path__lt=category.path[:-1] + "0")
+        if totals:
+            return [{name: value or 0 for name, value in subtree.aggregate(**TOTALS).items()}]
+        return subtree.values("day").annotate(**TOTALS).order_by("day")
+    if totals:
+        return rows.values("category_id", name=F("category__name")).annotate(**TOTALS).order_by("-revenue", "category_id")
+    return rows.values("day", "category_id", "units", "revenue", "orders", name=F("category__name")).order_by("day", "category_id")
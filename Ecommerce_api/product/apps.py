@@ -1,6 +1,27 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class ProductConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'product'
+
+    def ready(self):
+        # Connect the signal handlers that keep the catalog cache fresh
+        from . import signals  # noqa: F401
+        # Install the query recorder of the instrumentation middleware on every new connection
+        from . import instrumentation  # noqa: F401
+        # Register the outbox event handlers
+        from . import outbox
+        from . import analytics  # noqa: F401
+
+        # Handle the outbox events from background threads when configured
+        if outbox.outbox_settings().get("WORKER_THREADS", False):
+            from .workers import OutboxWorkerPool
+
+            OutboxWorkerPool().start()
+        # Expire the checkout holds from a background thread when configured
+        if getattr(settings, "RESERVATIONS", {}).get("SWEEPER_THREAD", False):
+            from .services import ReservationSweeper
+
+            ReservationSweeper().start()
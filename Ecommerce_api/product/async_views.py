@@ -0,0 +1,195 @@
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import AnonymousUser
+from django.http import HttpResponse
+from django.views import View
+from django_filters import ModelChoiceFilter
+from django_filters.utils import translate_validation
+from rest_framework.exceptions import APIException, NotFound, Throttled
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from .authentication import FastJWTAuthentication
+from .categories import CategoryFilter, category_registry, parse_category_id
+from .fieldsets import ValuesListMixin
+from .instrumentation import serializer_timer
+from .models import Category, Product
+from .pagination import AsyncPageNumberPagination, KeysetPagination, KeysetPaginationMixin
+from .routing import replica_reads, replica_reads_for
+from .search import ProductSearchFilter
+from .serializers import PRODUCT_CARD_FIELDS, ProductValuesSerializer
+from .throttling import bucket_store, local_buckets
+from .views import ProductFilter
+
+
+# --------------------
+# ASYNC READ VIEWS
+# --------------------
+class AsyncReadView(View):
+    """
+    Base of the async-native read endpoints (GET only, mounted under /api/async/).
+
+    Under ASGI these views run on the event loop: the JWT is checked with
+    FastJWTAuthentication.aauthenticate (no query for claim tokens), and rows are read with the
+    async ORM, so a request waiting on the database does not hold a worker thread.
+    Like the catalog viewsets they read from the replicas (see product/routing.py) and are
+    rate limited by the DRF throttles (see product/throttling.py).
+    Responses and errors have the same JSON shape as the DRF viewsets; writes stay on the
+    viewsets at /api/.
+    """
+
+    http_method_names = ["get", "head", "options"]
+    query_budget = None  # Per HTTP method, see product/instrumentation.py
+    authentication = FastJWTAuthentication()
+    renderer = JSONRenderer()
+
+    async def get(self, request, pk=None):
+        self.request = Request(request)  # Only for query_params and the DRF helpers, nothing is parsed
+        try:
+            # Anonymous reads are allowed, but a bad token is rejected like on the viewsets
+            authenticated = await self.authentication.aauthenticate(request)
+            user = authenticated[0] if authenticated else None
+            self.request.user = user or AnonymousUser()
+            await self.check_throttles(self.request)
+            # The context is copied into the threads of the async ORM
+            with replica_reads(replica_reads_for(request, user)):
+                if pk is None:
+                    data = await self.list(self.request)
+                else:
+                    data = await self.retrieve(self.request, pk)
+        except APIException as exc:
+            return self.error(exc)
+        return self.render(data)
+
+    async def check_throttles(self, request):
+        """
+        Run the DRF throttles like APIView.check_throttles; the in-process bucket store is
+        only a dict lookup, a cache backend store is called from a thread.
+        """
+        in_process = bucket_store() is local_buckets
+        for throttle_class in api_settings.DEFAULT_THROTTLE_CLASSES:
+            throttle = throttle_class()
+            if in_process:
+                allowed = throttle.allow_request(request, self)
+            else:
+                allowed = await sync_to_async(throttle.allow_request)(request, self)
+            if not allowed:
+                raise Throttled(throttle.wait())
+
+    def render(self, data, status=200):
+        return HttpResponse(self.renderer.render(data), status=status, content_type="application/json")
+
+    def error(self, exc):
+        data = exc.detail if isinstance(exc.detail, (list, dict)) else {"detail": exc.detail}
+        response = self.render(data, status=exc.status_code)
+        if exc.status_code == 401:
+            response["WWW-Authenticate"] = self.authentication.authenticate_header(self.request)
+        if getattr(exc, "wait", None):
+            response["Retry-After"] = "%d" % exc.wait
+        return response
+
+    async def list(self, request):
+        raise NotImplementedError
+
+    async def retrieve(self, request, pk):
+        raise NotImplementedError
+
+
+async def afilter_queryset(filterset):
+    """
+    Validate a FilterSet like DjangoFilterBackend does (400 on bad values) and return its
+    queryset. Only ModelChoiceFilter values are checked with a query, so the validation goes
+    to a thread just when one of them is used. CategoryFilter values (?category=) are checked
+    against the category registry, which is refreshed first if a category changed; an id the
+    registry does not know is looked up in the database, in the thread as well. On the event
+    loop the validation uses the registry map fetched here (pinned), it can not reload it.
+    """
+    used = {name: field for name, field in filterset.filters.items() if name in filterset.data}
+    needs_query = any(isinstance(field, ModelChoiceFilter) for field in used.values())
+    category_ids = [parse_category_id(filterset.data[name]) for name, field in used.items() if isinstance(field, CategoryFilter)]
+    entries = None
+    if category_ids:
+        entries = await category_registry.aentries()
+        needs_query = needs_query or any(category_id not in entries for category_id in category_ids if category_id is not None)
+    if needs_query:
+        valid = await sync_to_async(filterset.is_valid)()
+    else:
+        with category_registry.pinned(entries):
+            valid = filterset.is_valid()
+    if not valid:
+        raise translate_validation(filterset.errors)
+    return filterset.qs
+
+
+class AsyncProductView(ValuesListMixin, KeysetPaginationMixin, AsyncReadView):
+    """
+    /api/async/products/ and /api/async/products/{id}/: the product list and detail of
+    ProductViewSet, with the same ProductFilter filters and ordering, ?search=, ?fields= and
+    ?view=card, and both paginations (page numbers or ?pagination=cursor).
+    """
+
+    queryset = Product.objects.order_by("name", "id")
+    filterset_class = ProductFilter
+    keyset_ordering = ("name", "id")
+    keyset_conflicting_params = ("search", "ordering")  # Relevance or ?ordering= order, not the key
+    values_serializer_class = ProductValuesSerializer
+    list_views = {"card": PRODUCT_CARD_FIELDS}
+    query_budget = {"get": 3}
+    throttle_scope = "catalog"
+
+    def get_paginator(self):
+        if self.uses_keyset_pagination():
+            return KeysetPagination(self.keyset_ordering)
+        return AsyncPageNumberPagination()
+
+    async def list(self, request):
+        # The category names of the rows: the registry is reloaded in a thread if needed, and the
+        # synchronous code below only reads the map pinned here, it never queries on the loop.
+        with category_registry.pinned(await category_registry.aentries()):
+            serializer = self.values_serializer_class(self.get_list_fields())
+        queryset = await afilter_queryset(
+            self.filterset_class(request.query_params, queryset=self.queryset, request=request)
+        )
+        queryset = ProductSearchFilter().filter_queryset(request, queryset, self)
+        columns = dict.fromkeys([*serializer.columns, *(f.lstrip("-") for f in self.keyset_ordering)])
+
+        paginator = self.get_paginator()
+        page = await paginator.apaginate_queryset(queryset.values(*columns), request, view=self)
+        entries = await category_registry.aresolve(
+            row["category_id"] for row in page if row.get("category_id") is not None
+        )
+        with category_registry.pinned(entries):
+            return paginator.get_paginated_response(serializer.serialize(page)).data
+
+    async def retrieve(self, request, pk):
+        with category_registry.pinned(await category_registry.aentries()):
+            serializer = self.values_serializer_class()
+        try:
+            row = await self.queryset.values(*serializer.columns).aget(pk=pk)
+        except Product.DoesNotExist:
+            raise NotFound("No Product matches the given query.")
+        entries = await category_registry.aresolve([row["category_id"]] if row["category_id"] is not None else [])
+        with serializer_timer(), category_registry.pinned(entries):
+            return serializer.to_representation(row)
+
+
+class AsyncCategoryView(AsyncReadView):
+    """
+    /api/async/categorys/ and /api/async/categorys/{id}/: the list and detail of CategoryViewSet.
+    """
+
+    queryset = Category.objects.order_by("id")
+    fields = ("id", "name", "parent", "path", "product_count")  # CategorySerializer fields, already JSON ready
+    query_budget = {"get": 2}
+    throttle_scope = "catalog"
+
+    async def list(self, request):
+        paginator = AsyncPageNumberPagination()
+        page = await paginator.apaginate_queryset(self.queryset.values(*self.fields), request, view=self)
+        return paginator.get_paginated_response(page).data
+
+    async def retrieve(self, request, pk):
+        try:
+            return await self.queryset.values(*self.fields).aget(pk=pk)
+        except Category.DoesNotExist:
+            raise NotFound("No Category matches the given query.")
@@ -0,0 +1,200 @@
+import copy
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+
+# Claims copied from the user into every token, enough to authorize most requests
+USER_CLAIMS = ("username", "is_staff", "is_active")
+CLAIMS_AT = "claims_at"  # when the user claims were captured (copied to refreshed access tokens, unlike iat)
+
+
+# --------------------
+# TOKENS
+# --------------------
+class ClaimsRefreshToken(RefreshToken):
+    """
+    Refresh token carrying the user claims. Access tokens created from it (at login or on
+    /api/token/refresh/) copy the claims, so requests can be authorized without loading the user.
+    """
+
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        for claim in USER_CLAIMS:
+            token[claim] = getattr(user, claim)
+        token[CLAIMS_AT] = int(time.time())
+        return token
+
+
+class ClaimsTokenObtainPairSerializer(TokenObtainPairSerializer):
+    """
+    Login serializer of /api/token/ (SIMPLE_JWT["TOKEN_OBTAIN_SERIALIZER"]) issuing claim tokens.
+    """
+
+    token_class = ClaimsRefreshToken
+
+
+# --------------------
+# USER CHANGES
+# --------------------
+def revoke_user_claims(user_id):
+    """
+    Record that the authorization flags of a user changed. Tokens whose claims are older
+    are not trusted anymore and the user is loaded from the database instead.
+    The mark lives in JWT_USER_RESOLUTION["REVOCATION_CACHE_ALIAS"]: processes sharing that
+    cache share revocations (the "claims" mode needs it shared, see settings), and it only
+    has to outlive the tokens issued before it.
+    """
+    lifetime = api_settings.REFRESH_TOKEN_LIFETIME.total_seconds()
+    revocation_cache().set(f"auth:revoked:{user_id}", time.time(), timeout=int(lifetime) + 60)
+    user_cache.evict(user_id)
+
+
+def claims_revoked_at(user_id):
+    return revocation_cache().get(f"auth:revoked:{user_id}")
+
+
+def revocation_cache():
+    return caches[getattr(settings, "JWT_USER_RESOLUTION", {}).get("REVOCATION_CACHE_ALIAS", "default")]
+
+
+# --------------------
+# IN-PROCESS USER CACHE
+# --------------------
+class UserCache:
+    """
+    Short-lived in-process cache of fully loaded users, for requests that need the real row
+    (tokens without claims, or claims that were revoked). Entries expire after TTL seconds and
+    are evicted at once in this process when the user changes (see signals.py); other
+    processes see the change after at most TTL seconds, or immediately through the revocation
+    mark when they share the revocation cache.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}
+
+    @property
+    def ttl(self):
+        return getattr(settings, "JWT_USER_RESOLUTION", {}).get("CACHE_TTL", 30)
+
+    def get(self, user_id):
+        with self._lock:
+            entry = self._entries.get(user_id)
+        if entry is None:
+            return None
+        user, expires, loaded_at = entry
+        revoked_at = claims_revoked_at(user_id)
+        if time.monotonic() > expires or (revoked_at and revoked_at >= loaded_at):
+            self.evict(user_id)
+            return None
+        # Every request gets its own copy, a view changing request.user must not leak into others
+        return copy.copy(user)
+
+    def set(self, user):
+        with self._lock:
+            self._entries[user.pk] = (user, time.monotonic() + self.ttl, time.time())
+
+    def evict(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+user_cache = UserCache()
+
+
+# --------------------
+# AUTHENTICATION
+# --------------------
+class FastJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication that avoids the auth_user SELECT on most requests.
+    The mode comes from settings.JWT_USER_RESOLUTION["MODE"]:
+
+    - "claims": build request.user from the token claims (id, username, is_staff, is_active).
+      The user is a real User instance with every other field deferred, so it works in
+      querysets and permission checks, and reading another field (email...) loads it lazily.
+      Tokens without claims, or whose claims were revoked, fall back to "cached".
+      Revocations only reach the other processes through a shared revocation cache, the
+      settings fall back to "cached" by default when it is local memory.
+    - "cached": load the user from the database and keep it in the in-process UserCache.
+    - "database": the plain simplejwt behaviour, one query per request.
+    """
+
+    @property
+    def mode(self):
+        return getattr(settings, "JWT_USER_RESOLUTION", {}).get("MODE", "cached")
+
+    def get_user(self, validated_token):
+        if self.mode == "database":
+            return super().get_user(validated_token)
+        if self.mode == "claims":
+            user = self.get_claims_user(validated_token)
+            if user is not None:
+                return user
+        return self.get_cached_user(validated_token)
+
+    async def aauthenticate(self, request):
+        """
+        authenticate() for the async views. Reading and checking the token and building a
+        claims user need no query; the fallbacks that load the user run in a thread.
+        """
+        header = self.get_header(request)
+        if header is None:
+            return None
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+        validated_token = self.get_validated_token(raw_token)
+
+        if self.mode == "claims":
+            user = self.get_claims_user(validated_token)
+            if user is not None:
+                return user, validated_token
+        return await sync_to_async(self.get_user)(validated_token), validated_token
+
+    def get_claims_user(self, validated_token):
+        """
+        Return a user built from the token claims, or None when the claims can not be trusted.
+        """
+        if any(claim not in validated_token for claim in USER_CLAIMS + (CLAIMS_AT,)):
+            return None
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        if user_id is None or api_settings.USER_ID_FIELD != "id":
+            return None
+        revoked_at = claims_revoked_at(user_id)
+        if revoked_at and revoked_at >= validated_token[CLAIMS_AT]:
+            return None
+        if not validated_token["is_active"]:
+            raise AuthenticationFailed("User is inactive", code="user_inactive")
+
+        # from_db marks every field that is not listed as deferred, like .only() would
+        fields = ["id", *USER_CLAIMS]
+        values = [int(user_id), *(validated_token[claim] for claim in USER_CLAIMS)]
+        return get_user_model().from_db(DEFAULT_DB_ALIAS, fields, values)
+
+    def get_cached_user(self, validated_token):
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        try:
+            user = user_cache.get(int(user_id)) if user_id is not None else None
+        except (TypeError, ValueError):
+            user = None
+        if user is None:
+            user = super().get_user(validated_token)
+            user_cache.set(copy.copy(user))
+        return user
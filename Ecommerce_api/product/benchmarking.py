@@ -0,0 +1,213 @@
+import random
+import threading
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import connection
+from django.utils import timezone
+
+from .models import Category, Order, Product, Review
+
+
+# Vocabulary for synthetic catalog text, small on purpose so words repeat like in a real catalog
+ADJECTIVES = ["steel", "wooden", "compact", "wireless", "classic", "organic", "portable", "smart",
+              "vintage", "heavy", "light", "premium", "eco", "mini", "pro", "ultra"]
+NOUNS = ["kettle", "lamp", "chair", "headphones", "backpack", "blender", "jacket", "speaker",
+         "watch", "tent", "mug", "keyboard", "bottle", "drill", "camera", "sofa"]
+FILLER = ["durable", "design", "for", "home", "outdoor", "use", "with", "warranty", "easy",
+          "clean", "gift", "travel", "daily", "quality", "soft", "fast", "quiet", "battery"]
+
+
+# Small helpers shared by the benchmark management commands
+
+
+def percentile(values, pct):
+    """
+    Return the pct-th percentile (0-100) of values using the nearest-rank method.
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[rank]
+
+
+def summarize(latencies, elapsed):
+    """
+    Build a result dict with throughput and latency percentiles (in milliseconds).
+    """
+    return {
+        "requests": len(latencies),
+        "elapsed_s": round(elapsed, 4),
+        "throughput": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+    }
+
+
+def run_concurrently(worker, threads):
+    """
+    Start `threads` threads running worker(index) at the same moment and wait for them.
+    Every thread closes its own database connection when it is done.
+    Returns the wall clock time in seconds.
+    """
+    barrier = threading.Barrier(threads)
+
+    def _target(index):
+        try:
+            barrier.wait()
+            worker(index)
+        finally:
+            connection.close()
+
+    pool = [threading.Thread(target=_target, args=(i,)) for i in range(threads)]
+    start = time.perf_counter()
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    return time.perf_counter() - start
+
+
+def seed_products(categories, count, batch_size=10000, stock=100, prefix="bench"):
+    """
+    Insert `count` synthetic products spread round-robin over `categories` with bulk_create,
+    in batches so memory stays flat. Names repeat every 1000 rows on purpose, so orderings
+    on name have plenty of ties, and descriptions are drawn from a fixed vocabulary with a
+    seeded generator so every run builds the same catalog. The category product counts are
+    adjusted once at the end. Returns the number of rows inserted.
+    """
+    rng = random.Random(count)
+    created = 0
+    while created < count:
+        size = min(batch_size, count - created)
+        Product.objects.bulk_create(
+            [
+                Product(
+                    name=_product_name(prefix, created + i),
+                    price=(created + i) % 500 + 0.99,
+                    image_url="https://example.com/bench.jpg",
+                    description=" ".join(rng.choices(FILLER + NOUNS, k=12)),
+                    stock_quantity=stock if (created + i) % 10 else 0,
+                    category=categories[(created + i) % len(categories)],
+                )
+                for i in range(size)
+            ],
+            batch_size=batch_size,
+        )
+        created += size
+    # bulk_create skipped the Product signals that keep Category.product_count
+    per_category, extra = divmod(count, len(categories))
+    Category.objects.add_product_counts(
+        {category.id: per_category + (index < extra) for index, category in enumerate(categories)},
+        {category.id: category.path for category in categories},
+    )
+    return created
+
+
+def seed_users(count, batch_size=10000, prefix="bench", password="bench-password"):
+    """
+    Insert `count` users named {prefix}-user-N with bulk_create. They all share one password
+    hash, computed once: hashing it per user would take longer than the whole insert.
+    Returns the number of rows inserted.
+    """
+    hashed = make_password(password)
+    created = 0
+    while created < count:
+        size = min(batch_size, count - created)
+        User.objects.bulk_create(
+            [
+                User(username=f"{prefix}-user-{created + i}", email=f"{prefix}-user-{created + i}@example.com", password=hashed)
+                for i in range(size)
+            ],
+            batch_size=batch_size,
+        )
+        created += size
+    return created
+
+
+def seed_orders(user_ids, products, count, batch_size=10000, days=365, seed=0):
+    """
+    Insert `count` orders of random users for random products, placed at random times over
+    the last `days` days, with bulk_create (stock is not taken, Order.save is skipped).
+    `products` is a list of (id, price) pairs, the price is captured on the order.
+    The generator is seeded, so the same arguments always build the same orders.
+    """
+    rng = random.Random(seed)
+    now = timezone.now()
+    span = days * 24 * 3600
+    created = 0
+    with explicit_timestamps(Order, "ordered_at"):
+        while created < count:
+            size = min(batch_size, count - created)
+            orders = []
+            for _ in range(size):
+                product_id, price = rng.choice(products)
+                quantity = rng.randint(1, 3)
+                orders.append(
+                    Order(
+                        user_id=rng.choice(user_ids),
+                        product_id=product_id,
+                        quantity=quantity,
+                        unit_price=price,
+                        line_total=price * quantity,
+                        ordered_at=now - timedelta(seconds=rng.randrange(span)),
+                    )
+                )
+            Order.objects.bulk_create(orders, batch_size=batch_size)
+            created += size
+    return created
+
+
+def seed_reviews(user_ids, product_ids, count, batch_size=10000, days=365, seed=0):
+    """
+    Insert `count` reviews like seed_orders does for orders. The review signals do not run,
+    so the product rating aggregates must be rebuilt afterwards (backfill_review_aggregates).
+    """
+    rng = random.Random(seed)
+    now = timezone.now()
+    span = days * 24 * 3600
+    created = 0
+    with explicit_timestamps(Review, "created_date"):
+        while created < count:
+            size = min(batch_size, count - created)
+            Review.objects.bulk_create(
+                [
+                    Review(
+                        user_id=rng.choice(user_ids),
+                        product_id=rng.choice(product_ids),
+                        rating=rng.choices([1, 2, 3, 4, 5], weights=[1, 1, 2, 4, 4])[0],
+                        comment=" ".join(rng.choices(FILLER, k=8)),
+                        created_date=now - timedelta(seconds=rng.randrange(span)),
+                    )
+                    for _ in range(size)
+                ],
+                batch_size=batch_size,
+            )
+            created += size
+    return created
+
+
+@contextmanager
+def explicit_timestamps(model, field_name):
+    """
+    Let bulk_create keep the given value of an auto_now_add field, so seeded rows can be
+    spread over time instead of all getting the current time.
+    """
+    field = model._meta.get_field(field_name)
+    field.auto_now_add = False
+    try:
+        yield
+    finally:
+        field.auto_now_add = True
+
+
+def _product_name(prefix, index):
+    number = index % 1000
+    adjective = ADJECTIVES[number % len(ADJECTIVES)]
+    noun = NOUNS[(number // len(ADJECTIVES)) % len(NOUNS)]
+    return f"{prefix} {adjective} {noun} {number:03d}"
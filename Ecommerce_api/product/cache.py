@@ -0,0 +1,274 @@
+import hashlib
+import math
+import threading
+import time
+from email.utils import formatdate, parsedate_to_datetime
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from rest_framework.response import Response
+
+
+# --------------------
+# CATALOG CACHE
+# --------------------
+class CatalogCache:
+    """
+    Read-through cache for catalog responses (product list and detail).
+
+    Entries are never deleted one by one. Every key embeds a catalog version number and a
+    write to Product or Category bumps that number, so all old entries become unreachable at
+    once and simply expire. The version lives in the cache backend itself, which means
+    processes sharing a backend (memcached, redis, database cache) also share invalidation.
+    The backend is any alias from settings.CACHES (CATALOG_CACHE["ALIAS"]).
+
+    Versions are kept per scope: "catalog" moves on any write that changes a product response,
+    "category" only on Category writes and on changes of the category product counts. Each
+    scope also remembers when it last moved, which is the Last-Modified of the responses built
+    from it.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def config(self):
+        return getattr(settings, "CATALOG_CACHE", {})
+
+    @property
+    def backend(self):
+        return caches[self.config.get("ALIAS", "default")]
+
+    @property
+    def enabled(self):
+        return self.config.get("ENABLED", True)
+
+    def _initialize(self, scope):
+        # Start from the current time in milliseconds, not from 1: if the backend loses the
+        # key, the new versions can not collide with ones handed out before (ETags)
+        now = time.time()
+        self.backend.add(f"{scope}:version", int(now * 1000), timeout=None)
+        self.backend.add(f"{scope}:modified", now, timeout=None)
+
+    def version(self, scope="catalog"):
+        """
+        Current version of the scope, created lazily the first time it is needed.
+        """
+        version = self.backend.get(f"{scope}:version")
+        if version is None:
+            self._initialize(scope)
+            version = self.backend.get(f"{scope}:version")
+        return version
+
+    def last_modified(self, scope="catalog"):
+        """
+        Unix time of the last write to the scope.
+        """
+        modified = self.backend.get(f"{scope}:modified")
+        if modified is None:
+            self._initialize(scope)
+            modified = self.backend.get(f"{scope}:modified")
+        return modified
+
+    def bump(self, scope="catalog"):
+        """
+        Invalidate every cached response of the scope by moving to a new version.
+        """
+        try:
+            self.backend.incr(f"{scope}:version")
+        except ValueError:  # The version key is missing (first write or evicted)
+            self._initialize(scope)
+            self.backend.incr(f"{scope}:version")
+        self.backend.set(f"{scope}:modified", time.time(), timeout=None)
+
+    def bump_on_commit(self, scope="catalog"):
+        """
+        Bump now and once more after the surrounding transaction commits.
+        The first bump keeps readers in this transaction fresh, the second one drops any
+        entry another request cached from the old rows while the transaction was open.
+        """
+        self.bump(scope)
+        transaction.on_commit(lambda: self.bump(scope))
+
+    def stock_changed(self, product_ids, availability_changed):
+        """
+        Orders and checkout holds move the stock of a few products, far more often than the
+        catalog is edited. The detail responses of those products move on their own
+        "stock:<id>" scope (see object_scope()); the whole catalog only when a product sold
+        out or came back, which changes the ?in_stock= pages. Until then the stock_quantity
+        of the list cards may be older than the last orders; order placement checks the real
+        stock anyway.
+        """
+        for product_id in product_ids:
+            self.bump_on_commit(f"stock:{product_id}")
+        if availability_changed:
+            self.bump_on_commit()
+
+    def object_scope(self, view):
+        """
+        The scope of the one object a detail response shows, for views with a
+        `catalog_object_scope` ("stock" for products), or None.
+        """
+        prefix = getattr(view, "catalog_object_scope", None)
+        pk = view.kwargs.get("pk")
+        if prefix is None or pk is None:
+            return None
+        return f"{prefix}:{pk}"
+
+    def response_version(self, view, scope="catalog"):
+        """
+        The version of the responses of the view: the one of the scope, and for a detail
+        response also the one of its object scope.
+        """
+        object_scope = self.object_scope(view)
+        if object_scope is None:
+            return self.version(scope)
+        return f"{self.version(scope)}.{self.version(object_scope)}"
+
+    def response_modified(self, view, scope="catalog"):
+        """
+        Unix time of the last write to the responses of the view (see response_version()).
+        """
+        object_scope = self.object_scope(view)
+        if object_scope is None:
+            return self.last_modified(scope)
+        return max(self.last_modified(scope), self.last_modified(object_scope))
+
+    def request_digest(self, request, view):
+        """
+        Digest of what makes a response differ inside one version: the view action, the
+        object id, the response format and every query parameter (ProductFilter fields,
+        page, page size...) in sorted order.
+        """
+        params = sorted(
+            (key, value)
+            for key in request.query_params
+            for value in request.query_params.getlist(key)
+        )
+        renderer = getattr(request, "accepted_renderer", None)
+        raw = repr((view.basename, view.action, view.kwargs.get("pk"), getattr(renderer, "format", None), params))
+        return hashlib.md5(raw.encode(), usedforsecurity=False).hexdigest()
+
+    def make_key(self, request, view):
+        return f"catalog:{self.response_version(view)}:{self.request_digest(request, view)}"
+
+    def get(self, key):
+        data = self.backend.get(key)
+        with self._lock:
+            if data is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return data
+
+    def set(self, key, data):
+        self.backend.set(key, data, timeout=self.config.get("TIMEOUT", 300))
+
+    def stats(self):
+        """
+        Hit/miss counters of this process.
+        """
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+            }
+
+    def reset_stats(self):
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+
+
+catalog_cache = CatalogCache()
+
+
+class CachedCatalogMixin:
+    """
+    Serves list and retrieve from the catalog cache.
+    Only successful responses are stored, and the X-Cache header tells whether the
+    response came from the cache (HIT) or from the database (MISS).
+    """
+
+    def _cached(self, handler, request, *args, **kwargs):
+        if not catalog_cache.enabled:
+            return handler(request, *args, **kwargs)
+
+        key = catalog_cache.make_key(request, self)
+        data = catalog_cache.get(key)
+        if data is not None:
+            response = Response(data)
+            response["X-Cache"] = "HIT"
+            return response
+
+        response = handler(request, *args, **kwargs)
+        if response.status_code == 200:
+            catalog_cache.set(key, response.data)
+        response["X-Cache"] = "MISS"
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self._cached(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self._cached(super().retrieve, request, *args, **kwargs)
+
+
+class ConditionalCatalogMixin:
+    """
+    Adds strong ETag and Last-Modified headers to list and retrieve, and answers
+    If-None-Match / If-Modified-Since with 304 Not Modified.
+    Both validators come from the version counter of the view's catalog_scope (see
+    CatalogCache), and for a detail response of its catalog_object_scope, so checking them
+    costs a cache read or two: no query, no serializer.
+    """
+
+    catalog_scope = "catalog"
+
+    def _validators(self, request):
+        version = catalog_cache.response_version(self, self.catalog_scope)
+        digest = catalog_cache.request_digest(request, self)
+        etag = '"{}"'.format(hashlib.md5(f"{version}:{digest}".encode(), usedforsecurity=False).hexdigest())
+        return etag, catalog_cache.response_modified(self, self.catalog_scope)
+
+    def _not_modified(self, request, etag, modified):
+        if_none_match = request.headers.get("If-None-Match")
+        if if_none_match is not None:
+            # If-None-Match wins over If-Modified-Since (RFC 9110)
+            return if_none_match.strip() == "*" or etag in [tag.strip() for tag in if_none_match.split(",")]
+        if_modified_since = request.headers.get("If-Modified-Since")
+        if if_modified_since:
+            try:
+                return modified <= parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError):
+                return False
+        return False
+
+    def _conditional(self, handler, request, *args, **kwargs):
+        etag, modified = self._validators(request)
+        if self._not_modified(request, etag, modified):
+            response = Response(status=304)
+        else:
+            response = handler(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+        response["ETag"] = etag
+        # HTTP dates have whole seconds: the write time is rounded up, and the date is only sent
+        # once that second is over. Sent earlier, a write later in the same second would share
+        # it and If-Modified-Since would answer 304 for the old content; meanwhile clients
+        # revalidate with the ETag
+        last_modified = math.ceil(modified)
+        if time.time() >= last_modified:
+            response["Last-Modified"] = formatdate(last_modified, usegmt=True)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self._conditional(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self._conditional(super().retrieve, request, *args, **kwargs)
@@ -0,0 +1,268 @@
+import contextvars
+import threading
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+
+from asgiref.sync import sync_to_async
+from django import forms
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+from django_filters import rest_framework as django_filters
+from rest_framework import serializers
+
+from .cache import catalog_cache
+from .instrumentation import cache_refill
+from .models import Category
+
+# Columns of a registry entry, in the order of Category's concrete fields
+ENTRY_FIELDS = ("id", "name", "parent_id", "path")
+
+
+class CategoryEntry(namedtuple("CategoryEntry", [*ENTRY_FIELDS, "has_children"])):
+    __slots__ = ()
+
+    def instance(self):
+        """
+        A Category built from the entry, as if read from the database: enough to assign a
+        product's category or compare paths. The product count is deferred. The instance is
+        flagged from_registry: the entry may be older than a move made by another process, so
+        the product count signals read the current path instead of trusting this one.
+        """
+        category = Category.from_db(DEFAULT_DB_ALIAS, ENTRY_FIELDS, [getattr(self, name) for name in ENTRY_FIELDS])
+        category.from_registry = True
+        return category
+
+
+# --------------------
+# CATEGORY REGISTRY
+# --------------------
+# Set by CategoryRegistry.pinned(): the map every lookup of the block uses, never reloaded
+_pinned_entries = contextvars.ContextVar("pinned_category_entries", default=None)
+
+
+class CategoryRegistry:
+    """
+    In-process copy of the category table: id -> CategoryEntry (name, parent, path and
+    whether the category has children), loaded with one query.
+
+    Category ids in query strings and request bodies are checked against it instead of a
+    SELECT per request (ProductFilter, ProductSerializer, CategorySerializer), and product
+    responses get the category name without a join. The registry follows the "category-registry"
+    version of the catalog cache, bumped on Category writes only (not on product count changes):
+    every access compares one cached number and the next access after a write reloads the table.
+
+    Only processes sharing the catalog cache backend share the invalidation: with the default
+    local memory backend a write made by another process is only seen when the copy gets older
+    than CATALOG_CACHE["REGISTRY_MAX_AGE"] seconds. Production deployments with more than one
+    process must point the "catalog" cache at a shared backend (memcached, redis...). An id
+    missing from the copy is looked up in the database before being refused (see get()).
+    """
+
+    scope = "category-registry"
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._loaded_at = 0.0
+        self._entries = {}
+
+    @staticmethod
+    def max_age():
+        return getattr(settings, "CATALOG_CACHE", {}).get("REGISTRY_MAX_AGE", 60)
+
+    def _is_stale(self, version):
+        return version != self._version or time.monotonic() - self._loaded_at > self.max_age()
+
+    def entries(self):
+        """
+        The current {id: CategoryEntry} map, reloaded first when a category changed or the
+        copy is older than the max age.
+        """
+        pinned = _pinned_entries.get()
+        if pinned is not None:
+            return pinned
+        version = catalog_cache.version(self.scope)
+        if self._is_stale(version):
+            self._load(version)
+        return self._entries
+
+    @contextmanager
+    def pinned(self, entries):
+        """
+        Make the lookups of the block use `entries` (a map from aentries()) as is: async code
+        can then validate on the event loop without the registry going stale and reloading
+        from the database meanwhile. Ids missing from it must be handled before (see aget()).
+        """
+        token = _pinned_entries.set(entries)
+        try:
+            yield
+        finally:
+            _pinned_entries.reset(token)
+
+    async def aentries(self):
+        """
+        entries() for async code: only the reload goes to a thread.
+        """
+        version = catalog_cache.version(self.scope)
+        if self._is_stale(version):
+            await sync_to_async(self._load)(version)
+        return self._entries
+
+    def _load(self, version, force=False):
+        with self._lock:
+            if not force and not self._is_stale(version):  # Another thread reloaded it meanwhile
+                return
+            with cache_refill():
+                rows = list(Category.objects.order_by().values_list(*ENTRY_FIELDS))
+            parents = {row[2] for row in rows}
+            # Swapped in one assignment, readers never see a half built map
+            self._entries = {row[0]: CategoryEntry(*row, row[0] in parents) for row in rows}
+            self._version = version
+            self._loaded_at = time.monotonic()
+
+    def get(self, category_id):
+        """
+        The entry of the category, or None when there is no such category. An id the copy does
+        not know costs one query: the category may come from a process whose invalidation did
+        not reach this one, and then the registry is reloaded.
+        """
+        entry = self.entries().get(category_id)
+        if entry is None and _pinned_entries.get() is not None:
+            return None  # Pinned: the map is all there is, no query (e.g. on the event loop)
+        if entry is None and category_id is not None and Category.objects.filter(pk=category_id).exists():
+            self._load(catalog_cache.version(self.scope), force=True)
+            entry = self._entries.get(category_id)
+        return entry
+
+    async def aget(self, category_id):
+        """
+        get() for async code: only the database lookup of an unknown id goes to a thread.
+        """
+        entry = (await self.aentries()).get(category_id)
+        if entry is None and category_id is not None:
+            entry = await sync_to_async(self.get)(category_id)
+        return entry
+
+    async def aresolve(self, category_ids):
+        """
+        For async code about to name the categories of some rows: look up the ids the copy
+        does not know in a thread, so the synchronous get() of the serializers needs no query.
+        Returns the map to pin while they run.
+        """
+        entries = await self.aentries()
+        missing = set(category_ids) - entries.keys()
+        for category_id in missing:
+            await self.aget(category_id)
+        return await self.aentries() if missing else entries
+
+    def choices(self):
+        """
+        (id, name) pairs sorted by name, for the browsable API forms.
+        """
+        return [(entry.id, entry.name) for entry in sorted(self.entries().values(), key=lambda entry: (entry.name, entry.id))]
+
+    def bump(self):
+        """
+        Invalidate the registry of every process (now and after the current transaction commits).
+        """
+        catalog_cache.bump_on_commit(self.scope)
+
+    def clear(self):
+        with self._lock:
+            self._version = None
+            self._loaded_at = 0.0
+            self._entries = {}
+
+
+category_registry = CategoryRegistry()
+
+
+def category_choices():
+    # A plain function: form fields are deep copied, a bound method would copy the registry
+    return category_registry.choices()
+
+
+def parse_category_id(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+# --------------------
+# FILTER
+# --------------------
+class CategoryChoiceField(forms.ChoiceField):
+    """
+    Form field of a category id, validated against the registry: the lookup is a dict get,
+    and the choices (the whole table) are only listed when a form is rendered.
+    Cleans to the CategoryEntry.
+    """
+
+    def __init__(self, **kwargs):
+        kwargs.pop("choices", None)
+        super().__init__(choices=category_choices, **kwargs)
+
+    def valid_value(self, value):
+        return category_registry.get(parse_category_id(value)) is not None
+
+    def clean(self, value):
+        value = super().clean(value)
+        if value in self.empty_values:
+            return None
+        return category_registry.get(parse_category_id(value))
+
+
+class CategoryFilter(django_filters.Filter):
+    """
+    ?category= filter backed by the category registry, the filter method receives a CategoryEntry.
+    """
+
+    field_class = CategoryChoiceField
+
+
+# --------------------
+# SERIALIZER FIELDS
+# --------------------
+class CategoryField(serializers.PrimaryKeyRelatedField):
+    """
+    Category id of a serializer, checked against the registry instead of a SELECT. The
+    validated value is a Category instance built from the registry entry.
+    """
+
+    def __init__(self, **kwargs):
+        if not kwargs.get("read_only"):
+            kwargs.setdefault("queryset", Category.objects.all())
+        super().__init__(**kwargs)
+
+    def to_internal_value(self, data):
+        if isinstance(data, bool):
+            self.fail("incorrect_type", data_type=type(data).__name__)
+        category_id = parse_category_id(data)
+        if category_id is None:
+            self.fail("incorrect_type", data_type=type(data).__name__)
+        entry = category_registry.get(category_id)
+        if entry is None:
+            self.fail("does_not_exist", pk_value=data)
+        return entry.instance()
+
+    def get_choices(self, cutoff=None):
+        choices = category_registry.choices()
+        if cutoff is not None:
+            choices = choices[:cutoff]
+        return dict(choices)
+
+
+class CategoryNameField(serializers.ReadOnlyField):
+    """
+    Name of the product category, read from the registry instead of a join.
+    """
+
+    def __init__(self, **kwargs):
+        kwargs.setdefault("source", "category_id")
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        entry = category_registry.get(value)
+        return entry.name if entry else None
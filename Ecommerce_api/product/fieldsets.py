@@ -0,0 +1,53 @@
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+
+
+class ValuesListMixin:
+    """
+    Serves the list action from queryset.values() rows and a values serializer (see
+    ProductValuesSerializer) instead of model instances and a ModelSerializer.
+
+    Clients shape the rows with two query parameters:
+    - ?fields=id,name,price returns only these fields (sparse fieldset), in this order;
+    - ?view=card returns a named field set from list_views, e.g. the compact product card.
+    Only the selected columns are read from the database (plus the pagination key), so a grid
+    page no longer ships every description. Filters, search and both paginations still apply.
+    """
+
+    values_serializer_class = None
+    list_views = {}
+    fields_query_param = "fields"
+    view_query_param = "view"
+
+    def get_list_fields(self):
+        """
+        Return the fields requested for the list, or None for the full representation.
+        """
+        available = self.values_serializer_class.available_fields()
+        requested = self.request.query_params.get(self.fields_query_param)
+        if requested:
+            fields = list(dict.fromkeys(name.strip() for name in requested.split(",") if name.strip()))
+            unknown = [name for name in fields if name not in available]
+            if unknown or not fields:
+                raise ValidationError(
+                    {self.fields_query_param: f"Unknown fields {', '.join(unknown)}; choose from {', '.join(available)}."}
+                )
+            return fields
+
+        view = self.request.query_params.get(self.view_query_param)
+        if view:
+            if view not in self.list_views:
+                raise ValidationError({self.view_query_param: f"Choose one of {', '.join(self.list_views)}."})
+            return list(self.list_views[view])
+        return None
+
+    def list(self, request, *args, **kwargs):
+        serializer = self.values_serializer_class(self.get_list_fields())
+        # Keyset pagination reads its cursor from the ordering fields of the last row
+        columns = dict.fromkeys([*serializer.columns, *(f.lstrip("-") for f in self.keyset_ordering)])
+        queryset = self.filter_queryset(self.get_queryset()).values(*columns)
+
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(serializer.serialize(page))
+        return Response(serializer.serialize(queryset))
@@ -0,0 +1,208 @@
+import csv
+import io
+import json
+from collections import defaultdict
+
+from django.core.exceptions import ValidationError
+from django.db import connection
+
+from .cache import catalog_cache
+from .models import Category, Product, path_ids
+from .services import write_transaction
+
+
+# Columns a supplier file may contain, besides the natural key (sku) and the category
+IMPORT_FIELDS = ("name", "price", "stock_quantity", "image_url", "description")
+REQUIRED_FIELDS = ("sku", "name", "price", "image_url", "description", "category")
+DEFAULTS = {"stock_quantity": 0}
+MAX_REPORTED_ERRORS = 1000
+UPDATE_COLUMNS = (*IMPORT_FIELDS, "category_id")
+# A category is named by its name, or by the names from the root down to it ("Phones > Accessories")
+# when several categories share the name
+CATEGORY_PATH_SEPARATOR = " > "
+
+
+def read_rows(stream, input_format):
+    """
+    Yield one dict per product from a binary or text stream, line by line, so the file is
+    never loaded in memory. input_format is "csv" (with a header line) or "ndjson".
+    """
+    if isinstance(stream.read(0), bytes):
+        stream = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    if input_format == "csv":
+        yield from csv.DictReader(stream)
+        return
+    for line in stream:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            row = None
+        yield row if isinstance(row, dict) else {"__invalid__": line}
+
+
+class ProductImporter:
+    """
+    Upserts products from supplier rows, matching existing products on sku.
+
+    Rows are validated one by one with the model field validators (no per-row query),
+    categories are resolved from dictionaries loaded up front (see resolve_category), and
+    every batch is written in its own transaction with one SELECT for the existing skus, one bulk_create
+    and one executemany UPDATE for the rows that actually changed (bulk_update builds a
+    CASE WHEN expression per row and column, which costs more in Python than the write
+    itself). A bad row is reported with its line number and skipped, it never
+    aborts the run. bulk_create and bulk_update bypass the model signals, so every batch
+    that wrote something invalidates the catalog cache when it commits (the search index
+    follows through its triggers) and adjusts the category product counts with one UPDATE.
+    """
+
+    def __init__(self, batch_size=1000, create_categories=False):
+        self.batch_size = batch_size
+        self.create_categories = create_categories
+        self.category_paths = {}
+        self.categories_by_name = defaultdict(list)  # name -> ids, more than one when the name is shared
+        self.categories_by_name_path = {}  # "Phones > Accessories" -> id
+        rows = list(Category.objects.order_by("path").values_list("id", "name", "path"))
+        names = {category_id: name for category_id, name, _ in rows}
+        for category_id, name, path in rows:
+            self.category_paths[category_id] = path
+            self.categories_by_name[name].append(category_id)
+            name_path = CATEGORY_PATH_SEPARATOR.join(names[ancestor] for ancestor in path_ids(path) if ancestor in names)
+            self.categories_by_name_path[name_path] = category_id
+        self.fields = {name: Product._meta.get_field(name) for name in IMPORT_FIELDS + ("sku",)}
+        self.report = {"processed": 0, "created": 0, "updated": 0, "unchanged": 0, "failed": 0, "errors": []}
+
+    def run(self, rows):
+        batch = {}
+        for line, row in enumerate(rows, start=1):
+            self.report["processed"] += 1
+            values = self.clean(line, row)
+            if values is None:
+                continue
+            batch[values["sku"]] = values  # The last row wins when a sku repeats
+            if len(batch) >= self.batch_size:
+                self.write(batch)
+                batch = {}
+        if batch:
+            self.write(batch)
+        return self.report
+
+    def error(self, line, errors):
+        self.report["failed"] += 1
+        if len(self.report["errors"]) < MAX_REPORTED_ERRORS:
+            self.report["errors"].append({"line": line, "errors": errors})
+
+    def clean(self, line, row):
+        """
+        Return the validated values of a row, or None after recording its errors.
+        """
+        if row is None or "__invalid__" in row:
+            self.error(line, {"row": ["Not a JSON object."]})
+            return None
+
+        row = {key: (value.strip() if isinstance(value, str) else value) for key, value in row.items() if key}
+        errors = {
+            name: ["This field is required."]
+            for name in REQUIRED_FIELDS
+            if row.get(name) in (None, "")
+        }
+
+        values = {}
+        for name, field in self.fields.items():
+            if name in errors:
+                continue
+            value = row.get(name)
+            if value in (None, ""):
+                value = DEFAULTS.get(name)
+            try:
+                values[name] = field.clean(value, None)
+            except ValidationError as exc:
+                errors[name] = exc.messages
+
+        if "category" not in errors:
+            category_id, error = self.resolve_category(row["category"])
+            if error:
+                errors["category"] = [error]
+            values["category_id"] = category_id
+
+        if errors:
+            self.error(line, errors)
+            return None
+        return values
+
+    def resolve_category(self, category):
+        """
+        Return (category id, None) for a category name or name path, or (None, error).
+        A plain name must belong to a single category; an unknown one is created at the top
+        level with create_categories.
+        """
+        if CATEGORY_PATH_SEPARATOR in category:
+            category_id = self.categories_by_name_path.get(category)
+            return (category_id, None) if category_id else (None, f"Unknown category {category!r}.")
+        ids = self.categories_by_name.get(category, [])
+        if len(ids) > 1:
+            example = CATEGORY_PATH_SEPARATOR.join(("Parent", category))
+            return None, f"Several categories are named {category!r}, give its path (e.g. {example!r})."
+        if ids:
+            return ids[0], None
+        if not self.create_categories:
+            return None, f"Unknown category {category!r}."
+        created = Category.objects.create(name=category)
+        self.categories_by_name[category].append(created.id)
+        self.categories_by_name_path[category] = created.id
+        self.category_paths[created.id] = created.path
+        return created.id, None
+
+    def write(self, batch):
+        # Reads then writes: take the SQLite write lock up front (see write_transaction)
+        with write_transaction():
+            existing = {
+                product.sku: product
+                for product in Product.objects.filter(sku__in=list(batch)).only(
+                    "id", "sku", "category_id", *IMPORT_FIELDS
+                )
+            }
+            new, changed = [], []
+            counts = defaultdict(int)  # Products in and out of each category, for Category.product_count
+            for sku, values in batch.items():
+                product = existing.get(sku)
+                if product is None:
+                    new.append(Product(**values))
+                    counts[values["category_id"]] += 1
+                elif any(getattr(product, name) != value for name, value in values.items()):
+                    if product.category_id != values["category_id"]:
+                        counts[product.category_id] -= 1
+                        counts[values["category_id"]] += 1
+                    for name, value in values.items():
+                        setattr(product, name, value)
+                    changed.append(product)
+            Product.objects.bulk_create(new, batch_size=self.batch_size)
+            self.update(changed)
+            Category.objects.add_product_counts(counts, self.category_paths)
+            if new or changed:
+                # Per committed batch: a later batch failing must not leave these rows behind a stale cache
+                catalog_cache.bump_on_commit()
+                catalog_cache.bump_on_commit("category")  # Product counts
+        self.report["created"] += len(new)
+        self.report["updated"] += len(changed)
+        self.report["unchanged"] += len(batch) - len(new) - len(changed)
+
+    def update(self, products):
+        if not products:
+            return
+        meta = Product._meta
+        columns = [meta.get_field(name) for name in UPDATE_COLUMNS]
+        sql = "UPDATE {} SET {} WHERE {} = %s".format(
+            connection.ops.quote_name(meta.db_table),
+            ", ".join(f"{connection.ops.quote_name(field.column)} = %s" for field in columns),
+            connection.ops.quote_name(meta.pk.column),
+        )
+        params = [
+            [field.get_db_prep_save(getattr(product, field.attname), connection) for field in columns]
+            + [product.pk]
+            for product in products
+        ]
+        with connection.cursor() as cursor:
+            cursor.executemany(sql, params)
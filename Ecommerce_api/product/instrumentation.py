@@ -0,0 +1,262 @@
+import contextvars
+import json
+import logging
+import time
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db.backends.signals import connection_created
+
+logger = logging.getLogger(__name__)
+
+# Metrics of the request being handled; the context is copied into the threads that run
+# sync code for an async request, and the object is shared, so every query is counted
+_current = contextvars.ContextVar("request_metrics", default=None)
+
+
+class QueryBudgetExceeded(AssertionError):
+    """
+    Raised (when budgets are enforced, i.e. in tests) by a request that ran more SQL
+    queries than the query_budget of its view allows.
+    """
+
+
+# --------------------
+# REQUEST METRICS
+# --------------------
+class RequestMetrics:
+    """
+    What one request cost: SQL queries and the time spent running them, time spent in the
+    serializers, and the total latency.
+    """
+
+    def __init__(self, keep_sql=False):
+        self.started = time.perf_counter()
+        self.view = None
+        self.budget = None
+        self.queries = 0
+        self.refill_queries = 0  # queries refilling an in-process cache, outside the budget
+        self._refilling = 0
+        self.db_time = 0.0
+        self.serializer_time = 0.0
+        self.sql = [] if keep_sql else None
+
+    def record_query(self, sql, elapsed):
+        self.queries += 1
+        if self._refilling:
+            self.refill_queries += 1
+        self.db_time += elapsed
+        if self.sql is not None:
+            self.sql.append(sql)
+
+    def as_dict(self, request, response):
+        return {
+            "method": request.method,
+            "path": request.path,
+            "view": self.view,
+            "status": response.status_code,
+            "queries": self.queries,
+            "refill_queries": self.refill_queries,
+            "query_budget": self.budget,
+            "db_ms": round(self.db_time * 1000, 3),
+            "serializer_ms": round(self.serializer_time * 1000, 3),
+            "total_ms": round((time.perf_counter() - self.started) * 1000, 3),
+        }
+
+
+def current_metrics():
+    return _current.get()
+
+
+def record_queries(execute, sql, params, many, context):
+    """
+    Database execute wrapper installed on every connection: times the query for the
+    request being instrumented, if any.
+    """
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.record_query(sql, time.perf_counter() - start)
+
+
+def install_query_recorder(sender, connection, **kwargs):
+    # connection_created fires again when the same wrapper reconnects
+    if record_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_queries)
+
+
+connection_created.connect(install_query_recorder)
+
+
+@contextmanager
+def serializer_timer():
+    """
+    Count the time spent in the block as serializer time of the current request.
+    """
+    metrics = _current.get()
+    if metrics is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.serializer_time += time.perf_counter() - start
+
+
+@contextmanager
+def cache_refill():
+    """
+    Mark the queries of the block as the refill of an in-process cache (e.g. the category
+    registry after a category write). They are counted and timed like the others but do not
+    count against the query budget, which describes the steady state of the view.
+    """
+    metrics = _current.get()
+    if metrics is None:
+        yield
+        return
+    metrics._refilling += 1
+    try:
+        yield
+    finally:
+        metrics._refilling -= 1
+
+
+# --------------------
+# QUERY BUDGETS
+# --------------------
+def query_budget(view_class, action):
+    """
+    The query budget of a view for one action (viewset action, or the HTTP method for plain
+    views). `query_budget` on the view is either a number for every action or a dict keyed by
+    action, with "*" as the fallback. None means no budget.
+    """
+    budget = getattr(view_class, "query_budget", None)
+    if isinstance(budget, dict):
+        return budget.get(action, budget.get("*"))
+    return budget
+
+
+class InstrumentedViewMixin:
+    """
+    Viewset mixin timing its serializers for the instrumentation middleware.
+    Viewsets also declare their `query_budget` here, see query_budget().
+    """
+
+    query_budget = None
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        if _current.get() is not None:
+            # Only the outermost serializer is timed, nested fields are part of its time
+            to_representation = serializer.to_representation
+
+            def timed(instance):
+                with serializer_timer():
+                    return to_representation(instance)
+
+            serializer.to_representation = timed
+        return serializer
+
+
+# --------------------
+# MIDDLEWARE
+# --------------------
+class InstrumentationMiddleware:
+    """
+    Records, for every request, the view and action that handled it, the number of SQL
+    queries, DB time, serializer time and total latency (settings.INSTRUMENTATION).
+
+    - The numbers go out in a Server-Timing header (shown by browser dev tools) and in one
+      JSON log line per request on the "product.instrumentation" logger.
+    - A request running more queries than the query_budget of its view is logged as a
+      warning, or fails with QueryBudgetExceeded when ENFORCE_QUERY_BUDGETS is on (tests).
+      Queries refilling an in-process cache (see cache_refill()) are left out of the budget.
+
+    Streaming responses (exports) run most of their queries after the middleware returns,
+    their numbers only cover the start of the response and they have no budget.
+    Works under WSGI and ASGI; keep it first in MIDDLEWARE so the latency covers the others.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    @property
+    def config(self):
+        return getattr(settings, "INSTRUMENTATION", {})
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not self.config.get("ENABLED", True):
+            return self.get_response(request)
+        metrics = RequestMetrics(keep_sql=self.config.get("ENFORCE_QUERY_BUDGETS", False))
+        token = _current.set(metrics)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, metrics)
+
+    async def __acall__(self, request):
+        if not self.config.get("ENABLED", True):
+            return await self.get_response(request)
+        metrics = RequestMetrics(keep_sql=self.config.get("ENFORCE_QUERY_BUDGETS", False))
+        token = _current.set(metrics)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, metrics)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        metrics = _current.get()
+        if metrics is None:
+            return None
+        # DRF viewsets keep their class and method -> action map on the view function
+        view_class = getattr(view_func, "cls", None) or getattr(view_func, "view_class", None)
+        if view_class is None:
+            metrics.view = getattr(view_func, "__name__", None)
+            return None
+        actions = getattr(view_func, "actions", None) or {}
+        action = actions.get(request.method.lower(), request.method.lower())
+        metrics.view = f"{view_class.__name__}.{action}"
+        metrics.budget = query_budget(view_class, action)
+        return None
+
+    def finish(self, request, response, metrics):
+        record = metrics.as_dict(request, response)
+        if response.streaming:
+            record["streaming"] = True
+        elif self.config.get("SERVER_TIMING", True):
+            response["Server-Timing"] = (
+                f'db;dur={record["db_ms"]};desc="{metrics.queries} queries", '
+                f'serializer;dur={record["serializer_ms"]}, total;dur={record["total_ms"]}'
+            )
+
+        over_budget = (
+            not response.streaming
+            and metrics.budget is not None
+            and metrics.queries - metrics.refill_queries > metrics.budget
+        )
+        if over_budget:
+            logger.warning(json.dumps({"event": "query_budget_exceeded", **record}))
+            if self.config.get("ENFORCE_QUERY_BUDGETS", False):
+                statements = "\n".join(f"  {sql}" for sql in metrics.sql)
+                raise QueryBudgetExceeded(
+                    f"{metrics.view} ran {metrics.queries} queries, its budget is {metrics.budget}:\n{statements}"
+                )
+        else:
+            logger.info(json.dumps({"event": "request", **record}))
+        return response
@@ -0,0 +1,53 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Sum
+
+from product.cache import catalog_cache
+from product.models import Product, Review
+
+
+class Command(BaseCommand):
+    """
+    Recomputes rating_count, rating_sum and rating_avg of every product from the reviews.
+    Works in batches of product ids (walking the primary key, no OFFSET), one transaction
+    and one aggregate query per batch, so it can run on a live database.
+    """
+
+    help = "Recompute the denormalized review aggregates of products in batches"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        last_id = 0
+        updated = 0
+        while True:
+            ids = list(
+                Product.objects.filter(id__gt=last_id).order_by("id").values_list("id", flat=True)[:batch_size]
+            )
+            if not ids:
+                break
+            updated += self._backfill(ids)
+            last_id = ids[-1]
+            self.stdout.write(f"Processed products up to id {last_id}")
+
+        catalog_cache.bump()
+        self.stdout.write(self.style.SUCCESS(f"Updated review aggregates of {updated} products"))
+
+    def _backfill(self, ids):
+        with transaction.atomic():
+            totals = {
+                row["product"]: row
+                for row in Review.objects.filter(product_id__in=ids)
+                .values("product")
+                .annotate(count=Count("id"), total=Sum("rating"))
+            }
+            products = list(Product.objects.select_for_update().filter(id__in=ids).only("id"))
+            for product in products:
+                row = totals.get(product.id)
+                product.rating_count = row["count"] if row else 0
+                product.rating_sum = row["total"] if row else 0
+                product.rating_avg = product.rating_sum / product.rating_count if row else 0.0
+            Product.objects.bulk_update(products, ["rating_count", "rating_sum", "rating_avg"])
+            return len(products)
@@ -0,0 +1,190 @@
+import asyncio
+import io
+import json
+import multiprocessing
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand
+from django.core.wsgi import get_wsgi_application
+from django.db import connection
+from django.db.backends.signals import connection_created
+from django.test import override_settings
+
+from product.benchmarking import seed_products, summarize
+from product.models import Category
+
+
+class Command(BaseCommand):
+    """
+    Load test of the catalog reads under WSGI workers and under ASGI, in process and
+    without sockets, so only the Django side is measured:
+
+    - wsgi: the DRF viewset behind WSGIHandler, served by --workers forked processes handling
+      one request at a time (like gunicorn sync workers); a worker is blocked while it waits
+      on the database;
+    - asgi_sync: the same viewset behind ASGIHandler (one process), which runs it in a thread;
+    - asgi_async: the async view (/api/async/products/) behind ASGIHandler (one process).
+
+    In every scenario --concurrency clients send the requests, and latencies are measured
+    on the client side.
+
+    Every query sleeps --db-latency ms to simulate a remote or busy database. The catalog
+    cache is disabled during the run, every request goes to the database.
+    """
+
+    help = "Compare requests/sec and p99 of WSGI workers and ASGI on a slow-database workload"
+
+    category_name = "bench-asgi"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=1000, help="Products seeded for the run")
+        parser.add_argument("--requests", type=int, default=500, help="Requests per scenario")
+        parser.add_argument("--workers", type=int, default=4, help="WSGI worker processes")
+        parser.add_argument("--concurrency", type=int, default=64, help="Clients sending requests in a loop")
+        parser.add_argument("--db-latency", type=float, default=50.0, help="Added latency per query (ms)")
+        parser.add_argument("--json", action="store_true", help="Print the results as JSON")
+
+    def handle(self, *args, **options):
+        Category.objects.filter(name=self.category_name).delete()
+        category = Category.objects.create(name=self.category_name)
+        seed_products([category], options["rows"])
+        path = "/api/products/"
+        query = f"category={category.id}&page=2"
+
+        delay = options["db_latency"] / 1000
+
+        def slow_database(execute, sql, params, many, context):
+            time.sleep(delay)
+            return execute(sql, params, many, context)
+
+        def add_latency(sender, connection, **kwargs):
+            # Fires on every reconnect of the same wrapper (connections close after each request)
+            if slow_database not in connection.execute_wrappers:
+                connection.execute_wrappers.append(slow_database)
+
+        connection.close()  # Every thread opens its own connection, with the wrapper
+        connection_created.connect(add_latency)
+        try:
+            with override_settings(CATALOG_CACHE={"ENABLED": False}):
+                results = {
+                    "wsgi": self._run_wsgi(path, query, options),
+                    "asgi_sync": self._run_asgi(path, query, options),
+                    "asgi_async": self._run_asgi("/api/async/products/", query, options),
+                }
+        finally:
+            connection_created.disconnect(add_latency)
+            connection.close()
+            category.delete()
+
+        if options["json"]:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        for name, result in results.items():
+            self.stdout.write(
+                f"{name:>10}: {result['throughput']} req/s, p50 {result['p50_ms']} ms, "
+                f"p99 {result['p99_ms']} ms, errors {result['errors']}"
+            )
+
+    def _run_wsgi(self, path, query, options):
+        # --concurrency clients share the --workers processes, so like behind a real server a
+        # request may first wait for a free worker; that wait is part of its latency
+        with multiprocessing.get_context("fork").Pool(options["workers"]) as pool:
+
+            def client(_):
+                start = time.perf_counter()
+                ok = pool.apply(_wsgi_request, [(path, query)])
+                return time.perf_counter() - start, ok
+
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=options["concurrency"]) as clients:
+                outcomes = list(clients.map(client, range(options["requests"])))
+        return self._result(outcomes, time.perf_counter() - started)
+
+    def _run_asgi(self, path, query, options):
+        application = get_asgi_application()
+
+        async def request():
+            scope = {
+                "type": "http",
+                "asgi": {"version": "3.0"},
+                "http_version": "1.1",
+                "method": "GET",
+                "scheme": "http",
+                "path": path,
+                "raw_path": path.encode(),
+                "query_string": query.encode(),
+                "headers": [(b"host", b"localhost")],
+                "server": ("localhost", 80),
+                "client": ("127.0.0.1", 50000),
+            }
+            status = []
+            body_sent = False
+            finished = asyncio.Event()
+
+            async def receive():
+                nonlocal body_sent
+                if not body_sent:
+                    body_sent = True
+                    return {"type": "http.request", "body": b"", "more_body": False}
+                # Like a server, only report the disconnect once the response is complete
+                await finished.wait()
+                return {"type": "http.disconnect"}
+
+            async def send(message):
+                if message["type"] == "http.response.start":
+                    status.append(message["status"])
+                elif not message.get("more_body"):
+                    finished.set()
+
+            start = time.perf_counter()
+            await application(scope, receive, send)
+            return time.perf_counter() - start, status[0] == 200
+
+        async def main():
+            semaphore = asyncio.Semaphore(options["concurrency"])
+
+            async def limited():
+                async with semaphore:
+                    return await request()
+
+            return await asyncio.gather(*(limited() for _ in range(options["requests"])))
+
+        started = time.perf_counter()
+        outcomes = asyncio.run(main())
+        return self._result(outcomes, time.perf_counter() - started)
+
+    def _result(self, outcomes, elapsed):
+        latencies = [latency for latency, _ in outcomes]
+        return {**summarize(latencies, elapsed), "errors": sum(not ok for _, ok in outcomes)}
+
+
+_wsgi_application = None
+
+
+def _wsgi_request(target):
+    """
+    Serve one GET through WSGIHandler inside a worker process.
+    """
+    global _wsgi_application
+    if _wsgi_application is None:
+        connection.close()  # Never share the parent's connection
+        _wsgi_application = get_wsgi_application()
+
+    path, query = target
+    environ = {
+        "REQUEST_METHOD": "GET",
+        "PATH_INFO": path,
+        "QUERY_STRING": query,
+        "SERVER_NAME": "localhost",
+        "SERVER_PORT": "80",
+        "wsgi.url_scheme": "http",
+        "wsgi.input": io.BytesIO(),
+        "wsgi.errors": io.StringIO(),
+    }
+    status = []
+    response = _wsgi_application(environ, lambda code, headers: status.append(code))
+    b"".join(response)
+    response.close()
+    return status[0].startswith("200")
@@ -0,0 +1,68 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand
+from django.test import Client
+
+from product.benchmarking import seed_products, summarize
+from product.models import Category
+
+ENDPOINTS = ["/api/products/", "/api/products/?page=2", "/api/categorys/"]
+
+
+class Command(BaseCommand):
+    """
+    Compares polling the catalog endpoints with and without conditional GET.
+    Both runs go through the whole Django stack with the test client; the conditional run
+    replays the ETag of the previous response like a polling mobile client would.
+    """
+
+    help = "Benchmark bytes served and latency of catalog polling with and without ETags"
+
+    category_name = "bench-conditional"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=1000, help="Products seeded for the run")
+        parser.add_argument("--requests", type=int, default=500, help="Requests per endpoint and mode")
+        parser.add_argument("--json", action="store_true", help="Print the results as JSON")
+
+    def handle(self, *args, **options):
+        Category.objects.filter(name=self.category_name).delete()
+        category = Category.objects.create(name=self.category_name)
+        seed_products([category], options["rows"])
+        try:
+            results = {
+                "plain": self._run(options["requests"], conditional=False),
+                "conditional": self._run(options["requests"], conditional=True),
+            }
+        finally:
+            category.delete()
+
+        if options["json"]:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        for mode, result in results.items():
+            self.stdout.write(
+                f"{mode:>11}: {result['bytes']} bytes, {result['not_modified']} x 304, "
+                f"p50 {result['p50_ms']} ms, p99 {result['p99_ms']} ms, {result['throughput']} req/s"
+            )
+
+    def _run(self, requests, conditional):
+        client = Client(SERVER_NAME="localhost")
+        etags = {}
+        latencies = []
+        served = 0
+        not_modified = 0
+        started = time.perf_counter()
+        for _ in range(requests):
+            for url in ENDPOINTS:
+                headers = {"HTTP_IF_NONE_MATCH": etags[url]} if conditional and url in etags else {}
+                start = time.perf_counter()
+                response = client.get(url, **headers)
+                latencies.append(time.perf_counter() - start)
+                served += len(response.content)
+                not_modified += response.status_code == 304
+                if response.has_header("ETag"):
+                    etags[url] = response["ETag"]
+        result = summarize(latencies, time.perf_counter() - started)
+        return {"bytes": served, "not_modified": not_modified, **result}
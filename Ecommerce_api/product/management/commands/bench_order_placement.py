@@ -0,0 +1,99 @@
+import json
+import threading
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from product.benchmarking import run_concurrently, summarize
+from product.models import Category, Order, Product
+from product.services import InsufficientStock, place_order
+
+
+class Command(BaseCommand):
+    """
+    Concurrent load test for the order placement service.
+    Runs two scenarios: every thread buying the same hot product, and threads spread over
+    many products. Each scenario checks that no product was oversold and reports orders/sec.
+    The rows created for the run are deleted at the end.
+    """
+
+    help = "Load test order placement on one hot product versus many products"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", type=int, default=8)
+        parser.add_argument("--orders", type=int, default=400, help="Order attempts per scenario")
+        parser.add_argument("--products", type=int, default=50, help="Products in the spread scenario")
+        parser.add_argument("--json", action="store_true", help="Print the results as JSON")
+
+    def handle(self, *args, **options):
+        threads = options["threads"]
+        attempts = options["orders"]
+        user = User.objects.create_user(username=f"bench-orders-{time.time_ns()}")
+        category = Category.objects.create(name="bench-orders")
+        try:
+            # Only half of the attempts can succeed on the hot product, the rest must be refused
+            hot = self._make_products(category, 1, attempts // 2)
+            spread = self._make_products(category, options["products"], attempts)
+            results = {
+                "hot_product": self._run(user, hot, threads, attempts),
+                "many_products": self._run(user, spread, threads, attempts),
+            }
+        finally:
+            Order.objects.filter(user=user).delete()
+            category.delete()
+            user.delete()
+
+        if options["json"]:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        for name, result in results.items():
+            self.stdout.write(
+                f"{name}: {result['placed']} placed, {result['refused']} refused, "
+                f"{result['throughput']} orders/sec, p99 {result['p99_ms']} ms"
+            )
+
+    def _make_products(self, category, count, stock):
+        Category.objects.add_product_counts({category.id: count}, {category.id: category.path})
+        return Product.objects.bulk_create(
+            Product(
+                name=f"bench-{i}",
+                price=1,
+                image_url="https://example.com/bench.jpg",
+                description="",
+                stock_quantity=stock,
+                category=category,
+            )
+            for i in range(count)
+        )
+
+    def _run(self, user, products, threads, attempts):
+        initial = {p.id: p.stock_quantity for p in Product.objects.filter(id__in=[p.id for p in products])}
+        latencies = []
+        counters = {"placed": 0, "refused": 0}
+        lock = threading.Lock()
+
+        def worker(index):
+            for i in range(index, attempts, threads):
+                product = products[i % len(products)]
+                start = time.perf_counter()
+                try:
+                    place_order(user, product, 1)
+                    outcome = "placed"
+                except InsufficientStock:
+                    outcome = "refused"
+                elapsed = time.perf_counter() - start
+                with lock:
+                    latencies.append(elapsed)
+                    counters[outcome] += 1
+
+        elapsed = run_concurrently(worker, threads)
+
+        # No oversell: every unit that left the stock belongs to exactly one order
+        for product in Product.objects.filter(id__in=initial):
+            sold = initial[product.id] - product.stock_quantity
+            ordered = sum(Order.objects.filter(product=product).values_list("quantity", flat=True))
+            if product.stock_quantity < 0 or sold != ordered:
+                raise CommandError(f"Stock mismatch on product {product.id}: sold {sold}, ordered {ordered}")
+
+        return {**counters, **summarize(latencies, elapsed)}
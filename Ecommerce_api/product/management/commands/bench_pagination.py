@@ -0,0 +1,86 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory
+from rest_framework.request import Request
+
+from product.benchmarking import percentile, seed_products
+from product.models import Category, Product
+from product.pagination import KeysetPagination
+
+
+class Command(BaseCommand):
+    """
+    Compares the latency of deep pages with OFFSET pagination and with keyset pagination.
+    Seeds a synthetic category with --rows products (unless --reuse finds one), then
+    measures fetching one page at increasing depths with both strategies.
+    """
+
+    help = "Benchmark page-N latency of OFFSET versus keyset pagination on products"
+
+    category_name = "bench-pagination"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=1_000_000)
+        parser.add_argument("--page-size", type=int, default=10)
+        parser.add_argument("--repeat", type=int, default=5, help="Timed runs per depth")
+        parser.add_argument("--reuse", action="store_true", help="Reuse rows seeded by a previous run")
+        parser.add_argument("--keep", action="store_true", help="Keep the seeded rows afterwards")
+        parser.add_argument("--json", action="store_true", help="Print the results as JSON")
+
+    def handle(self, *args, **options):
+        rows = options["rows"]
+        category = Category.objects.filter(name=self.category_name).first()
+        if category is None or not options["reuse"]:
+            if category is not None:
+                category.delete()
+            category = Category.objects.create(name=self.category_name)
+            self.stdout.write(f"Seeding {rows} products...")
+            seed_products([category], rows)
+
+        try:
+            queryset = Product.objects.filter(category=category)
+            depths = [d for d in (0, 1_000, 10_000, 100_000, 500_000, rows - options["page_size"]) if d < rows]
+            results = [self._measure(queryset, depth, options) for depth in depths]
+        finally:
+            if not options["keep"]:
+                category.delete()
+
+        if options["json"]:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        for result in results:
+            self.stdout.write(
+                f"offset {result['offset']:>9}: OFFSET p50 {result['offset_p50_ms']} ms, "
+                f"keyset p50 {result['keyset_p50_ms']} ms"
+            )
+
+    def _measure(self, queryset, depth, options):
+        page_size = options["page_size"]
+        ordered = queryset.order_by("name", "id")
+
+        # The key of the row just before the page, which is what a cursor would carry
+        paginator = KeysetPagination(("name", "id"))
+        factory = RequestFactory()
+        cursor = ""
+        if depth:
+            before = ordered.values("name", "id")[depth - 1]
+            cursor = paginator.encode_cursor([before["name"], before["id"]], False)
+        request = Request(factory.get("/api/products/", {"cursor": cursor, "page_size": page_size}))
+
+        offset_times, keyset_times = [], []
+        for _ in range(options["repeat"]):
+            start = time.perf_counter()
+            list(ordered[depth : depth + page_size])
+            offset_times.append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            KeysetPagination(("name", "id")).paginate_queryset(queryset, request)
+            keyset_times.append(time.perf_counter() - start)
+
+        return {
+            "offset": depth,
+            "offset_p50_ms": round(percentile(offset_times, 50) * 1000, 3),
+            "keyset_p50_ms": round(percentile(keyset_times, 50) * 1000, 3),
+        }
@@ -0,0 +1,86 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory
+from rest_framework.request import Request
+
+from product.benchmarking import percentile, seed_products
+from product.models import Category, Product
+from product.search import ProductSearchFilter, SearchBackend
+
+QUERIES = ["kettle", "steel", "wireless headphones", "portable speaker battery", "cam", "quiet travel"]
+
+
+class Command(BaseCommand):
+    """
+    Measures product search latency at growing catalog sizes (100k and 1M by default),
+    comparing the full-text index with the icontains fallback on the first results page.
+    Seeded rows live in their own category and are deleted at the end unless --keep.
+    """
+
+    help = "Benchmark full-text product search against icontains at several catalog sizes"
+
+    category_name = "bench-search"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", type=int, nargs="+", default=[100_000, 1_000_000])
+        parser.add_argument("--repeat", type=int, default=5, help="Timed runs per query")
+        parser.add_argument("--skip-fallback", action="store_true", help="Only time the full-text index")
+        parser.add_argument("--keep", action="store_true", help="Keep the seeded rows afterwards")
+        parser.add_argument("--json", action="store_true", help="Print the results as JSON")
+
+    def handle(self, *args, **options):
+        Category.objects.filter(name=self.category_name).delete()
+        category = Category.objects.create(name=self.category_name)
+        results = []
+        try:
+            seeded = 0
+            for size in sorted(options["sizes"]):
+                self.stdout.write(f"Seeding up to {size} products...")
+                seed_products([category], size - seeded, prefix=f"s{size}")
+                seeded = size
+                results.append(self._measure(category, size, options))
+        finally:
+            if not options["keep"]:
+                category.delete()
+
+        if options["json"]:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        for result in results:
+            line = f"{result['rows']:>9} rows: full-text p50 {result['fulltext_p50_ms']} ms, p95 {result['fulltext_p95_ms']} ms"
+            if "icontains_p50_ms" in result:
+                line += f" | icontains p50 {result['icontains_p50_ms']} ms, p95 {result['icontains_p95_ms']} ms"
+            self.stdout.write(line)
+
+    def _time(self, build, repeat):
+        timings = []
+        for text in QUERIES:
+            for _ in range(repeat):
+                start = time.perf_counter()
+                list(build(text)[:10])
+                timings.append(time.perf_counter() - start)
+        return timings
+
+    def _measure(self, category, size, options):
+        queryset = Product.objects.filter(category=category).select_related("category").order_by("name", "id")
+        search_filter = ProductSearchFilter()
+        factory = RequestFactory()
+
+        def fulltext(text):
+            request = Request(factory.get("/api/products/", {"search": text}))
+            return search_filter.filter_queryset(request, queryset, None)
+
+        def icontains(text):
+            return SearchBackend().search(queryset, text.split())
+
+        result = {"rows": size}
+        timings = self._time(fulltext, options["repeat"])
+        result["fulltext_p50_ms"] = round(percentile(timings, 50) * 1000, 3)
+        result["fulltext_p95_ms"] = round(percentile(timings, 95) * 1000, 3)
+        if not options["skip_fallback"]:
+            timings = self._time(icontains, options["repeat"])
+            result["icontains_p50_ms"] = round(percentile(timings, 50) * 1000, 3)
+            result["icontains_p95_ms"] = round(percentile(timings, 95) * 1000, 3)
+        return result
@@ -0,0 +1,80 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand
+
+from product.benchmarking import seed_products
+from product.models import Category, Product
+from product.serializers import PRODUCT_CARD_FIELDS, ProductSerializer, ProductValuesSerializer
+
+
+class Command(BaseCommand):
+    """
+    Measures the rows/sec of the product list serializers on the same rows:
+    ProductSerializer on model instances (the previous list path) against
+    ProductValuesSerializer on values() rows, with every field, as cards and with a
+    two-field sparse fieldset. Each timing includes the query, like a real list page.
+    """
+
+    help = "Benchmark rows/sec of ProductSerializer versus the values() list serializer"
+
+    category_name = "bench-serializers"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=10_000)
+        parser.add_argument("--repeat", type=int, default=3, help="Timed runs per serializer, the best one counts")
+        parser.add_argument("--keep", action="store_true", help="Keep the seeded rows afterwards")
+        parser.add_argument("--json", action="store_true", help="Print the results as JSON")
+
+    def handle(self, *args, **options):
+        Category.objects.filter(name=self.category_name).delete()
+        category = Category.objects.create(name=self.category_name)
+        self.stdout.write(f"Seeding {options['rows']} products...")
+        seed_products([category], options["rows"])
+
+        queryset = Product.objects.filter(category=category).order_by("name", "id")
+        scenarios = {
+            "model_serializer": lambda: ProductSerializer(queryset, many=True).data,
+            "values_full": self._values(queryset, None),
+            "values_card": self._values(queryset, PRODUCT_CARD_FIELDS),
+            "values_sparse": self._values(queryset, ("id", "name")),
+        }
+        try:
+            results = [self._measure(name, run, options) for name, run in scenarios.items()]
+        finally:
+            if not options["keep"]:
+                category.delete()
+
+        baseline = results[0]["rows_per_s"]
+        for result in results:
+            result["speedup"] = round(result["rows_per_s"] / baseline, 2) if baseline else 0.0
+
+        if options["json"]:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        for result in results:
+            self.stdout.write(
+                f"{result['serializer']:<17} {result['rows_per_s']:>10.0f} rows/s "
+                f"({result['best_s']} s, x{result['speedup']})"
+            )
+
+    def _values(self, queryset, fields):
+        def run():
+            serializer = ProductValuesSerializer(fields)
+            return serializer.serialize(queryset.values(*serializer.columns))
+
+        return run
+
+    def _measure(self, name, run, options):
+        times = []
+        for _ in range(options["repeat"]):
+            start = time.perf_counter()
+            rows = len(run())
+            times.append(time.perf_counter() - start)
+        best = min(times)
+        return {
+            "serializer": name,
+            "rows": rows,
+            "best_s": round(best, 4),
+            "rows_per_s": round(rows / best, 1) if best else 0.0,
+        }
@@ -0,0 +1,156 @@
+import json
+import os
+import random
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection
+
+from product.benchmarking import run_concurrently, seed_products, summarize
+from product.models import Category, Product
+from product.serializers import PRODUCT_CARD_FIELDS
+from product.services import InsufficientStock, place_order
+
+
+class Command(BaseCommand):
+    """
+    Mixed read/write load test of the SQLite profile (settings.SQLITE_TUNING).
+
+    Each profile runs in its own process, on its own copy of the database (taken with the
+    sqlite3 backup API, the real file is never written):
+
+    - default: SQLite as Django opens it, rollback journal and DEFERRED transactions;
+    - tuned: WAL, synchronous=NORMAL, busy_timeout, mmap, a bigger page cache and
+      BEGIN IMMEDIATE for order placement.
+
+    --readers threads read product list pages (a page of cards and its count) and product
+    details while --writers threads place orders, for --seconds. Reported per profile:
+    reads/sec and orders/sec with their latency percentiles, and the operations that failed
+    with "database is locked" even after the order retry policy.
+    """
+
+    help = "Compare the default and the tuned SQLite profile on a mixed read/write workload"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=5000, help="Products seeded in the copy")
+        parser.add_argument("--readers", type=int, default=6, help="Threads reading the catalog")
+        parser.add_argument("--writers", type=int, default=4, help="Threads placing orders")
+        parser.add_argument("--seconds", type=float, default=10.0, help="Duration of each profile")
+        parser.add_argument("--profile", choices=["default", "tuned", "both"], default="both")
+        parser.add_argument("--json", action="store_true", help="Print the results as JSON")
+        # Internal: run the workload in this process, on the database it is configured with
+        parser.add_argument("--worker", action="store_true", help="(internal)")
+
+    def handle(self, *args, **options):
+        if settings.DATABASES["default"]["ENGINE"] != "django.db.backends.sqlite3":
+            raise CommandError("This benchmark only runs on SQLite.")
+        if options["worker"]:
+            self.stdout.write(json.dumps(self._workload(options)))
+            return
+
+        profiles = ["default", "tuned"] if options["profile"] == "both" else [options["profile"]]
+        results = {profile: self._run_profile(profile, options) for profile in profiles}
+
+        if options["json"]:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        for profile, result in results.items():
+            reads, writes = result["reads"], result["writes"]
+            self.stdout.write(
+                f"{profile:>8}: reads {reads['throughput']}/s p99 {reads['p99_ms']} ms, "
+                f"orders {writes['throughput']}/s p99 {writes['p99_ms']} ms, "
+                f"locked errors {result['locked_errors']}"
+            )
+
+    def _run_profile(self, profile, options):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "bench.sqlite3")
+            source = sqlite3.connect(settings.DATABASES["default"]["NAME"])
+            target = sqlite3.connect(path)
+            try:
+                source.backup(target)
+                # The copy keeps the journal mode of the original: start both profiles from the same one
+                target.execute("PRAGMA journal_mode=DELETE")
+            finally:
+                target.close()
+                source.close()
+
+            environ = {
+                **os.environ,
+                "DATABASE_URL": f"sqlite:///{path}",
+                "DATABASE_REPLICA_URLS": "",
+                "SQLITE_TUNING": "True" if profile == "tuned" else "False",
+                "CATALOG_CACHE_ENABLED": "False",
+            }
+            command = [
+                sys.executable, str(settings.BASE_DIR / "manage.py"), "bench_sqlite", "--worker",
+                "--rows", str(options["rows"]), "--readers", str(options["readers"]),
+                "--writers", str(options["writers"]), "--seconds", str(options["seconds"]),
+            ]
+            process = subprocess.run(command, env=environ, capture_output=True, text=True)
+            if process.returncode:
+                raise CommandError(f"The {profile} profile failed:\n{process.stderr}")
+            return json.loads(process.stdout)
+
+    def _workload(self, options):
+        call_command("migrate", verbosity=0)  # The copy may be behind the code
+        category = Category.objects.create(name="bench-sqlite")
+        seed_products([category], options["rows"], stock=1_000_000)
+        user = User.objects.create_user(username="bench-sqlite")
+        product_ids = list(Product.objects.filter(category=category).values_list("id", flat=True))
+        products = {product.id: product for product in Product.objects.filter(id__in=product_ids)}
+        connection.close()
+
+        readers = options["readers"]
+        deadline = time.perf_counter() + options["seconds"]
+        latencies = {"reads": [], "writes": []}
+        errors = {"locked": 0}
+        lock = threading.Lock()
+
+        def read(rng):
+            if rng.random() < 0.5:
+                page = rng.randrange(max(1, len(product_ids) // 20))
+                queryset = Product.objects.filter(category=category).order_by("name", "id")
+                list(queryset.values(*PRODUCT_CARD_FIELDS)[page * 20 : page * 20 + 20])
+                queryset.count()
+            else:
+                Product.objects.values().get(pk=rng.choice(product_ids))
+
+        def write(rng):
+            place_order(user, products[rng.choice(product_ids)], 1)
+
+        def worker(index):
+            rng = random.Random(index)
+            kind, operation = ("reads", read) if index < readers else ("writes", write)
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                try:
+                    operation(rng)
+                except OperationalError:
+                    with lock:
+                        errors["locked"] += 1
+                    continue
+                except InsufficientStock:
+                    continue
+                elapsed = time.perf_counter() - start
+                with lock:
+                    latencies[kind].append(elapsed)
+
+        elapsed = run_concurrently(worker, readers + options["writers"])
+        with connection.cursor() as cursor:
+            cursor.execute("PRAGMA journal_mode")
+            journal_mode = cursor.fetchone()[0]
+        return {
+            "journal_mode": journal_mode,
+            "reads": summarize(latencies["reads"], elapsed),
+            "writes": summarize(latencies["writes"], elapsed),
+            "locked_errors": errors["locked"],
+        }
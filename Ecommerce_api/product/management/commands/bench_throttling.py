@@ -0,0 +1,71 @@
+import json
+import time
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from rest_framework.throttling import AnonRateThrottle
+
+from product.throttling import AnonBucketThrottle, local_buckets
+
+
+class Command(BaseCommand):
+    """
+    Microbenchmark of the throttle bookkeeping, the cost added to every request:
+    allow_request() of AnonBucketThrottle with the in-process store and with a cache backend
+    store (the "default" cache), next to DRF's AnonRateThrottle (a list of request times
+    per client in the cache) for reference. --clients IP addresses send --calls requests
+    round robin, under the configured anon rate.
+    """
+
+    help = "Measure the per-request cost of the token bucket throttles"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--calls", type=int, default=200000)
+        parser.add_argument("--clients", type=int, default=10000, help="Distinct client IP addresses")
+        parser.add_argument("--json", action="store_true", help="Print the results as JSON")
+
+    def handle(self, *args, **options):
+        factory = APIRequestFactory()
+        requests = []
+        for i in range(options["clients"]):
+            request = Request(factory.get("/api/products/", REMOTE_ADDR=f"10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}"))
+            request.user = AnonymousUser()
+            requests.append(request)
+
+        results = {}
+        for name, throttle_class, store in (
+            ("bucket_local", AnonBucketThrottle, "local"),
+            ("bucket_cache", AnonBucketThrottle, "cache"),
+            ("drf_anon_rate", AnonRateThrottle, None),
+        ):
+            local_buckets.clear()
+            cache.clear()
+            with override_settings(THROTTLING={"ENABLED": True, "STORE": store or "local", "CACHE_ALIAS": "default"}):
+                results[name] = self._measure(throttle_class, requests, options["calls"])
+
+        if options["json"]:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        for name, result in results.items():
+            self.stdout.write(
+                f"{name:>14}: {result['us_per_call']} us/call, {result['allowed']} allowed, {result['throttled']} throttled"
+            )
+
+    def _measure(self, throttle_class, requests, calls):
+        allowed = 0
+        clients = len(requests)
+        start = time.perf_counter()
+        for i in range(calls):
+            # DRF builds new throttle instances for every request, so does the benchmark
+            allowed += throttle_class().allow_request(requests[i % clients], None)
+        elapsed = time.perf_counter() - start
+        return {
+            "calls": calls,
+            "us_per_call": round(elapsed / calls * 1e6, 3),
+            "allowed": allowed,
+            "throttled": calls - allowed,
+        }
@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from product.services import release_expired_reservations, reservation_settings
+
+
+class Command(BaseCommand):
+    """
+    Releases the checkout holds that expired and gives their units back to the stock
+    (see release_expired_reservations). Run it from cron, or with --loop as a small worker
+    that sweeps every RESERVATIONS["SWEEP_INTERVAL"] seconds.
+    """
+
+    help = "Release the expired reservations and return their stock"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--loop", action="store_true", help="Keep sweeping until interrupted")
+        parser.add_argument("--interval", type=int, default=None, help="Seconds between two sweeps with --loop")
+        parser.add_argument("--batch-size", type=int, default=None, help="Holds released per transaction")
+
+    def handle(self, *args, **options):
+        interval = options["interval"] or reservation_settings().get("SWEEP_INTERVAL", 30)
+        while True:
+            released = release_expired_reservations(batch_size=options["batch_size"])
+            self.stdout.write(f"Released {released} expired reservations")
+            if not options["loop"]:
+                return
+            close_old_connections()
+            time.sleep(interval)
@@ -0,0 +1,137 @@
+import re
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import RequestFactory
+from rest_framework.request import Request
+
+from product.benchmarking import seed_products
+from product.models import Category, Order, Product
+from product.urls import router
+
+
+# Query parameters worth explaining for every registered route (basename -> list of params)
+SCENARIOS = {
+    "product": [
+        {},
+        {"min_price": "10", "max_price": "20"},
+        {"category": "{category}"},
+        {"category": "{category}", "min_price": "10", "max_price": "20"},
+        {"in_stock": "true"},
+    ],
+    "order": [{}],
+}
+
+# Plans that read every row of a table instead of using an index
+SEQUENTIAL_SCAN = re.compile(r"\bSCAN (\w+)(?!.*\bUSING\b)|Seq Scan on (\w+)")
+TEMP_SORT = re.compile(r"USE TEMP B-TREE FOR ORDER BY|Sort Key")
+
+
+class Command(BaseCommand):
+    """
+    Runs EXPLAIN on the list query of every viewset registered in product/urls.py, with the
+    filters the API actually offers, and flags sequential scans and sorts that do not use
+    an index. Use --seed to insert a large synthetic dataset first: on small tables most
+    planners prefer a sequential scan, so plans are only meaningful on realistic sizes.
+    The seeded rows live in a transaction that is rolled back at the end, the database is left
+    as it was. Scans of tables smaller than --min-rows (lookup tables like categories) are not flagged,
+    neither are unfiltered scans without a sort step: they read rows in index order and
+    stop after the first page.
+    """
+
+    help = "EXPLAIN the viewset queries and flag sequential scans"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--seed", type=int, default=0, help="Insert this many synthetic products first")
+        parser.add_argument("--min-rows", type=int, default=1000, help="Ignore scans of smaller tables")
+        parser.add_argument("--fail-on-scan", action="store_true", help="Exit with an error when a scan is found")
+
+    def handle(self, *args, **options):
+        if not options["seed"]:
+            return self._audit(options)
+        with transaction.atomic():
+            try:
+                self._seed(options["seed"])
+                self._audit(options)
+            finally:
+                transaction.set_rollback(True)  # Drop the synthetic rows, even when the audit failed
+
+    def _audit(self, options):
+        user = User.objects.order_by("id").first() or User.objects.create_user(username="explain")
+        category = Category.objects.order_by("id").first() or Category.objects.create(name="explain")
+
+        self.min_rows = options["min_rows"]
+        self.row_counts = {}
+        flagged = []
+        for prefix, viewset, basename in router.registry:
+            if not hasattr(viewset, "list"):
+                continue  # No list query, e.g. the sales reports (served from the rollup tables)
+            for params in SCENARIOS.get(basename, [{}]):
+                params = {key: value.format(category=category.id) for key, value in params.items()}
+                for staff in (False, True):
+                    queryset = self._list_queryset(viewset, prefix, params, user, staff)
+                    plan = queryset[:10].explain()
+                    label = f"{basename} {params or ''} {'(staff)' if staff else ''}".strip()
+                    problems = self._problems(plan, filtered=bool(queryset.query.where))
+                    flagged.extend((label, problem) for problem in problems)
+                    status = self.style.WARNING("FLAG") if problems else self.style.SUCCESS("OK  ")
+                    self.stdout.write(f"{status} {label}")
+                    if options["verbosity"] > 1 or problems:
+                        for line in plan.splitlines():
+                            self.stdout.write(f"       {line}")
+
+        if flagged and options["fail_on_scan"]:
+            raise CommandError(f"{len(flagged)} queries scan a whole table")
+
+    def _seed(self, count):
+        """
+        Products spread over 50 categories and orders spread over 100 users, so the planner
+        statistics look like a real catalog and not like one giant category.
+        """
+        self.stdout.write(f"Seeding {count} products...")
+        categories = Category.objects.bulk_create(Category(name=f"explain {i}") for i in range(50))
+        seed_products(categories, count)
+        Category.objects.rebuild()
+        users = User.objects.bulk_create(
+            User(username=f"explain-{time.time_ns()}-{i}") for i in range(100)
+        )
+        products = list(Product.objects.order_by("-id").values_list("id", "price")[: count // 10])
+        Order.objects.bulk_create(
+            (
+                Order(user=users[i % len(users)], product_id=product_id, quantity=1, unit_price=price, line_total=price)
+                for i, (product_id, price) in enumerate(products)
+            ),
+            batch_size=5000,
+        )
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+
+    def _list_queryset(self, viewset, prefix, params, user, staff):
+        """
+        Build the queryset the list action would run, filters included.
+        """
+        request = Request(RequestFactory().get(f"/api/{prefix}/", params))
+        user.is_staff = staff
+        request.user = user
+        view = viewset(request=request, format_kwarg=None, action="list", kwargs={})
+        return view.filter_queryset(view.get_queryset())
+
+    def _table_rows(self, table):
+        if table not in self.row_counts:
+            with connection.cursor() as cursor:
+                cursor.execute(f"SELECT COUNT(*) FROM {connection.ops.quote_name(table)}")
+                self.row_counts[table] = cursor.fetchone()[0]
+        return self.row_counts[table]
+
+    def _problems(self, plan, filtered):
+        sorts = [f"sort without index: {match.group(0)}" for match in TEMP_SORT.finditer(plan)]
+        if not filtered and not sorts:
+            return []
+        problems = []
+        for match in SEQUENTIAL_SCAN.finditer(plan):
+            table = match.group(1) or match.group(2)
+            if self._table_rows(table) >= self.min_rows:
+                problems.append(f"sequential scan on {table}")
+        return problems + sorts
@@ -0,0 +1,52 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from product.imports import ProductImporter, read_rows
+
+
+class Command(BaseCommand):
+    """
+    Imports or updates products from a supplier CSV or NDJSON file, matching on sku.
+    The file is streamed, so its size does not matter; bad rows are reported and skipped.
+    """
+
+    help = "Bulk import products from a CSV or NDJSON file (upsert on sku)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="File to import, - for stdin")
+        parser.add_argument("--format", choices=["csv", "ndjson"], help="Defaults to the file extension")
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument("--create-categories", action="store_true", help="Create unknown categories")
+        parser.add_argument("--json", action="store_true", help="Print the full report as JSON")
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        input_format = options["format"] or ("csv" if path.endswith(".csv") else "ndjson")
+        importer = ProductImporter(
+            batch_size=options["batch_size"], create_categories=options["create_categories"]
+        )
+
+        start = time.perf_counter()
+        try:
+            if path == "-":
+                report = importer.run(read_rows(self.stdin, input_format))
+            else:
+                with open(path, "rb") as stream:
+                    report = importer.run(read_rows(stream, input_format))
+        except OSError as exc:
+            raise CommandError(str(exc))
+        elapsed = time.perf_counter() - start
+
+        if options["json"]:
+            self.stdout.write(json.dumps({**report, "elapsed_s": round(elapsed, 3)}, indent=2))
+            return
+        for error in report["errors"][:20]:
+            self.stderr.write(f"line {error['line']}: {error['errors']}")
+        rate = report["processed"] / elapsed if elapsed else 0
+        self.stdout.write(
+            f"{report['processed']} rows in {elapsed:.2f}s ({rate:.0f} rows/s): "
+            f"{report['created']} created, {report['updated']} updated, "
+            f"{report['unchanged']} unchanged, {report['failed']} failed"
+        )
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from product.cache import catalog_cache
+from product.categories import category_registry
+from product.models import Category
+
+
+class Command(BaseCommand):
+    """
+    Recomputes the materialized path and the product count of every category from the
+    parent links and the products (see CategoryQuerySet.rebuild). Needed after rows were
+    written without the model methods and signals: bulk_create, raw SQL, fixtures.
+    """
+
+    help = "Recompute the category paths and product counts"
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            changed = Category.objects.rebuild()
+        if changed:
+            catalog_cache.bump()
+            catalog_cache.bump("category")
+            category_registry.bump()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt the category tree, {changed} categories changed"))
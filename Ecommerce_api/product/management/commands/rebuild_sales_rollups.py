@@ -0,0 +1,23 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from product.analytics import rebuild_sales_rollups
+
+
+class Command(BaseCommand):
+    """
+    Recomputes the daily product and category sales from the orders (see
+    rebuild_sales_rollups). The outbox workers keep them up to date on their own; this is for
+    the first backfill and after orders were written without the order services (bulk_create,
+    admin, raw SQL) or changed by staff. --since limits the work to the recent days.
+    """
+
+    help = "Rebuild the daily sales rollups from the orders"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--since", type=date.fromisoformat, default=None, help="First day to rebuild (YYYY-MM-DD)")
+
+    def handle(self, *args, **options):
+        products, categories = rebuild_sales_rollups(since=options["since"])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {products} product rows and {categories} category rows"))
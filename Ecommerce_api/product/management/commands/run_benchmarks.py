@@ -0,0 +1,251 @@
+import json
+import logging
+import random
+import re
+import subprocess
+import threading
+import time
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from product.authentication import ClaimsRefreshToken
+from product.benchmarking import ADJECTIVES, NOUNS, run_concurrently, summarize
+from product.models import Category, Order, Product, Review
+
+SCENARIOS = ("browse", "filter", "search", "order_placement", "order_history", "sales_report")
+
+
+class Command(BaseCommand):
+    """
+    Scripted load test of the API on the dataset of seed_benchmark_data.
+
+    Every scenario sends --requests requests (after --warmup unmeasured ones) from
+    --concurrency threads through the full Django stack (middleware, authentication,
+    viewsets), in process and without sockets:
+
+    - browse: anonymous product list pages, as cards or full rows;
+    - filter: product list filtered on category, price range and stock, ordered by price;
+    - search: full-text product search on catalog words;
+    - order_placement: a logged in user orders one unit (POST /api/orders/);
+    - order_history: a logged in user reads their first orders page;
+    - sales_report: a staff user reads a year of product or category sales totals.
+
+    The result of the run (throughput, p50/p95/p99 in ms, errors and SQL queries per request
+    from the Server-Timing header, plus the dataset size and the git commit) is written as
+    JSON under --output, and --compare prints the change against an earlier result file.
+    """
+
+    help = "Run the benchmark scenarios against the seeded dataset and store the results as JSON"
+
+    prefix = "bench"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="Comma separated subset of the scenarios")
+        parser.add_argument("--requests", type=int, default=500, help="Measured requests per scenario")
+        parser.add_argument("--warmup", type=int, default=50, help="Unmeasured requests before each scenario")
+        parser.add_argument("--concurrency", type=int, default=4, help="Client threads")
+        parser.add_argument("--users", type=int, default=200, help="Seeded users acting as buyers")
+        parser.add_argument("--no-catalog-cache", action="store_true", help="Measure the database path of the catalog")
+        parser.add_argument("--label", default="", help="Name of the run, part of the file name")
+        parser.add_argument("--output", default=str(settings.BASE_DIR / "benchmarks"), help="Directory of the result files")
+        parser.add_argument("--compare", help="Earlier result file to compare with")
+        parser.add_argument("--seed", type=int, default=42)
+
+    def handle(self, *args, **options):
+        scenarios = [name.strip() for name in options["scenarios"].split(",") if name.strip()]
+        unknown = set(scenarios) - set(SCENARIOS)
+        if unknown:
+            raise CommandError(f"Unknown scenarios {sorted(unknown)}, choose from {', '.join(SCENARIOS)}.")
+
+        self.rng = random.Random(options["seed"])
+        self.load_fixtures(options)
+        results = {}
+        cache_settings = {**settings.CATALOG_CACHE, "ENABLED": not options["no_catalog_cache"]}
+        # The bench clients are a handful of IP addresses and users sending hundreds of requests
+        # a minute: the throttles would answer most of them 429 and the timings would be theirs
+        throttling = {**getattr(settings, "THROTTLING", {}), "ENABLED": False}
+        # One log line per request would drown the output
+        logging.getLogger("product.instrumentation").setLevel(logging.WARNING)
+        with override_settings(
+            CATALOG_CACHE=cache_settings, THROTTLING=throttling, ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"]
+        ):
+            for name in scenarios:
+                results[name] = self.run_scenario(getattr(self, f"scenario_{name}"), options)
+                self.stdout.write(self.format_line(name, results[name]))
+
+        report = {
+            "label": options["label"],
+            "started_at": datetime.now(timezone.utc).isoformat(),
+            "git_commit": self.git_commit(),
+            "database": {"vendor": connection.vendor, "name": str(connection.settings_dict["NAME"])},
+            "dataset": self.dataset_size(),
+            "config": {
+                key: options[key]
+                for key in ("requests", "warmup", "concurrency", "users", "no_catalog_cache", "seed")
+            },
+            "scenarios": results,
+        }
+        path = self.write_report(report, options)
+        self.stdout.write(self.style.SUCCESS(f"Results written to {path}"))
+        if options["compare"]:
+            self.compare(report, options["compare"])
+
+    # --------------------
+    # FIXTURES
+    # --------------------
+    def load_fixtures(self, options):
+        """
+        Ids and tokens the scenarios pick from, read once before the run.
+        """
+        users = list(
+            User.objects.filter(username__startswith=f"{self.prefix}-user-").order_by("id")[: options["users"]]
+        )
+        if not users:
+            raise CommandError("No benchmark dataset in this database, run seed_benchmark_data first.")
+        self.tokens = [(user.id, str(ClaimsRefreshToken.for_user(user).access_token)) for user in users]
+        staff, _ = User.objects.get_or_create(username=f"{self.prefix}-staff", defaults={"is_staff": True})
+        self.staff_token = str(ClaimsRefreshToken.for_user(staff).access_token)
+        self.category_ids = list(
+            Category.objects.filter(name__startswith=f"{self.prefix}-category-").values_list("id", flat=True)
+        )
+        # Products with stock to order; a sample is enough, the scenarios pick among them
+        self.product_ids = list(
+            Product.objects.filter(category_id__in=self.category_ids, stock_quantity__gt=0)
+            .order_by("id")
+            .values_list("id", flat=True)[:10000]
+        )
+        self.page_count = max(1, Product.objects.count() // settings.REST_FRAMEWORK["PAGE_SIZE"])
+
+    def dataset_size(self):
+        return {
+            "products": Product.objects.count(),
+            "users": User.objects.count(),
+            "orders": Order.objects.count(),
+            "reviews": Review.objects.count(),
+        }
+
+    # --------------------
+    # SCENARIOS
+    # --------------------
+    # Each one returns (method, url, data, token); the random generator belongs to the thread
+
+    def scenario_browse(self, rng):
+        # Shoppers mostly stay on the first pages
+        page = min(self.page_count, int(rng.paretovariate(1.2)))
+        view = "&view=card" if rng.random() < 0.5 else ""
+        return "get", f"{reverse('product-list')}?page={page}{view}", None, None
+
+    def scenario_filter(self, rng):
+        low = rng.randrange(0, 400)
+        query = (
+            f"category={rng.choice(self.category_ids)}&min_price={low}&max_price={low + 100}"
+            f"&in_stock=true&ordering=price"
+        )
+        return "get", f"{reverse('product-list')}?{query}", None, None
+
+    def scenario_search(self, rng):
+        terms = rng.choice(NOUNS) if rng.random() < 0.5 else f"{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)}"
+        return "get", f"{reverse('product-list')}?search={terms}", None, None
+
+    def scenario_order_placement(self, rng):
+        user_id, token = rng.choice(self.tokens)
+        data = {"user": user_id, "product": rng.choice(self.product_ids), "quantity": 1}
+        return "post", reverse("order-list"), data, token
+
+    def scenario_order_history(self, rng):
+        _, token = rng.choice(self.tokens)
+        return "get", reverse("order-list"), None, token
+
+    def scenario_sales_report(self, rng):
+        end = date.today()
+        query = f"start={end - timedelta(days=364)}&end={end}&totals=true"
+        if rng.random() < 0.5:
+            return "get", f"{reverse('analytics-categories')}?{query}", None, self.staff_token
+        return "get", f"{reverse('analytics-products')}?{query}&category={rng.choice(self.category_ids)}", None, self.staff_token
+
+    # --------------------
+    # RUNNER
+    # --------------------
+    def run_scenario(self, scenario, options):
+        threads = options["concurrency"]
+        total = options["warmup"] + options["requests"]
+        latencies, queries = [], []
+        errors = {"count": 0}
+        lock = threading.Lock()
+        seeds = [self.rng.random() for _ in range(threads)]
+
+        def worker(index):
+            rng = random.Random(seeds[index])
+            client = APIClient(raise_request_exception=False)  # A failing request is an error (500), like behind a server
+            for i in range(index, total, threads):
+                method, url, data, token = scenario(rng)
+                client.credentials(**({"HTTP_AUTHORIZATION": f"Bearer {token}"} if token else {}))
+                start = time.perf_counter()
+                if method == "get":
+                    response = client.get(url)
+                else:
+                    response = client.post(url, data, format="json")
+                elapsed = time.perf_counter() - start
+                if i < options["warmup"]:
+                    continue
+                timing = re.search(r'desc="(\d+) queries"', response.get("Server-Timing", ""))
+                with lock:
+                    latencies.append(elapsed)
+                    if timing:
+                        queries.append(int(timing.group(1)))
+                    if response.status_code >= 400:
+                        errors["count"] += 1
+
+        # The clock also covers the warmup, scale it to the measured share
+        elapsed = run_concurrently(worker, threads) * options["requests"] / total
+        return {
+            **summarize(latencies, elapsed),
+            "errors": errors["count"],
+            "queries_per_request": round(sum(queries) / len(queries), 2) if queries else None,
+        }
+
+    # --------------------
+    # REPORTS
+    # --------------------
+    def format_line(self, name, result):
+        return (
+            f"{name:>16}: {result['throughput']} req/s, p50 {result['p50_ms']} ms, p95 {result['p95_ms']} ms, "
+            f"p99 {result['p99_ms']} ms, errors {result['errors']}, queries/request {result['queries_per_request']}"
+        )
+
+    def git_commit(self):
+        try:
+            return subprocess.run(
+                ["git", "rev-parse", "HEAD"], cwd=settings.BASE_DIR, capture_output=True, text=True, check=True
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    def write_report(self, report, options):
+        directory = Path(options["output"])
+        directory.mkdir(parents=True, exist_ok=True)
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+        path = directory / f"{stamp}{'-' + options['label'] if options['label'] else ''}.json"
+        path.write_text(json.dumps(report, indent=2))
+        return path
+
+    def compare(self, report, previous_path):
+        previous = json.loads(Path(previous_path).read_text())
+        self.stdout.write(f"Compared with {previous_path} ({previous.get('label') or previous.get('started_at')}):")
+        for name, result in report["scenarios"].items():
+            before = previous.get("scenarios", {}).get(name)
+            if not before:
+                continue
+            changes = []
+            for key in ("throughput", "p50_ms", "p99_ms"):
+                if before[key]:
+                    changes.append(f"{key} {(result[key] - before[key]) / before[key] * 100:+.1f}%")
+            self.stdout.write(f"{name:>16}: {', '.join(changes)}")
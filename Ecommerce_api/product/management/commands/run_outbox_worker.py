@@ -0,0 +1,44 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand
+
+from product.outbox import outbox_metrics
+from product.workers import OutboxWorkerPool, drain
+
+
+class Command(BaseCommand):
+    """
+    Handles the outbox events (see product/outbox.py and product/workers.py) with a pool of worker threads until
+    interrupted. Start as many as needed, on as many machines as needed: they share the table
+    and no broker is involved. --once handles the due events in the foreground and exits,
+    --metrics prints the queue depth and lag and exits.
+    """
+
+    help = "Run a pool of outbox workers"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=None, help="Handler threads (OUTBOX['WORKERS'] by default)")
+        parser.add_argument("--batch-size", type=int, default=None, help="Events claimed per query")
+        parser.add_argument("--once", action="store_true", help="Handle the due events and exit")
+        parser.add_argument("--metrics", action="store_true", help="Print the queue metrics as JSON and exit")
+
+    def handle(self, *args, **options):
+        if options["metrics"]:
+            self.stdout.write(json.dumps(outbox_metrics()))
+            return
+        if options["once"]:
+            handled = drain(batch_size=options["batch_size"])
+            self.stdout.write(f"Handled {handled} outbox events")
+            return
+
+        pool = OutboxWorkerPool(workers=options["workers"], batch_size=options["batch_size"]).start()
+        self.stdout.write(f"Outbox worker pool started with {pool.workers} workers, Ctrl+C to stop")
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            self.stdout.write("Stopping, finishing the claimed events...")
+        finally:
+            pool.stop()
+        self.stdout.write(json.dumps(pool.metrics()))
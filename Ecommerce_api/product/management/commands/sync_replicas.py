@@ -0,0 +1,39 @@
+import sqlite3
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+
+class Command(BaseCommand):
+    """
+    Copies the primary SQLite database into every SQLite replica file.
+
+    Local stand-in for replication: run the project with e.g.
+    DATABASE_REPLICA_URLS=sqlite:///replica1.sqlite3,sqlite:///replica2.sqlite3 and call this
+    command whenever the replicas should catch up. Between two runs the replicas lag behind,
+    which is a good way to see the read-your-writes pinning at work.
+    """
+
+    help = "Copy the primary SQLite database into the SQLite read replicas"
+
+    def handle(self, *args, **options):
+        primary = settings.DATABASES["default"]
+        if primary["ENGINE"] != "django.db.backends.sqlite3":
+            raise CommandError("Only SQLite databases can be copied, use the database replication instead.")
+        replicas = [alias for alias in settings.DATABASE_REPLICAS if settings.DATABASES[alias]["ENGINE"] == primary["ENGINE"]]
+        if not replicas:
+            raise CommandError("No SQLite replica configured (DATABASE_REPLICA_URLS).")
+
+        source = sqlite3.connect(primary["NAME"])
+        try:
+            for alias in replicas:
+                connections[alias].close()  # Never copy under an open connection
+                target = sqlite3.connect(settings.DATABASES[alias]["NAME"])
+                try:
+                    source.backup(target)  # Consistent online copy, even while the primary is written
+                finally:
+                    target.close()
+                self.stdout.write(f"{alias}: copied from {primary['NAME']}")
+        finally:
+            source.close()
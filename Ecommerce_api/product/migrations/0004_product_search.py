@@ -0,0 +1,20 @@
+from django.db import migrations
+
+from ._search_sql import POSTGRES_BACKWARD, POSTGRES_FORWARD, SQLITE_BACKWARD, SQLITE_FORWARD, run_for_vendor
+
+# The search index is not a Django model: on SQLite it is an FTS5 virtual table and on
+# PostgreSQL a tsvector column with a GIN index (the SQL lives in _search_sql.py).
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('product', '0003_catalog_and_order_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run_for_vendor({"sqlite": SQLITE_FORWARD, "postgresql": POSTGRES_FORWARD}),
+            run_for_vendor({"sqlite": SQLITE_BACKWARD, "postgresql": POSTGRES_BACKWARD}),
+        ),
+    ]
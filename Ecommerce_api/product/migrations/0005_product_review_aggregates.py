@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:17
+
+from django.db import migrations, models
+
+from ._search_sql import without_search_triggers
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('product', '0004_product_search'),
+    ]
+
+    operations = without_search_triggers([
+        migrations.AddField(
+            model_name='product',
+            name='rating_avg',
+            field=models.FloatField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['-rating_avg', 'id'], name='product_rating_idx'),
+        ),
+    ])
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:24
+
+from django.db import migrations, models
+
+from ._search_sql import without_search_triggers
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('product', '0006_review_product_created_index'),
+    ]
+
+    operations = without_search_triggers([
+        migrations.AddField(
+            model_name='product',
+            name='sku',
+            field=models.CharField(blank=True, max_length=64, null=True, unique=True),
+        ),
+    ])
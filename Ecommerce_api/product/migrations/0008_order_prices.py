@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:30
+
+from django.db import migrations, models
+
+
+# Orders placed before this migration never stored their price: use the current product price
+BACKFILL_SQL = """
+UPDATE product_order
+SET unit_price = (SELECT price FROM product_product WHERE product_product.id = product_order.product_id)
+"""
+LINE_TOTAL_SQL = "UPDATE product_order SET line_total = unit_price * quantity"
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('product', '0007_product_sku'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='unit_price',
+            field=models.DecimalField(decimal_places=2, editable=False, max_digits=10, null=True),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='line_total',
+            field=models.DecimalField(decimal_places=2, editable=False, max_digits=12, null=True),
+        ),
+        migrations.RunSQL(BACKFILL_SQL, migrations.RunSQL.noop),
+        migrations.RunSQL(LINE_TOTAL_SQL, migrations.RunSQL.noop),
+        migrations.AlterField(
+            model_name='order',
+            name='unit_price',
+            field=models.DecimalField(decimal_places=2, editable=False, max_digits=10),
+        ),
+        migrations.AlterField(
+            model_name='order',
+            name='line_total',
+            field=models.DecimalField(decimal_places=2, editable=False, max_digits=12),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['ordered_at'], name='order_ordered_at_idx'),
+        ),
+    ]
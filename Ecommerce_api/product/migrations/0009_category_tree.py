@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:22
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from ._search_sql import without_search_triggers
+
+
+# Existing categories are all top level, their path is just their own id
+BACKFILL_SQL = """
+UPDATE product_category
+SET path = '/' || id || '/',
+    product_count = (SELECT COUNT(*) FROM product_product WHERE product_product.category_id = product_category.id)
+"""
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('product', '0008_order_prices'),
+    ]
+
+    # The search triggers read product_category, which SQLite rebuilds to add the columns
+    operations = without_search_triggers([
+        migrations.AddField(
+            model_name='category',
+            name='parent',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='children', to='product.category'),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='path',
+            field=models.CharField(default='', editable=False, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='product_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunSQL(BACKFILL_SQL, migrations.RunSQL.noop),
+        migrations.AddIndex(
+            model_name='category',
+            index=models.Index(fields=['path'], name='category_path_idx'),
+        ),
+    ])
@@ -0,0 +1,69 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:45
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+# Roll up the existing orders, by UTC day (the TIME_ZONE of the settings), like rebuild_sales_rollups
+BACKFILL_SQL = [
+    """
+    INSERT INTO product_dailyproductsales (day, product_id, units, revenue, orders)
+    SELECT DATE(ordered_at), product_id, SUM(quantity), SUM(line_total), COUNT(*)
+    FROM product_order
+    GROUP BY DATE(ordered_at), product_id
+    """,
+    """
+    INSERT INTO product_dailycategorysales (day, category_id, units, revenue, orders)
+    SELECT DATE(product_order.ordered_at), product_product.category_id, SUM(product_order.quantity),
+           SUM(product_order.line_total), COUNT(*)
+    FROM product_order JOIN product_product ON product_product.id = product_order.product_id
+    GROUP BY DATE(product_order.ordered_at), product_product.category_id
+    """,
+    "UPDATE product_order SET rolled_up = TRUE",
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('product', '0011_outbox'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='rolled_up',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.CreateModel(
+            name='DailyCategorySales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('units', models.PositiveIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('orders', models.PositiveIntegerField(default=0)),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_sales', to='product.category')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['day', 'category'], name='daily_category_sales_day_idx')],
+                'constraints': [models.UniqueConstraint(fields=('category', 'day'), name='daily_category_sales_unique')],
+            },
+        ),
+        migrations.CreateModel(
+            name='DailyProductSales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('units', models.PositiveIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('orders', models.PositiveIntegerField(default=0)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_sales', to='product.product')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['day', 'product'], name='daily_product_sales_day_idx')],
+                'constraints': [models.UniqueConstraint(fields=('product', 'day'), name='daily_product_sales_unique')],
+            },
+        ),
+        migrations.RunSQL(BACKFILL_SQL, migrations.RunSQL.noop),
+    ]
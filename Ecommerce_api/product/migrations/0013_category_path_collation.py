@@ -0,0 +1,24 @@
+from django.db import migrations
+
+from ._search_sql import run_for_vendor
+
+# The subtree ranges of CategoryQuerySet.subtree need "/" to sort right before "0", as in
+# byte order. SQLite compares text bytewise (BINARY) by default, but a PostgreSQL column
+# follows the database locale, where punctuation may be ignored or sorted elsewhere: the
+# path column (and with it category_path_idx, rebuilt by the ALTER) uses the "C" collation.
+POSTGRES_FORWARD = ['ALTER TABLE product_category ALTER COLUMN path TYPE varchar(255) COLLATE "C"']
+POSTGRES_BACKWARD = ['ALTER TABLE product_category ALTER COLUMN path TYPE varchar(255) COLLATE "default"']
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('product', '0012_sales_rollups'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run_for_vendor({"postgresql": POSTGRES_FORWARD}),
+            run_for_vendor({"postgresql": POSTGRES_BACKWARD}),
+        ),
+    ]
@@ -0,0 +1,139 @@
+from django.db import migrations
+
+# SQL for the product search index, shared by the migrations that touch it. This module
+# starts with an underscore so the migration loader does not take it for a migration.
+# Both the SQLite FTS5 table and the PostgreSQL tsvector column are kept in sync by triggers,
+# so every write path (ORM, bulk_create, raw SQL, admin) updates the index in the same transaction.
+
+SQLITE_TABLE = [
+    """
+    CREATE VIRTUAL TABLE product_search USING fts5(
+        name, description, category, tokenize = 'unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    INSERT INTO product_search (rowid, name, description, category)
+    SELECT p.id, p.name, p.description, c.name
+    FROM product_product p JOIN product_category c ON c.id = p.category_id
+    """,
+]
+
+# SQLite drops the triggers of a table when a migration rebuilds it (most AddField and
+# AlterField operations do), so migrations that alter product_product or product_category
+# must wrap their operations with without_search_triggers()
+SQLITE_TRIGGERS = [
+    """
+    CREATE TRIGGER product_search_insert AFTER INSERT ON product_product BEGIN
+        INSERT INTO product_search (rowid, name, description, category)
+        VALUES (new.id, new.name, new.description,
+                (SELECT name FROM product_category WHERE id = new.category_id));
+    END
+    """,
+    # Only the indexed columns fire this trigger, stock updates do not touch the index
+    """
+    CREATE TRIGGER product_search_update AFTER UPDATE OF name, description, category_id
+    ON product_product BEGIN
+        DELETE FROM product_search WHERE rowid = old.id;
+        INSERT INTO product_search (rowid, name, description, category)
+        VALUES (new.id, new.name, new.description,
+                (SELECT name FROM product_category WHERE id = new.category_id));
+    END
+    """,
+    """
+    CREATE TRIGGER product_search_delete AFTER DELETE ON product_product BEGIN
+        DELETE FROM product_search WHERE rowid = old.id;
+    END
+    """,
+    """
+    CREATE TRIGGER product_search_category_update AFTER UPDATE OF name ON product_category BEGIN
+        UPDATE product_search SET category = new.name
+        WHERE rowid IN (SELECT id FROM product_product WHERE category_id = new.id);
+    END
+    """,
+]
+
+SQLITE_DROP_TRIGGERS = [
+    "DROP TRIGGER IF EXISTS product_search_category_update",
+    "DROP TRIGGER IF EXISTS product_search_delete",
+    "DROP TRIGGER IF EXISTS product_search_update",
+    "DROP TRIGGER IF EXISTS product_search_insert",
+]
+
+SQLITE_FORWARD = SQLITE_TABLE + SQLITE_TRIGGERS
+SQLITE_BACKWARD = SQLITE_DROP_TRIGGERS + ["DROP TABLE IF EXISTS product_search"]
+
+# Name weighs most (A), then category (B), then description (C)
+POSTGRES_VECTOR = """
+    setweight(to_tsvector('english', coalesce({p}.name, '')), 'A') ||
+    setweight(to_tsvector('english', coalesce({category}, '')), 'B') ||
+    setweight(to_tsvector('english', coalesce({p}.description, '')), 'C')
+"""
+
+POSTGRES_FORWARD = [
+    "ALTER TABLE product_product ADD COLUMN search_vector tsvector",
+    f"""
+    CREATE FUNCTION product_search_refresh() RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector := {POSTGRES_VECTOR.format(
+            p="NEW", category="(SELECT name FROM product_category WHERE id = NEW.category_id)"
+        )};
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE TRIGGER product_search_refresh BEFORE INSERT OR UPDATE OF name, description, category_id
+    ON product_product FOR EACH ROW EXECUTE FUNCTION product_search_refresh()
+    """,
+    f"""
+    CREATE FUNCTION product_search_category_refresh() RETURNS trigger AS $$
+    BEGIN
+        UPDATE product_product p SET search_vector = {POSTGRES_VECTOR.format(p="p", category="NEW.name")}
+        WHERE p.category_id = NEW.id;
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE TRIGGER product_search_category_refresh AFTER UPDATE OF name ON product_category
+    FOR EACH ROW EXECUTE FUNCTION product_search_category_refresh()
+    """,
+    f"""
+    UPDATE product_product p SET search_vector = {POSTGRES_VECTOR.format(p="p", category="c.name")}
+    FROM product_category c WHERE c.id = p.category_id
+    """,
+    "CREATE INDEX product_search_vector_idx ON product_product USING GIN (search_vector)",
+]
+
+POSTGRES_BACKWARD = [
+    "DROP TRIGGER IF EXISTS product_search_category_refresh ON product_category",
+    "DROP FUNCTION IF EXISTS product_search_category_refresh()",
+    "DROP TRIGGER IF EXISTS product_search_refresh ON product_product",
+    "DROP FUNCTION IF EXISTS product_search_refresh()",
+    "ALTER TABLE product_product DROP COLUMN IF EXISTS search_vector",
+]
+
+
+def run_for_vendor(statements):
+    def run(apps, schema_editor):
+        # Other databases fall back to the icontains search in product/search.py
+        vendor_statements = statements.get(schema_editor.connection.vendor, [])
+        for statement in vendor_statements:
+            schema_editor.execute(statement)
+
+    return run
+
+
+def without_search_triggers(operations):
+    """
+    Wrap migration operations that rebuild product_product or product_category on SQLite:
+    the triggers are dropped before and created again after. The FTS rows are keyed by
+    product id, which the rebuild keeps, so the index content stays valid.
+    """
+    drop = run_for_vendor({"sqlite": SQLITE_DROP_TRIGGERS})
+    create = run_for_vendor({"sqlite": SQLITE_TRIGGERS})
+    return [
+        migrations.RunPython(drop, create),
+        *operations,
+        migrations.RunPython(create, drop),
+    ]
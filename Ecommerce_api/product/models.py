@@ -1,12 +1,239 @@
-from django.db import models
+from collections import defaultdict
+
+from django.db import IntegrityError, models, transaction
+from django.db.models import Case, F, FloatField, Value, When
+from django.db.models.functions import Cast, Concat, Substr
+from django.core.exceptions import ValidationError
 from django.contrib.auth.models import User
+from django.utils import timezone
+
+from .cache import catalog_cache
+
+
+def path_ids(path):
+    """
+    "/1/5/9/" -> [1, 5, 9]: the ids of the categories from the root down to the node.
+    """
+    return [int(part) for part in path.strip("/").split("/") if part]
+
+
+# custom queryset for the category tree, subtrees are ranges of the materialized path
+class CategoryQuerySet(models.QuerySet):
+    def subtree(self, path):
+        """
+        The category with this path and all its descendants, as one range on the path index.
+        Every descendant path starts with "/1/5/", and since "/" sorts right before "0" they all
+        fall between "/1/5/" and "/1/50" (a LIKE 'prefix%' would not use the index on SQLite).
+        That is byte order: SQLite's default, and the "C" collation of the column on PostgreSQL
+        (migration 0013). Any query on a range of paths relies on it (see analytics.py).
+        """
+        return self.filter(path__gte=path, path__lt=path[:-1] + "0")
+
+    def add_product_counts(self, deltas, paths=None):
+        """
+        Apply {category_id: change of its number of products} to those categories and all their
+        ancestors: one SELECT for the paths the caller does not already know ({category_id: path}),
+        then one UPDATE per distinct change.
+        """
+        deltas = {category_id: delta for category_id, delta in deltas.items() if category_id and delta}
+        if not deltas:
+            return
+        paths = {category_id: path for category_id, path in (paths or {}).items() if category_id in deltas and path}
+        missing = [category_id for category_id in deltas if category_id not in paths]
+        if missing:
+            paths.update(self.filter(pk__in=missing).values_list("id", "path"))
+        totals = defaultdict(int)
+        for category_id, path in paths.items():
+            for ancestor_id in path_ids(path):
+                totals[ancestor_id] += deltas[category_id]
+        by_delta = defaultdict(list)
+        for category_id, delta in totals.items():
+            if delta:
+                by_delta[delta].append(category_id)
+        for delta, ids in by_delta.items():
+            self.filter(pk__in=ids).update(product_count=F("product_count") + delta)
+
+    def rebuild(self):
+        """
+        Recompute every path and product count from the parent links and the products, for
+        data written without the model methods (bulk_create, raw SQL). Returns the number of
+        categories that changed.
+        """
+        categories = {category.pk: category for category in self.only("id", "parent_id", "path", "product_count")}
+        paths = {}
+
+        def path_of(category):
+            if category.pk not in paths:
+                parent = categories.get(category.parent_id)
+                paths[category.pk] = f"{path_of(parent) if parent else '/'}{category.pk}/"
+            return paths[category.pk]
+
+        counts = defaultdict(int)
+        direct = Product.objects.order_by().values_list("category_id").annotate(total=models.Count("id"))
+        for category_id, total in direct:
+            if category_id in categories:
+                for ancestor_id in path_ids(path_of(categories[category_id])):
+                    counts[ancestor_id] += total
+
+        changed = []
+        for category in categories.values():
+            path, count = path_of(category), counts[category.pk]
+            if (category.path, category.product_count) != (path, count):
+                category.path, category.product_count = path, count
+                changed.append(category)
+        self.bulk_update(changed, ["path", "product_count"], batch_size=500)
+        return len(changed)
+
+    def tree(self):
+        """
+        The whole tree in one query: nested {id, name, product_count, children} dicts,
+        siblings sorted by name.
+        """
+        nodes, roots = {}, []
+        for row in self.order_by("path").values("id", "name", "parent_id", "product_count"):
+            # Sorted by path, a parent always comes before its children
+            parent = nodes.get(row.pop("parent_id"))
+            node = nodes[row["id"]] = {**row, "children": []}
+            (parent["children"] if parent else roots).append(node)
+        for node in [*nodes.values(), {"children": roots}]:
+            node["children"].sort(key=lambda child: (child["name"], child["id"]))
+        return roots
 
 
 # this class for storig category instences with all data required
 class Category(models.Model):
     name = models.CharField(max_length=100)  # name of category is a required field
+    parent = models.ForeignKey(
+        "self", related_name="children", null=True, blank=True, on_delete=models.CASCADE
+    )  # the parent category, empty for the top level ones
+    # materialized path, the ids from the root down to this category ("/1/5/"), kept by save();
+    # compared in byte order (COLLATE "C" on PostgreSQL, see CategoryQuerySet.subtree)
+    path = models.CharField(max_length=255, editable=False, default="")
+    # number of products in this category and all its subcategories, kept by the Product signals
+    product_count = models.PositiveIntegerField(default=0, editable=False)
+
+    objects = CategoryQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # subtree lookups are range scans of the path (CategoryQuerySet.subtree)
+            models.Index(fields=["path"], name="category_path_idx"),
+        ]
+
     def __str__(self):
         return self.name
+
+    def save(self, *args, **kwargs):
+        """
+        Keep the path of the category and of its subtree in line with the parent.
+        A move rewrites the descendant paths with one UPDATE and moves the product count
+        from the old ancestors to the new ones.
+        """
+        with transaction.atomic():
+            parent_path = "/"
+            if self.parent_id is not None:
+                parent_path = Category.objects.filter(pk=self.parent_id).values_list("path", flat=True).get()
+            if self._state.adding:
+                super().save(*args, **kwargs)
+                self.path = f"{parent_path}{self.pk}/"
+                Category.objects.filter(pk=self.pk).update(path=self.path)
+                return
+
+            old_path, count = Category.objects.filter(pk=self.pk).values_list("path", "product_count").get()
+            if parent_path.startswith(old_path):
+                raise ValidationError("A category can not be moved under itself or one of its subcategories.")
+            self.path = f"{parent_path}{self.pk}/"
+            if self.path != old_path:
+                Category.objects.subtree(old_path).update(
+                    path=Concat(Value(self.path), Substr("path", len(old_path) + 1))
+                )
+                old_ancestors, new_ancestors = path_ids(old_path)[:-1], path_ids(self.path)[:-1]
+                Category.objects.filter(pk__in=old_ancestors).update(product_count=F("product_count") - count)
+                Category.objects.filter(pk__in=new_ancestors).update(product_count=F("product_count") + count)
+            # The count belongs to the Product signals, never write back the one of this instance
+            self.product_count = count
+            kwargs.setdefault("update_fields", [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != "product_count"
+            ])
+            super().save(*args, **kwargs)
+
+
+# custom queryset for product so stock changes happen in the database and not in python
+class ProductQuerySet(models.QuerySet):
+    def _take_stock(self, product_id, quantity, **changes):
+        """
+        The conditional UPDATE of decrement_stock and hold_stock. It only matches when enough
+        stock is left, so two checkouts racing on the same product can never push the stock
+        below zero. Returns None when there was not enough, otherwise whether the product sold
+        out with it (the catalog cache only needs to move then, see CatalogCache.stock_changed).
+        Leaving stock is the common case and one UPDATE; the second one, for the exact rest of
+        the stock, tells a sell-out without reading the row.
+        """
+        if self.filter(pk=product_id, stock_quantity__gt=quantity).update(**changes):
+            return False
+        if self.filter(pk=product_id, stock_quantity=quantity).update(**changes):
+            return True
+        return None
+
+    def decrement_stock(self, product_id, quantity):
+        """
+        Atomically take `quantity` units from the product stock.
+        Returns None when there was not enough stock, otherwise whether the product sold out.
+        """
+        return self._take_stock(product_id, quantity, stock_quantity=F("stock_quantity") - quantity)
+
+    def hold_stock(self, product_id, quantity):
+        """
+        Move `quantity` units of the stock to the reserved units (a checkout hold), with the
+        same conditional UPDATE as decrement_stock. stock_quantity stays the stock that can
+        still be sold, so the availability of a product never needs the reservations table.
+        Returns None when the units are not there, otherwise whether the product sold out.
+        """
+        return self._take_stock(
+            product_id,
+            quantity,
+            stock_quantity=F("stock_quantity") - quantity,
+            reserved_quantity=F("reserved_quantity") + quantity,
+        )
+
+    def return_held_stock(self, quantities):
+        """
+        Give the held units of ended reservations back to the stock: {product_id: units}.
+        The products that still had stock and the sold out ones are two UPDATEs (adding units
+        never empties a stock, so the second one only sees the ones sold out before).
+        Returns the number of products back in stock.
+        """
+        if not quantities:
+            return 0
+        cases = [When(id=product_id, then=Value(units)) for product_id, units in quantities.items()]
+        units = Case(*cases, default=Value(0), output_field=models.PositiveIntegerField())
+        changes = {
+            "stock_quantity": F("stock_quantity") + units,
+            "reserved_quantity": F("reserved_quantity") - units,
+        }
+        self.filter(id__in=list(quantities), stock_quantity__gt=0).update(**changes)
+        return self.filter(id__in=list(quantities), stock_quantity=0).update(**changes)
+
+    def apply_review_delta(self, product_id, count_delta, sum_delta):
+        """
+        Update the denormalized review aggregates of a product in one UPDATE.
+        The average is recomputed from the new sum and count inside the same statement,
+        so concurrent reviews never read a stale average.
+        """
+        new_count = F("rating_count") + count_delta
+        new_sum = F("rating_sum") + sum_delta
+        return self.filter(pk=product_id).update(
+            rating_count=new_count,
+            rating_sum=new_sum,
+            rating_avg=Case(
+                When(rating_count=-count_delta, then=0.0),  # the last review was removed
+                default=Cast(new_sum, FloatField()) / new_count,
+                output_field=FloatField(),
+            ),
+        )
+
+
 # this tabel for storig product instences with all data required
 class Product(models.Model):
     name = models.CharField(
@@ -24,6 +251,38 @@ class Product(models.Model):
     )  # we set the default value to 0
     created_date = models.DateTimeField(auto_now_add=True)
     category = models.ForeignKey('Category',related_name='products',on_delete=models.CASCADE)
+    sku = models.CharField(
+        max_length=64, unique=True, null=True, blank=True
+    )  # supplier stock keeping unit, the natural key used by the bulk import to update existing products
+    # review aggregates, maintained incrementally by the Review signals (see signals.py)
+    rating_count = models.PositiveIntegerField(default=0, editable=False)  # number of reviews
+    rating_sum = models.PositiveIntegerField(default=0, editable=False)  # sum of all ratings, the average is derived from it
+    rating_avg = models.FloatField(default=0, editable=False)  # average rating, 0 when there is no review
+    # units held by active checkout reservations, already taken out of stock_quantity (see Reservation)
+    reserved_quantity = models.PositiveIntegerField(default=0, editable=False)
+
+    objects = ProductQuerySet.as_manager()
+
+    class Meta:
+        # indexes for the access paths used by ProductViewSet and ProductFilter
+        indexes = [
+            # default ordering of the product list and the keyset pagination key
+            models.Index(fields=["name", "id"], name="product_name_id_idx"),
+            # ?category=x listing in the default (name, id) order, without a sort step
+            models.Index(fields=["category", "name", "id"], name="product_category_name_idx"),
+            # ?category=x&min_price=..&max_price=.. is an equality followed by a range
+            models.Index(fields=["category", "price"], name="product_category_price_idx"),
+            # price ranges without a category
+            models.Index(fields=["price"], name="product_price_idx"),
+            # ?min_rating=x and ?ordering=-rating
+            models.Index(fields=["-rating_avg", "id"], name="product_rating_idx"),
+            # ?in_stock=true listing, only in-stock rows are indexed so it stays small
+            models.Index(
+                fields=["name", "id"],
+                condition=models.Q(stock_quantity__gt=0),
+                name="product_in_stock_idx",
+            ),
+        ]
 
     def __str__(self):
         return self.name
@@ -41,23 +300,150 @@ class Order(models.Model):
     ordered_at = models.DateTimeField(
         auto_now_add=True
     )  # Date and time when the order was placed
+    # the price is captured when the order is placed, later price changes do not touch old orders
+    unit_price = models.DecimalField(max_digits=10, decimal_places=2, editable=False)
+    line_total = models.DecimalField(max_digits=12, decimal_places=2, editable=False)  # unit_price * quantity, kept by save()
+    # set once the order is counted in the daily sales rollups, so it is never counted twice (see analytics.py)
+    rolled_up = models.BooleanField(default=False, editable=False)
+
+    class Meta:
+        indexes = [
+            # a user's order history, by date and by id (OrderViewSet ordering)
+            models.Index(fields=["user", "ordered_at"], name="order_user_ordered_at_idx"),
+            models.Index(fields=["user", "id"], name="order_user_id_idx"),
+            # date range of every order (staff history, exports)
+            models.Index(fields=["ordered_at"], name="order_ordered_at_idx"),
+        ]
 
     def __str__(self):
         return f"Order {self.id} by {self.user}"
 
+    def fill_prices(self):
+        """
+        Capture the current product price (on creation) and compute the line total.
+        Code creating orders with bulk_create must call it, save() is skipped there.
+        The price stays the captured one on updates, OrderSerializer refuses to change the product.
+        """
+        if self.unit_price is None:
+            self.unit_price = self.product.price
+        self.line_total = self.unit_price * self.quantity
+
     # the save method to reduce the stock quantity after order is placed and to save the order
-    def save(self, *args, **kwargs):
-        # Check if there's enough stock before placing the order
-        if self.product.stock_quantity < self.quantity:
-            raise ValidationError(
-                f"Not enough stock for {self.product.name}. Available stock is {self.product.stock_quantity}."
-            )
+    def save(self, *args, take_stock=True, **kwargs):
+        self.fill_prices()
+        # Stock is only taken when the order is first created, updates leave it alone.
+        # Orders confirmed from a reservation pass take_stock=False, the hold already took it
+        if not self._state.adding or not take_stock:
+            return super().save(*args, **kwargs)
+
+        # The conditional UPDATE and the INSERT share one transaction so a failed insert gives the stock back
+        with transaction.atomic():
+            sold_out = Product.objects.decrement_stock(self.product_id, self.quantity)
+            if sold_out is None:
+                available = Product.objects.filter(pk=self.product_id).values_list("stock_quantity", flat=True).first()
+                raise ValidationError(
+                    f"Not enough stock for {self.product.name}. Available stock is {available}."
+                )
+            super().save(*args, **kwargs)
+        # Stock is part of the cached product responses
+        catalog_cache.stock_changed([self.product_id], sold_out)
+
+
+# this class for storig checkout holds, stock set aside for a user for a short time
+class Reservation(models.Model):
+    ACTIVE = "active"
+    CONFIRMED = "confirmed"  # turned into an order
+    RELEASED = "released"  # cancelled by the user
+    EXPIRED = "expired"  # not confirmed in time, the units went back to the stock
+    STATUS_CHOICES = [(ACTIVE, "Active"), (CONFIRMED, "Confirmed"), (RELEASED, "Released"), (EXPIRED, "Expired")]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    product = models.ForeignKey(Product, related_name="reservations", on_delete=models.CASCADE)
+    quantity = models.PositiveIntegerField()
+    # the price is captured with the hold, the order placed on confirm keeps it
+    unit_price = models.DecimalField(max_digits=10, decimal_places=2, editable=False)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=ACTIVE, editable=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(editable=False)
+    order = models.OneToOneField(
+        Order, related_name="reservation", null=True, blank=True, editable=False, on_delete=models.SET_NULL
+    )  # the order placed on confirm
+
+    class Meta:
+        indexes = [
+            # the expiry sweep walks the active holds by expiry time, only active rows are indexed
+            models.Index(fields=["expires_at"], condition=models.Q(status="active"), name="reservation_expiry_idx"),
+            # the expired holds of one product, freed when a new hold finds no stock
+            models.Index(
+                fields=["product", "expires_at"], condition=models.Q(status="active"), name="reservation_product_expiry_idx"
+            ),
+            # a user's reservations (ReservationViewSet)
+            models.Index(fields=["user", "id"], name="reservation_user_id_idx"),
+        ]
+
+    def __str__(self):
+        return f"Reservation {self.id} of {self.quantity} x {self.product_id} by {self.user_id}"
+
+
+# custom queryset for the daily sales rollups
+class SalesRollupQuerySet(models.QuerySet):
+    def add_sale(self, day, units, revenue, **key):
+        """
+        Add one order to the row of its day (and product or category), creating the row with
+        the first order of the day. The counters are incremented inside the UPDATE, so
+        concurrent workers never lose a sale.
+        """
+        increments = {"units": F("units") + units, "revenue": F("revenue") + revenue, "orders": F("orders") + 1}
+        if self.filter(day=day, **key).update(**increments):
+            return
+        try:
+            with transaction.atomic():
+                self.create(day=day, units=units, revenue=revenue, orders=1, **key)
+        except IntegrityError:  # another worker created the row meanwhile
+            self.filter(day=day, **key).update(**increments)
 
-        # Reduce stock quantity after order is placed
-        self.product.stock_quantity -= self.quantity
-        self.product.save()
 
-        super().save(*args, **kwargs)
+# the columns shared by the daily sales rollups, one row per day and key (see analytics.py)
+class SalesRollup(models.Model):
+    day = models.DateField()  # day of the orders, in the TIME_ZONE of the settings
+    units = models.PositiveIntegerField(default=0)  # units sold
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)  # sum of the line totals
+    orders = models.PositiveIntegerField(default=0)  # number of orders
+
+    objects = SalesRollupQuerySet.as_manager()
+
+    class Meta:
+        abstract = True
+
+
+# this class for storig the sales of one product on one day
+class DailyProductSales(SalesRollup):
+    product = models.ForeignKey(Product, related_name="daily_sales", on_delete=models.CASCADE)
+
+    class Meta:
+        constraints = [
+            # one row per product and day, also the index of a product's history by date
+            models.UniqueConstraint(fields=["product", "day"], name="daily_product_sales_unique"),
+        ]
+        indexes = [
+            # every product over a date range
+            models.Index(fields=["day", "product"], name="daily_product_sales_day_idx"),
+        ]
+
+
+# this class for storig the sales of one category (its own products, not the subcategories) on one day
+class DailyCategorySales(SalesRollup):
+    category = models.ForeignKey(Category, related_name="daily_sales", on_delete=models.CASCADE)
+
+    class Meta:
+        constraints = [
+            # one row per category and day, also the index of a category's history by date
+            models.UniqueConstraint(fields=["category", "day"], name="daily_category_sales_unique"),
+        ]
+        indexes = [
+            # every category over a date range
+            models.Index(fields=["day", "category"], name="daily_category_sales_day_idx"),
+        ]
 
 
 # this class for storig review instences with all data required
@@ -70,7 +456,41 @@ class Review(models.Model):
     comment = models.TextField()
     created_date = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # reviews of one product, newest first (/api/products/{id}/reviews/)
+            models.Index(fields=["product", "created_date", "id"], name="review_product_created_idx"),
+        ]
+
     def __str__(self):
         return f"{self.user.username}'s review of {self.product.name}"
 
 
+# this class for storig the events of the transactional outbox: they are written in the transaction
+# of the change they describe and handled later by the outbox workers (see outbox.py)
+class OutboxEvent(models.Model):
+    PENDING = "pending"
+    DEAD = "dead"  # every attempt failed, kept for inspection (handled events are deleted)
+    STATUS_CHOICES = [(PENDING, "Pending"), (DEAD, "Dead")]
+
+    topic = models.CharField(max_length=100)  # what happened, e.g. "order.placed"
+    payload = models.JSONField(default=dict)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveIntegerField(default=0)  # times a worker took the event
+    created_at = models.DateTimeField(auto_now_add=True)
+    # the event is not handed to a worker before this time: the retry backoff and the lease of
+    # the worker that claimed it both push it forward
+    available_at = models.DateTimeField(default=timezone.now)
+    claim = models.CharField(max_length=32, blank=True, editable=False)  # token of the last claim
+    last_error = models.TextField(blank=True)
+
+    class Meta:
+        indexes = [
+            # the workers claim the due pending events, only pending rows are indexed
+            models.Index(fields=["available_at", "id"], condition=models.Q(status="pending"), name="outbox_pending_idx"),
+            # the events taken by one claim
+            models.Index(fields=["claim"], name="outbox_claim_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.topic} event {self.id} ({self.status})"
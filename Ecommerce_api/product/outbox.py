@@ -0,0 +1,124 @@
+import json
+import logging
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Min, Q
+from django.utils import timezone
+
+from .models import OutboxEvent, Product
+
+logger = logging.getLogger(__name__)
+
+ORDER_PLACED = "order.placed"
+
+# Set when this process commits new events, it wakes the idle worker pools (see workers.py)
+wakeup = threading.Event()
+
+
+def outbox_settings():
+    return getattr(settings, "OUTBOX", {})
+
+
+# --------------------
+# HANDLER REGISTRY
+# --------------------
+# topic -> functions called with the payload of each event of the topic
+HANDLERS = defaultdict(list)
+
+
+def handles(topic):
+    """
+    Register the decorated function as a handler of the topic's events.
+    Delivery is at-least-once: a handler may see the same event again (a failed sibling
+    handler, a worker that died before deleting it), so it has to be idempotent.
+    """
+
+    def register(func):
+        HANDLERS[topic].append(func)
+        return func
+
+    return register
+
+
+# --------------------
+# PUBLISHING
+# --------------------
+def enqueue(topic, payloads):
+    """
+    Write one event per payload with a single INSERT. Called inside the transaction of the
+    change, the events commit (or roll back) with it: nothing is published for an order that
+    was not placed, and nothing placed is lost if the process dies right after the commit.
+    The idle worker pools of this process are woken once the transaction commits.
+    """
+    events = OutboxEvent.objects.bulk_create([OutboxEvent(topic=topic, payload=payload) for payload in payloads])
+    transaction.on_commit(wakeup.set)
+    return events
+
+
+def publish_orders_placed(orders):
+    """
+    Enqueue an "order.placed" event per order (stock alerts, emails, analytics run later).
+    """
+    return enqueue(
+        ORDER_PLACED,
+        [
+            {
+                "order": order.pk,
+                "user": order.user_id,
+                "product": order.product_id,
+                "quantity": order.quantity,
+                "unit_price": f"{order.unit_price:.2f}",
+                "line_total": f"{order.line_total:.2f}",
+                "ordered_at": order.ordered_at.isoformat(),
+            }
+            for order in orders
+        ],
+    )
+
+
+# --------------------
+# METRICS
+# --------------------
+def outbox_metrics(now=None):
+    """
+    Queue depth and lag from the table, in one aggregate query: the pending events, how many
+    of them are due, the dead ones, and the age in seconds of the oldest pending event.
+    """
+    now = now or timezone.now()
+    pending = Q(status=OutboxEvent.PENDING)
+    row = OutboxEvent.objects.aggregate(
+        depth=Count("id", filter=pending),
+        due=Count("id", filter=pending & Q(available_at__lte=now)),
+        dead=Count("id", filter=Q(status=OutboxEvent.DEAD)),
+        oldest=Min("created_at", filter=pending),
+    )
+    oldest = row.pop("oldest")
+    row["lag_s"] = round((now - oldest).total_seconds(), 3) if oldest else 0.0
+    return row
+
+
+# --------------------
+# HANDLERS
+# --------------------
+@handles(ORDER_PLACED)
+def alert_low_stock(payload):
+    """
+    Warn when an order left its product at or below OUTBOX["LOW_STOCK_THRESHOLD"] units.
+    """
+    threshold = outbox_settings().get("LOW_STOCK_THRESHOLD", 5)
+    product = Product.objects.filter(pk=payload["product"]).values("name", "stock_quantity").first()
+    if product and product["stock_quantity"] <= threshold:
+        logger.warning(
+            json.dumps(
+                {
+                    "event": "low_stock",
+                    "product": payload["product"],
+                    "name": product["name"],
+                    "stock_quantity": product["stock_quantity"],
+                    "order": payload["order"],
+                }
+            )
+        )
@@ -0,0 +1,223 @@
+import base64
+import json
+
+from django.conf import settings
+from django.core.paginator import InvalidPage, Page, Paginator
+from django.db.models import Q
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+# --------------------
+# KEYSET PAGINATION
+# --------------------
+class KeysetPagination(BasePagination):
+    """
+    Cursor (keyset) pagination on a composite key such as (name, id).
+
+    Instead of OFFSET, every page starts right after the key of the last row of the
+    previous page: WHERE name > 'x' OR (name = 'x' AND id > 42) ORDER BY name, id LIMIT n.
+    With an index on the key the cost of a page does not depend on how deep it is.
+    The last field of the key must be unique (the primary key) so the order is stable.
+    The total count is skipped unless the client asks for it with ?count=true.
+    """
+
+    cursor_query_param = "cursor"
+    page_size_query_param = "page_size"
+    count_query_param = "count"
+    max_page_size = 100
+
+    def __init__(self, ordering):
+        self.ordering = tuple(ordering)
+
+    def get_page_size(self, request):
+        page_size = settings.REST_FRAMEWORK.get("PAGE_SIZE", 10)
+        try:
+            page_size = int(request.query_params.get(self.page_size_query_param, page_size))
+        except ValueError:
+            pass
+        return max(1, min(page_size, self.max_page_size))
+
+    def encode_cursor(self, values, reverse):
+        raw = json.dumps({"v": values, "r": reverse}, default=str, separators=(",", ":"))
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            padded = encoded + "=" * (-len(encoded) % 4)
+            data = json.loads(base64.urlsafe_b64decode(padded.encode()))
+            values, reverse = data["v"], bool(data["r"])
+        except (ValueError, KeyError, TypeError):
+            raise NotFound("Invalid cursor.")
+        if not isinstance(values, list) or len(values) != len(self.ordering):
+            raise NotFound("Invalid cursor.")
+        return values, reverse
+
+    def _after(self, values, reverse):
+        """
+        Build the "strictly after this key" predicate, walking the key from left to right.
+        """
+        condition = Q()
+        equal = Q()
+        for field, value in zip(self.ordering, values):
+            descending = field.startswith("-")
+            name = field.lstrip("-")
+            lookup = "lt" if descending != reverse else "gt"
+            condition |= equal & Q(**{f"{name}__{lookup}": value})
+            equal &= Q(**{name: value})
+        return condition
+
+    def _key(self, obj):
+        # Rows are model instances, or dicts when the view paginates a values() queryset
+        if isinstance(obj, dict):
+            return [obj[field.lstrip("-")] for field in self.ordering]
+        return [getattr(obj, field.lstrip("-")) for field in self.ordering]
+
+    def wants_count(self, request):
+        return request.query_params.get(self.count_query_param) == "true"
+
+    def page_queryset(self, queryset, request):
+        """
+        Read the cursor from the request and return the query of the page, with one extra
+        row to know whether there is a next one.
+        """
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.key, self.reverse = self.decode_cursor(request)
+
+        ordering = self.ordering
+        if self.reverse:
+            # Walking backwards: flip every direction, then flip the page back at the end
+            ordering = tuple(f[1:] if f.startswith("-") else f"-{f}" for f in ordering)
+        queryset = queryset.order_by(*ordering)
+        if self.key is not None:
+            queryset = queryset.filter(self._after(self.key, self.reverse))
+        return queryset[: self.page_size + 1]
+
+    def finish_page(self, rows):
+        has_more = len(rows) > self.page_size
+        rows = rows[: self.page_size]
+        if self.reverse:
+            rows.reverse()
+
+        # Going forward there is a previous page whenever we came from a cursor and
+        # a next page when we fetched one extra row; going backwards it is the opposite
+        if self.reverse:
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, self.key is not None
+        self.first_key = self._key(rows[0]) if rows else None
+        self.last_key = self._key(rows[-1]) if rows else None
+        return rows
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.count = queryset.count() if self.wants_count(request) else None
+        return self.finish_page(list(self.page_queryset(queryset, request)))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """
+        paginate_queryset() for async views, with the async ORM.
+        """
+        self.count = await queryset.acount() if self.wants_count(request) else None
+        return self.finish_page([row async for row in self.page_queryset(queryset, request)])
+
+    def get_next_link(self):
+        if not self.has_next or self.last_key is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.last_key, False))
+
+    def get_previous_link(self):
+        if not self.has_previous or self.first_key is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.first_key, True))
+
+    def get_paginated_response(self, data):
+        response = {
+            "next": self.get_next_link(),
+            "previous": self.get_previous_link(),
+            "results": data,
+        }
+        if self.count is not None:
+            response = {"count": self.count, **response}
+        return Response(response)
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "count": {"type": "integer"},
+                "next": {"type": "string", "nullable": True},
+                "previous": {"type": "string", "nullable": True},
+                "results": schema,
+            },
+        }
+
+
+class AsyncPageNumberPagination(PageNumberPagination):
+    """
+    The default PageNumberPagination for async views: same pages, links and errors, but the
+    count and the page are read with the async ORM.
+    """
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+
+        paginator = Paginator(queryset, page_size)
+        paginator.count = await queryset.acount()  # Paginator would count synchronously
+        page_number = self.get_page_number(request, paginator)
+        try:
+            number = paginator.validate_number(page_number)
+        except InvalidPage as exc:
+            raise NotFound(self.invalid_page_message.format(page_number=page_number, message=str(exc)))
+
+        bottom = (number - 1) * page_size
+        top = min(bottom + page_size, paginator.count)
+        rows = [row async for row in queryset[bottom:top]] if top > bottom else []
+        self.page = Page(rows, number, paginator)
+        return rows
+
+
+class KeysetPaginationMixin:
+    """
+    Lets a viewset opt into keyset pagination per request.
+    Clients start with ?pagination=cursor (or send a cursor) and follow the next/previous
+    links; every other request keeps the default PageNumberPagination.
+    The key is declared on the viewset with keyset_ordering, e.g. ("name", "id").
+    Pages always follow that key, so the query parameters that order the results some other
+    way (keyset_conflicting_params, e.g. ?search= and ?ordering=) are refused
+    with a 400 together with a cursor instead of being silently ignored.
+    """
+
+    keyset_ordering = ("id",)
+    keyset_conflicting_params = ()
+
+    def uses_keyset_pagination(self):
+        params = self.request.query_params
+        if not ("cursor" in params or params.get("pagination") == "cursor"):
+            return False
+        conflicts = [name for name in self.keyset_conflicting_params if params.get(name)]
+        if conflicts:
+            raise ValidationError({
+                name: "Can not be combined with cursor pagination, use page numbers." for name in conflicts
+            })
+        return True
+
+    @property
+    def paginator(self):
+        if not hasattr(self, "_paginator"):
+            if self.uses_keyset_pagination():
+                self._paginator = KeysetPagination(self.keyset_ordering)
+            else:
+                self._paginator = super().paginator
+        return self._paginator
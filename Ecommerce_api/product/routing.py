@@ -0,0 +1,126 @@
+import contextvars
+import random
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.permissions import SAFE_METHODS
+
+from .cache import catalog_cache
+
+
+# Set while a catalog read request runs: only then may queries go to a replica
+_replica_reads = contextvars.ContextVar("replica_reads", default=False)
+
+
+# --------------------
+# READ-YOUR-WRITES
+# --------------------
+def pin_to_primary(user_id):
+    """
+    Send the reads of this user to the primary for REPLICA_PIN_SECONDS, so a replica that
+    has not caught up yet can not hide the user's own writes (a new order, a review...).
+    The pin lives in the default cache, shared by the processes that share that cache.
+    """
+    seconds = getattr(settings, "REPLICA_PIN_SECONDS", 10)
+    cache.set(f"db:pinned:{user_id}", time.time() + seconds, timeout=seconds)
+
+
+def is_pinned(user_id):
+    return user_id is not None and cache.get(f"db:pinned:{user_id}") is not None
+
+
+@contextmanager
+def replica_reads(enabled=True):
+    """
+    Let the queries of the block read from a replica (when one is configured).
+    """
+    token = _replica_reads.set(enabled)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+def replica_reads_for(request, user):
+    """
+    Whether a request may read from the replicas: safe methods only, and never for a user
+    pinned to the primary by a recent write.
+    """
+    return request.method in SAFE_METHODS and not is_pinned(getattr(user, "pk", None))
+
+
+# --------------------
+# ROUTER
+# --------------------
+class PrimaryReplicaRouter:
+    """
+    Database router for a primary with read replicas (settings.DATABASE_REPLICAS).
+
+    Writes always go to the primary ("default"). Reads go to a random replica only inside
+    replica_reads(), which the catalog viewsets open for their GET requests; every other read
+    (order placement, the orders of a user, authentication, admin...) stays on the primary.
+    Replicas are copies of the primary, so relations between them are allowed and they are
+    never migrated themselves.
+    """
+
+    def replicas(self):
+        return getattr(settings, "DATABASE_REPLICAS", [])
+
+    def db_for_read(self, model, **hints):
+        replicas = self.replicas()
+        if replicas and _replica_reads.get():
+            return random.choice(replicas)
+        return "default"
+
+    def db_for_write(self, model, **hints):
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {"default", *self.replicas()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in self.replicas():
+            return False
+        return None
+
+
+class ReplicaReadMixin:
+    """
+    Viewset mixin serving GET requests from the read replicas.
+    The decision is taken after authentication (DRF initial()) because it depends on the user,
+    and a successful write by a logged in user pins that user to the primary. Views with a
+    catalog_scope (cached responses and ETags, see product/cache.py) also read from the
+    primary for a while after every write to their scope.
+    """
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if replica_reads_for(request, request.user) and not self.catalog_recently_changed():
+            self._replica_token = _replica_reads.set(True)
+
+    def catalog_recently_changed(self):
+        """
+        Whether the catalog_scope of the view moved less than REPLICA_PIN_SECONDS ago. The
+        response is cached and tagged under the new version: built from a replica that has
+        not replayed the write yet, the old rows would be served under the new key and ETag
+        until the next write.
+        """
+        scope = getattr(self, "catalog_scope", None)
+        if scope is None or not getattr(settings, "DATABASE_REPLICAS", []):
+            return False
+        modified = catalog_cache.response_modified(self, scope)
+        return time.time() - modified < getattr(settings, "REPLICA_PIN_SECONDS", 10)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        token = getattr(self, "_replica_token", None)
+        if token is not None:
+            _replica_reads.reset(token)
+            self._replica_token = None
+        if request.method not in SAFE_METHODS and response.status_code < 400 and request.user.is_authenticated:
+            pin_to_primary(request.user.pk)
+        return super().finalize_response(request, response, *args, **kwargs)
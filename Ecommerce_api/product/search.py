@@ -0,0 +1,112 @@
+import re
+
+from django.db import connection
+from django.db.models import Q
+from rest_framework.filters import BaseFilterBackend
+
+
+# --------------------
+# SEARCH BACKENDS
+# --------------------
+class SearchBackend:
+    """
+    Fallback search for databases without a full-text index: a plain icontains match on
+    every field, without relevance ranking. Fine for a small catalog, a table scan on a big one.
+    """
+
+    def search(self, queryset, terms, ranked=True):
+        condition = Q()
+        for term in terms:
+            condition &= (
+                Q(name__icontains=term)
+                | Q(description__icontains=term)
+                | Q(category__name__icontains=term)
+            )
+        return queryset.filter(condition)
+
+
+class SQLiteSearchBackend(SearchBackend):
+    """
+    Searches the product_search FTS5 table created by migration 0004.
+    Results are ordered by bm25 relevance (unless `ranked` is false), a match in the name
+    counts more than one in the category, which counts more than one in the description.
+    """
+
+    weights = (10.0, 1.0, 4.0)  # name, description, category (FTS5 column order)
+
+    def search(self, queryset, terms, ranked=True):
+        # Every term is quoted so user input can not inject FTS5 syntax; the last one is a
+        # prefix match so partial words typed in a search box already find something
+        match = " ".join('"{}"'.format(term.replace('"', '""')) for term in terms) + "*"
+        queryset = queryset.extra(
+            tables=["product_search"],
+            where=["product_search.rowid = product_product.id", "product_search MATCH %s"],
+            params=[match],
+        )
+        if not ranked:
+            return queryset
+        rank = "bm25(product_search, {})".format(", ".join(str(w) for w in self.weights))
+        return queryset.extra(select={"search_rank": rank}, order_by=["search_rank", "id"])  # bm25 is lower for better matches
+
+
+class PostgresSearchBackend(SearchBackend):
+    """
+    Searches the search_vector tsvector column (GIN indexed, migration 0004) and orders the
+    results by ts_rank (unless `ranked` is false).
+    """
+
+    def search(self, queryset, terms, ranked=True):
+        query = "websearch_to_tsquery('english', %s)"
+        text = " ".join(terms)
+        queryset = queryset.extra(where=[f"product_product.search_vector @@ {query}"], params=[text])
+        if not ranked:
+            return queryset
+        return queryset.extra(
+            select={"search_rank": f"ts_rank(product_product.search_vector, {query})"},
+            select_params=[text],
+            order_by=["-search_rank", "id"],
+        )
+
+
+def get_search_backend():
+    if connection.vendor == "sqlite":
+        return SQLiteSearchBackend()
+    if connection.vendor == "postgresql":
+        return PostgresSearchBackend()
+    return SearchBackend()
+
+
+# --------------------
+# FILTER BACKEND
+# --------------------
+class ProductSearchFilter(BaseFilterBackend):
+    """
+    ?search=<text> full-text search over product name, description and category name,
+    ordered by relevance. Works together with ProductFilter (filters are applied first): an
+    explicit ?ordering= wins, the results then keep that order instead of the relevance one.
+    """
+
+    search_param = "search"
+    ordering_param = "ordering"  # The ordering filter of ProductFilter
+
+    def get_search_terms(self, request):
+        text = request.query_params.get(self.search_param, "")
+        return re.findall(r"\w+", text)
+
+    def filter_queryset(self, request, queryset, view):
+        terms = self.get_search_terms(request)
+        if not terms:
+            return queryset
+        ranked = not request.query_params.get(self.ordering_param)
+        return get_search_backend().search(queryset, terms, ranked=ranked)
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                "name": self.search_param,
+                "required": False,
+                "in": "query",
+                "description": "Full-text search on name, description and category, ranked by relevance unless ordering is given.",
+                "schema": {"type": "string"},
+            }
+        ]
@@ -1,15 +1,125 @@
-from rest_framework import serializers
-from .models import Product, Order, Review , Category
+from rest_framework import ISO_8601, serializers
+from rest_framework.settings import api_settings
+from .categories import CategoryField, CategoryNameField, category_registry
+from .instrumentation import serializer_timer
+from .models import Product, Order, Reservation, Review , Category
+from .services import place_order, reserve_stock
 from django.contrib.auth.models import User
+from django.utils import timezone
+from datetime import timedelta
 
 
 # ProductSerializer is a class that is responsible for converting a Product model instance into a format that can be serialized into JSON format
 class ProductSerializer(serializers.ModelSerializer):
+    # The category is checked and named from the category registry, no query and no join
+    category = CategoryField()
+    category_name = CategoryNameField()
+
     # The Meta class is where we define the fields that we want to include from the Product model and how they should be serialized
     class Meta:
         model = Product
-        # We want to include all the fields from the Product model
-        fields = "__all__"
+        # We want to include all the fields from the Product model except the internal rating sum
+        # and the units held by checkouts (stock_quantity is already what is left for sale)
+        exclude = ["rating_sum", "reserved_quantity"]
+        # The review aggregates are maintained by the review signals, never by clients
+        read_only_fields = ["rating_avg", "rating_count"]
+        # stock_quantity is the stock still for sale, the units held by checkouts are not in it
+        # and come back to it when their holds end: a client setting it (a restock) sets the
+        # free units, whatever is held at the moment
+        extra_kwargs = {
+            "stock_quantity": {"help_text": "Units for sale, not counting the units held by open checkouts."}
+        }
+
+
+# Fields of the compact "card" representation (?view=card), what a product grid shows
+PRODUCT_CARD_FIELDS = ("id", "name", "price", "image_url", "stock_quantity", "rating_avg", "rating_count", "category")
+
+
+class ProductValuesSerializer:
+    """
+    Read-only serializer for product list pages, built for speed.
+
+    It works on plain dicts from queryset.values() instead of model instances and writes each
+    output dict directly, so there is no model instantiation and no per-field
+    get_attribute/to_representation round trip. Prices and dates are formatted the way the
+    matching ProductSerializer fields do it, so the output is the same as ProductSerializer
+    for the same rows. `fields` selects and orders the keys (all ProductSerializer fields by default)
+    and `columns` lists the values() columns to read for them (the field sources).
+    """
+
+    _template = None
+
+    @classmethod
+    def template(cls):
+        """
+        The bound fields of ProductSerializer, built once: building them costs more than
+        serializing a whole page.
+        """
+        if cls._template is None:
+            cls._template = ProductSerializer().fields
+        return cls._template
+
+    def __init__(self, fields=None):
+        template = self.template()
+        self.fields = list(fields or template.keys())
+        self.sources = [(name, template[name].source) for name in self.fields]
+        self.columns = list(dict.fromkeys(source for _, source in self.sources))
+        self.converters = {}
+        for name in self.fields:
+            converter = self.get_converter(template[name])
+            if converter is not None:
+                self.converters[name] = converter
+
+    @classmethod
+    def available_fields(cls):
+        return list(cls.template().keys())
+
+    @staticmethod
+    def get_converter(field):
+        """
+        Return the function turning a database value into its JSON value, or None when the
+        value is already right. The common formats are inlined: DRF's own to_representation
+        looks the time zone and the decimal context up again for every single value.
+        """
+        if isinstance(field, CategoryNameField):
+            # One registry lookup for the page, not one per row (get() for the ids it misses)
+            entries = category_registry.entries()
+
+            def category_name(value):
+                entry = entries.get(value) or category_registry.get(value)
+                return entry.name if entry else None
+
+            return category_name
+        if isinstance(field, serializers.DecimalField):
+            coerce_to_string = getattr(field, "coerce_to_string", api_settings.COERCE_DECIMAL_TO_STRING)
+            if coerce_to_string and field.decimal_places is not None and not (field.localize or field.normalize_output):
+                places = field.decimal_places
+                return lambda value: f"{value:.{places}f}"
+            return field.to_representation
+        if isinstance(field, serializers.DateTimeField):
+            if getattr(field, "format", api_settings.DATETIME_FORMAT) == ISO_8601:
+                tz = field.default_timezone()
+
+                def convert(value):
+                    if tz is not None:
+                        value = value.astimezone(tz)
+                    value = value.isoformat()
+                    return value[:-6] + "Z" if value.endswith("+00:00") else value
+
+                return convert
+            return field.to_representation
+        return None
+
+    def to_representation(self, row):
+        data = {name: row[source] for name, source in self.sources}
+        for name, convert in self.converters.items():
+            if data[name] is not None:
+                data[name] = convert(data[name])
+        return data
+
+    def serialize(self, rows):
+        with serializer_timer():
+            return [self.to_representation(row) for row in rows]
 
 
 # This class is used to serialize User objects into JSON format.
@@ -50,18 +160,71 @@ class UserSerializer(serializers.ModelSerializer):
 class OrderSerializer(serializers.ModelSerializer):
     """
     This class is used to serialize Order objects into JSON format and vice versa.
+    An order embeds the product name, the unit price captured when it was placed and the
+    line total, so an order history page needs no product request per line. The name comes
+    from the product joined by OrderViewSet.get_queryset.
     """
 
+    product_name = serializers.CharField(source="product.name", read_only=True)
+
     class Meta:
         model = Order
-        fields = "__all__"
+        fields = ["id", "user", "product", "product_name", "quantity", "unit_price", "line_total", "ordered_at"]
+        read_only_fields = ["unit_price", "line_total"]
+
+    def validate_product(self, product):
+        """
+        The product of a placed order can not be changed: its price was captured and its
+        stock taken when the order was placed. Staff cancel the order and place a new one.
+        """
+        if self.instance is not None and product.pk != self.instance.product_id:
+            raise serializers.ValidationError("The product of a placed order can not be changed.")
+        return product
 
     def create(self, validated_data):
         """
         This method is called when we want to create a new Order object.
-        The stock quantity reduction will happen in the save method of the model
+        The order placement service takes the stock with an atomic conditional update
+        and retries when the database is busy.
         """
-        return Order.objects.create(**validated_data)
+        return place_order(
+            validated_data["user"], validated_data["product"], validated_data["quantity"]
+        )
+
+
+class ReservationSerializer(serializers.ModelSerializer):
+    """
+    A checkout hold. Clients send the product and the quantity; the held price, the status
+    and the expiry time are set by the reservation service (see reserve_stock).
+    """
+
+    quantity = serializers.IntegerField(min_value=1)
+
+    class Meta:
+        model = Reservation
+        fields = ["id", "product", "quantity", "unit_price", "status", "created_at", "expires_at", "order"]
+        read_only_fields = ["unit_price", "status", "created_at", "expires_at", "order"]
+
+    def create(self, validated_data):
+        return reserve_stock(validated_data["user"], validated_data["product"], validated_data["quantity"])
+
+
+class BulkOrderLineSerializer(serializers.Serializer):
+    """
+    One line of a bulk checkout. The product is a plain id on purpose: validating it with
+    PrimaryKeyRelatedField would cost one query per line, the service checks all ids at once.
+    """
+
+    product = serializers.IntegerField(min_value=1)
+    quantity = serializers.IntegerField(min_value=1)
+
+
+class BulkOrderSerializer(serializers.Serializer):
+    """
+    This class is used to validate a whole cart sent to the bulk checkout endpoint.
+    """
+
+    lines = BulkOrderLineSerializer(many=True, allow_empty=False)
 
 
 class ReviewSerializer(serializers.ModelSerializer):
@@ -77,7 +240,80 @@ class ReviewSerializer(serializers.ModelSerializer):
     The fields attribute is a special attribute that can be used to select which fields to include in the output.
     In this case, we are including all the fields in the Review model.
     """
+
+
+class ProductReviewSerializer(serializers.ModelSerializer):
+    """
+    Read-only representation of a review inside /api/products/{id}/reviews/.
+    The reviewer username comes from the user row joined by the queryset (select_related),
+    so serializing a page costs no extra query per review.
+    """
+
+    username = serializers.CharField(source="user.username", read_only=True)
+
+    class Meta:
+        model = Review
+        fields = ["id", "user", "username", "rating", "comment", "created_date"]
+        read_only_fields = fields
+
+
 class CategorySerializer(serializers.ModelSerializer):
+    parent = CategoryField(required=False, allow_null=True)  # checked against the category registry
+
     class Meta:
         model = Category
-        fields = ["id", "name"]
\ No newline at end of file
+        fields = ["id", "name", "parent", "path", "product_count"]
+        read_only_fields = ["path", "product_count"]  # kept by Category.save() and the Product signals
+
+    def validate_parent(self, parent):
+        """
+        A category can not become its own descendant.
+        """
+        if parent is not None and self.instance is not None and parent.path.startswith(self.instance.path):
+            raise serializers.ValidationError("A category can not be moved under itself or one of its subcategories.")
+        return parent
+
+# --------------------
+# SALES ANALYTICS
+# --------------------
+class SalesQuerySerializer(serializers.Serializer):
+    """
+    Query string of the sales reports: ?start= and ?end= are dates (inclusive, the last 30 days
+    by default), ?product= and ?category= narrow the rows, ?totals=true sums the whole range.
+    """
+
+    start = serializers.DateField(required=False)
+    end = serializers.DateField(required=False)
+    product = serializers.IntegerField(required=False, min_value=1)
+    category = CategoryField(required=False)  # checked against the category registry
+    totals = serializers.BooleanField(required=False, default=False)
+
+    def validate(self, attrs):
+        attrs["end"] = attrs.get("end") or timezone.localdate()
+        attrs["start"] = attrs.get("start") or attrs["end"] - timedelta(days=29)
+        if attrs["start"] > attrs["end"]:
+            raise serializers.ValidationError({"start": "The start date must not be after the end date."})
+        return attrs
+
+
+class SalesSerializer(serializers.Serializer):
+    """
+    One row of a sales report, read from the dicts of the rollup queries. The day is
+    missing from the totals rows.
+    """
+
+    day = serializers.DateField(required=False)
+    units = serializers.IntegerField()
+    revenue = serializers.DecimalField(max_digits=14, decimal_places=2)
+    orders = serializers.IntegerField()
+
+
+class ProductSalesSerializer(SalesSerializer):
+    product = serializers.IntegerField(source="product_id")
+    name = serializers.CharField()
+
+
+class CategorySalesSerializer(SalesSerializer):
+    # Missing from the rows of a subtree (?category=), they are the sums of several categories
+    category = serializers.IntegerField(source="category_id", required=False)
+    name = serializers.CharField(required=False)
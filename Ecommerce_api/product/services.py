@@ -0,0 +1,403 @@
+import logging
+import random
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import DatabaseError, OperationalError, close_old_connections, transaction
+from django.db.models import Case, F, PositiveIntegerField, When
+from django.utils import timezone
+
+from .cache import catalog_cache
+from .models import Order, Product, Reservation
+from .outbox import publish_orders_placed
+from .routing import pin_to_primary
+
+logger = logging.getLogger(__name__)
+
+
+# --------------------
+# ERRORS
+# --------------------
+class InsufficientStock(Exception):
+    """
+    Raised when an order asks for more units than the product has left.
+    """
+
+
+class UnknownProduct(Exception):
+    """
+    Raised when a bulk order refers to products that do not exist.
+    """
+
+
+class ReservationUnavailable(Exception):
+    """
+    Raised when a reservation can no longer be confirmed or released (expired or already ended).
+    """
+
+
+# --------------------
+# RETRY POLICY
+# --------------------
+class RetryPolicy:
+    """
+    Decides how many times a write is retried when the database reports lock contention
+    (for example "database is locked" on SQLite or a deadlock on PostgreSQL) and how long
+    to wait between attempts. The delay grows exponentially and gets a random jitter so
+    racing checkouts do not retry in lockstep.
+    """
+
+    def __init__(self, max_attempts=5, base_delay=0.01, max_delay=0.5, jitter=True):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.jitter = jitter
+
+    @classmethod
+    def from_settings(cls):
+        """
+        Build the policy from the ORDER_PLACEMENT setting, falling back to the defaults.
+        """
+        config = getattr(settings, "ORDER_PLACEMENT", {})
+        return cls(
+            max_attempts=config.get("MAX_ATTEMPTS", 5),
+            base_delay=config.get("BASE_DELAY", 0.01),
+            max_delay=config.get("MAX_DELAY", 0.5),
+            jitter=config.get("JITTER", True),
+        )
+
+    def delay(self, attempt):
+        """
+        Seconds to sleep after the given failed attempt (attempts start at 1).
+        """
+        delay = min(self.max_delay, self.base_delay * (2 ** (attempt - 1)))
+        if self.jitter:
+            delay = random.uniform(0, delay)
+        return delay
+
+    def run(self, func, *args, **kwargs):
+        """
+        Call func until it succeeds or the attempts are used up.
+        Only OperationalError is retried, every other error goes straight to the caller.
+        Inside an outer transaction a failed statement breaks the whole transaction,
+        so in that case func runs once and the caller decides what to do.
+        """
+        if transaction.get_connection().in_atomic_block:
+            return func(*args, **kwargs)
+
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                return func(*args, **kwargs)
+            except OperationalError:
+                if attempt == self.max_attempts:
+                    raise
+                time.sleep(self.delay(attempt))
+
+
+# --------------------
+# WRITE TRANSACTIONS
+# --------------------
+@contextmanager
+def write_transaction(using=None):
+    """
+    transaction.atomic() for a block that is going to write.
+
+    SQLite starts transactions with a DEFERRED BEGIN, which only takes the write lock at the
+    first write. Two checkouts that both read before writing then both want to upgrade their
+    lock, and SQLite fails one of them at once with "database is locked", whatever the busy
+    timeout, because waiting could deadlock. With BEGIN IMMEDIATE the write lock is taken up
+    front, so the second checkout waits its turn (busy_timeout) and readers are not blocked
+    in WAL mode. Nested blocks, other databases and an untuned SQLite use atomic() as is.
+    """
+    connection = transaction.get_connection(using)
+    tuned = getattr(settings, "SQLITE_TUNING", {}).get("ENABLED", False)
+    if connection.vendor != "sqlite" or not tuned or connection.in_atomic_block:
+        with transaction.atomic(using=using):
+            yield
+        return
+
+    connection.ensure_connection()  # Opening the connection resets transaction_mode
+    previous = connection.transaction_mode
+    connection.transaction_mode = "IMMEDIATE"
+    try:
+        with transaction.atomic(using=using):
+            connection.transaction_mode = previous  # Only the outermost BEGIN needs it
+            yield
+    finally:
+        connection.transaction_mode = previous
+
+
+# --------------------
+# ORDER PLACEMENT
+# --------------------
+def place_order(user, product, quantity, retry_policy=None):
+    """
+    Place a single order and take its stock in one transaction.
+    The stock is decremented with a conditional UPDATE (see ProductQuerySet.decrement_stock)
+    so concurrent checkouts on the same product can never oversell it.
+    Raises InsufficientStock when there are not enough units left.
+    Once committed, the user's reads stay on the primary database for a while (see routing.py).
+    """
+    retry_policy = retry_policy or RetryPolicy.from_settings()
+
+    def _place():
+        with write_transaction():
+            order = Order(user=user, product=product, quantity=quantity)
+            try:
+                order.save()
+            except ValidationError as exc:
+                raise InsufficientStock(exc.messages[0]) from exc
+            # Side effects (stock alerts, emails, analytics) run later in the outbox workers
+            publish_orders_placed([order])
+            # Read-your-writes: the buyer's next reads must not come from a lagging replica
+            transaction.on_commit(lambda: pin_to_primary(user.pk))
+            return order
+
+    return retry_policy.run(_place)
+
+
+def place_bulk_order(user, lines, retry_policy=None):
+    """
+    Place one order per cart line in a single transaction.
+    `lines` is an iterable of (product_id, quantity) pairs; repeated products are merged.
+
+    The whole cart costs a fixed number of statements whatever its size:
+    one SELECT ... FOR UPDATE that locks the products in id order (so two carts sharing
+    products always lock them in the same order and cannot deadlock), one UPDATE that takes
+    the stock of every product with a CASE expression, and one bulk INSERT for the orders.
+    Either every line is placed or none is. The "order.placed" events of the cart are one more INSERT.
+    Raises UnknownProduct or InsufficientStock without touching the stock.
+    """
+    retry_policy = retry_policy or RetryPolicy.from_settings()
+
+    quantities = {}
+    for product_id, quantity in lines:
+        quantities[product_id] = quantities.get(product_id, 0) + quantity
+    product_ids = sorted(quantities)
+
+    def _place():
+        with write_transaction():
+            products = {
+                product.id: product
+                for product in Product.objects.select_for_update()
+                .filter(id__in=product_ids)
+                .order_by("id")
+                .only("id", "name", "price", "stock_quantity")
+            }
+
+            missing = [product_id for product_id in product_ids if product_id not in products]
+            if missing:
+                raise UnknownProduct(f"Unknown products: {missing}.")
+
+            short = [
+                f"{products[product_id].name} (available {products[product_id].stock_quantity})"
+                for product_id in product_ids
+                if products[product_id].stock_quantity < quantities[product_id]
+            ]
+            if short:
+                raise InsufficientStock(f"Not enough stock for {', '.join(short)}.")
+
+            # The rows are locked, so a single CASE update is as safe as the conditional one
+            Product.objects.filter(id__in=product_ids).update(
+                stock_quantity=Case(
+                    *[
+                        When(id=product_id, then=F("stock_quantity") - quantities[product_id])
+                        for product_id in product_ids
+                    ],
+                    default=F("stock_quantity"),
+                    output_field=PositiveIntegerField(),
+                )
+            )
+            for product_id in product_ids:
+                products[product_id].stock_quantity -= quantities[product_id]
+            catalog_cache.stock_changed(
+                product_ids, any(products[product_id].stock_quantity == 0 for product_id in product_ids)
+            )
+            transaction.on_commit(lambda: pin_to_primary(user.pk))
+
+            # bulk_create skips Order.save, the stock has already been taken above
+            orders = [
+                Order(user=user, product=products[product_id], quantity=quantities[product_id])
+                for product_id in product_ids
+            ]
+            for order in orders:
+                order.fill_prices()
+            orders = Order.objects.bulk_create(orders)
+            publish_orders_placed(orders)
+            return orders
+
+    return retry_policy.run(_place)
+
+
+# --------------------
+# RESERVATIONS
+# --------------------
+def reservation_settings():
+    return getattr(settings, "RESERVATIONS", {})
+
+
+def reserve_stock(user, product, quantity, ttl=None, retry_policy=None):
+    """
+    Hold `quantity` units of a product for the user's checkout, for `ttl` seconds
+    (RESERVATIONS["TTL"] by default). The units leave stock_quantity at once with a conditional
+    UPDATE (see ProductQuerySet.hold_stock), so other shoppers only see what is still for sale
+    and the hold can never oversell. When the stock is short, the expired holds of the product
+    that the sweeper has not reached yet are released first and the hold is tried again.
+    Raises InsufficientStock when the units are not there.
+    """
+    retry_policy = retry_policy or RetryPolicy.from_settings()
+    ttl = reservation_settings().get("TTL", 600) if ttl is None else ttl
+
+    def _reserve():
+        with write_transaction():
+            sold_out = Product.objects.hold_stock(product.pk, quantity)
+            if sold_out is None and release_expired_reservations(product_id=product.pk):
+                sold_out = Product.objects.hold_stock(product.pk, quantity)
+            if sold_out is None:
+                available = Product.objects.filter(pk=product.pk).values_list("stock_quantity", flat=True).first()
+                raise InsufficientStock(f"Not enough stock for {product.name}. Available stock is {available}.")
+            reservation = Reservation.objects.create(
+                user=user,
+                product=product,
+                quantity=quantity,
+                unit_price=product.price,
+                expires_at=timezone.now() + timedelta(seconds=ttl),
+            )
+            catalog_cache.stock_changed([product.pk], sold_out)
+            transaction.on_commit(lambda: pin_to_primary(user.pk))
+            return reservation
+
+    return retry_policy.run(_reserve)
+
+
+def _end_reservation(reservation, status, **filters):
+    """
+    Move an active reservation to `status`. The conditional UPDATE decides the races between
+    confirm, release and the sweeper: exactly one of them ends a hold.
+    """
+    ended = Reservation.objects.filter(pk=reservation.pk, status=Reservation.ACTIVE, **filters).update(status=status)
+    if not ended:
+        raise ReservationUnavailable("This reservation has expired or has already been used.")
+    reservation.status = status
+
+
+def confirm_reservation(reservation, retry_policy=None):
+    """
+    Turn an active, unexpired reservation into an Order at the held price. The stock was
+    taken by the hold, so the order only moves the units from reserved to sold.
+    Raises ReservationUnavailable when the hold expired or ended meanwhile.
+    """
+    retry_policy = retry_policy or RetryPolicy.from_settings()
+
+    def _confirm():
+        with write_transaction():
+            _end_reservation(reservation, Reservation.CONFIRMED, expires_at__gt=timezone.now())
+            Product.objects.filter(pk=reservation.product_id).update(
+                reserved_quantity=F("reserved_quantity") - reservation.quantity
+            )
+            order = Order(
+                user_id=reservation.user_id,
+                product=reservation.product,
+                quantity=reservation.quantity,
+                unit_price=reservation.unit_price,
+            )
+            order.save(take_stock=False)
+            Reservation.objects.filter(pk=reservation.pk).update(order=order)
+            reservation.order = order
+            publish_orders_placed([order])
+            transaction.on_commit(lambda: pin_to_primary(reservation.user_id))
+            return order
+
+    return retry_policy.run(_confirm)
+
+
+def release_reservation(reservation, retry_policy=None):
+    """
+    Cancel an active reservation and give its units back to the stock.
+    Raises ReservationUnavailable when it already ended.
+    """
+    retry_policy = retry_policy or RetryPolicy.from_settings()
+
+    def _release():
+        with write_transaction():
+            _end_reservation(reservation, Reservation.RELEASED)
+            restocked = Product.objects.return_held_stock({reservation.product_id: reservation.quantity})
+            catalog_cache.stock_changed([reservation.product_id], restocked > 0)
+
+    return retry_policy.run(_release)
+
+
+def release_expired_reservations(now=None, product_id=None, batch_size=None):
+    """
+    Expire the active holds whose time is up and give their units back, oldest first, in
+    batches of RESERVATIONS["SWEEP_BATCH_SIZE"] with one transaction per batch: a SELECT on the
+    partial expiry index (only active rows are in it, so it stays as small as the open checkouts),
+    one UPDATE of the reservations and one UPDATE of the products of the batch. Units only go
+    back for holds this UPDATE ended, a batch that lost one of its holds meanwhile is retaken.
+    `product_id` limits the sweep to one product. Returns the number of holds released.
+    """
+    now = now or timezone.now()
+    batch_size = batch_size or reservation_settings().get("SWEEP_BATCH_SIZE", 500)
+    released = 0
+    while True:
+        with write_transaction():
+            expired = Reservation.objects.filter(status=Reservation.ACTIVE, expires_at__lte=now)
+            if product_id is not None:
+                expired = expired.filter(product_id=product_id)
+            # Rows another sweeper holds are skipped, it is releasing them (PostgreSQL)
+            rows = list(
+                expired.select_for_update(skip_locked=True)
+                .order_by("expires_at")
+                .values_list("id", "product_id", "quantity")[:batch_size]
+            )
+            if not rows:
+                return released
+            moved = Reservation.objects.filter(pk__in=[row[0] for row in rows], status=Reservation.ACTIVE).update(
+                status=Reservation.EXPIRED
+            )
+            if moved != len(rows):
+                # A hold of the batch ended between the SELECT and the UPDATE (a database
+                # without row locks): its units were already given back, so nothing is, and
+                # the batch is read again
+                transaction.set_rollback(True)
+                continue
+            quantities = defaultdict(int)
+            for _, held_product_id, quantity in rows:
+                quantities[held_product_id] += quantity
+            restocked = Product.objects.return_held_stock(quantities)
+            catalog_cache.stock_changed(quantities, restocked > 0)
+        released += len(rows)
+        if len(rows) < batch_size:
+            return released
+
+
+class ReservationSweeper(threading.Thread):
+    """
+    Daemon thread releasing the expired holds every RESERVATIONS["SWEEP_INTERVAL"] seconds,
+    started by the app when RESERVATIONS["SWEEPER_THREAD"] is on. Several processes may sweep
+    at the same time, each hold is released once (see release_expired_reservations).
+    """
+
+    def __init__(self, interval=None):
+        super().__init__(name="reservation-sweeper", daemon=True)
+        self.interval = interval or reservation_settings().get("SWEEP_INTERVAL", 30)
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            try:
+                released = release_expired_reservations()
+                if released:
+                    logger.info("Released %s expired reservations", released)
+            except DatabaseError:
+                logger.exception("Reservation sweep failed, retrying in %s seconds", self.interval)
+            finally:
+                close_old_connections()
+
+    def stop(self):
+        self._stopped.set()
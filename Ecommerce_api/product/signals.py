@@ -0,0 +1,126 @@
+from django.contrib.auth.models import User
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .authentication import revoke_user_claims, user_cache
+from .cache import catalog_cache
+from .categories import category_registry
+from .models import Category, Product, Review
+
+
+# Any write to the catalog tables makes the cached catalog responses stale
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_catalog_cache(sender, **kwargs):
+    catalog_cache.bump_on_commit()
+    if sender is Category:
+        catalog_cache.bump_on_commit("category")
+        category_registry.bump()
+
+
+# Category.product_count follows the products moving in and out of every subtree
+@receiver(pre_save, sender=Product)
+def remember_previous_category(sender, instance, **kwargs):
+    """
+    On update keep the stored category and its path, so post_save can tell whether the
+    product moved.
+    """
+    instance._previous_category = None
+    if instance.pk is not None and not instance._state.adding:
+        instance._previous_category = (
+            Product.objects.filter(pk=instance.pk).values_list("category_id", "category__path").first()
+        )
+
+
+def known_category_path(product):
+    # select_related already loaded the category and its path most of the time. The path of a
+    # category built from the registry may be stale (CategoryEntry.instance): add_product_counts
+    # reads it again in the write transaction
+    if Product.category.is_cached(product) and not getattr(product.category, "from_registry", False):
+        return {product.category_id: product.category.path}
+    return {}
+
+
+@receiver(post_save, sender=Product)
+def count_saved_product(sender, instance, created, **kwargs):
+    previous = getattr(instance, "_previous_category", None)
+    paths = known_category_path(instance)
+    if created:
+        deltas = {instance.category_id: 1}
+    elif previous is None or previous[0] == instance.category_id:
+        return
+    else:
+        deltas = {previous[0]: -1, instance.category_id: 1}
+        paths[previous[0]] = previous[1]
+    Category.objects.add_product_counts(deltas, paths)
+    # The counts are part of the category responses
+    catalog_cache.bump_on_commit("category")
+
+
+@receiver(post_delete, sender=Product)
+def uncount_deleted_product(sender, instance, **kwargs):
+    Category.objects.add_product_counts({instance.category_id: -1}, known_category_path(instance))
+    catalog_cache.bump_on_commit("category")
+
+
+# Review aggregates on Product (rating_count, rating_sum, rating_avg) follow every review write
+@receiver(pre_save, sender=Review)
+def remember_previous_rating(sender, instance, **kwargs):
+    """
+    On update keep the stored product and rating, so post_save can apply the difference.
+    """
+    instance._previous_rating = None
+    if instance.pk is not None and not instance._state.adding:
+        instance._previous_rating = (
+            Review.objects.filter(pk=instance.pk).values_list("product_id", "rating").first()
+        )
+
+
+@receiver(post_save, sender=Review)
+def add_review_to_aggregates(sender, instance, created, **kwargs):
+    previous = getattr(instance, "_previous_rating", None)
+    if created or previous is None:
+        Product.objects.apply_review_delta(instance.product_id, 1, instance.rating)
+    else:
+        product_id, rating = previous
+        if product_id == instance.product_id:
+            if rating == instance.rating:
+                return
+            Product.objects.apply_review_delta(product_id, 0, instance.rating - rating)
+        else:
+            # The review moved to another product
+            Product.objects.apply_review_delta(product_id, -1, -rating)
+            Product.objects.apply_review_delta(instance.product_id, 1, instance.rating)
+    catalog_cache.bump_on_commit()
+
+
+@receiver(post_delete, sender=Review)
+def remove_review_from_aggregates(sender, instance, **kwargs):
+    Product.objects.apply_review_delta(instance.product_id, -1, -instance.rating)
+    catalog_cache.bump_on_commit()
+
+
+# Tokens carry is_staff and is_active as claims (see authentication.py), a change must revoke them
+@receiver(pre_save, sender=User)
+def revoke_changed_user_claims(sender, instance, **kwargs):
+    if instance.pk is None or instance._state.adding:
+        return
+    previous = User.objects.filter(pk=instance.pk).values("is_staff", "is_active").first()
+    if previous is None:
+        return
+    if previous["is_staff"] != instance.is_staff or previous["is_active"] != instance.is_active:
+        revoke_user_claims(instance.pk)
+
+
+@receiver(post_save, sender=User)
+def forget_reused_user_id(sender, instance, created, **kwargs):
+    # SQLite can hand out the id of a deleted user again, never serve the old cached row for it
+    if created:
+        user_cache.evict(instance.pk)
+
+
+@receiver(post_delete, sender=User)
+def revoke_deleted_user_claims(sender, instance, **kwargs):
+    revoke_user_claims(instance.pk)
@@ -0,0 +1,226 @@
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+PERIODS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+def parse_rate(rate):
+    """
+    "100/min" -> (100, 100 / 60): the bucket holds up to 100 tokens (the allowed burst) and
+    refills at 100 tokens per minute. Like DRF, only the first letter of the period counts.
+    None means no limit.
+    """
+    if rate is None:
+        return None
+    number, _, period = rate.partition("/")
+    capacity = int(number)
+    return capacity, capacity / PERIODS[period.strip()[0]]
+
+
+# --------------------
+# BUCKET STORES
+# --------------------
+class LocalBucketStore:
+    """
+    Token buckets in a dict of this process:
+    key -> [tokens, last refill (monotonic), capacity, refill rate].
+
+    A take() is one dict lookup and a little arithmetic under a lock. Buckets that have been
+    idle long enough to be full again are the same as missing ones, so every EVICT_INTERVAL
+    seconds a take() also drops them; the dict only holds the clients active recently.
+    Limits are per process: with N workers a client gets up to N times the rate.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets = {}
+        self._next_eviction = time.monotonic()
+
+    @property
+    def evict_interval(self):
+        return getattr(settings, "THROTTLING", {}).get("EVICT_INTERVAL", 60)
+
+    def take(self, key, capacity, refill_rate):
+        """
+        Take one token from the bucket of key. Returns (allowed, seconds to wait for a token).
+        """
+        now = time.monotonic()
+        with self._lock:
+            if now >= self._next_eviction:
+                self._evict(now)
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [capacity, now, capacity, refill_rate]
+            else:
+                bucket[0] = min(capacity, bucket[0] + (now - bucket[1]) * refill_rate)
+                bucket[1] = now
+                bucket[2], bucket[3] = capacity, refill_rate  # The rate may have changed
+            if bucket[0] >= 1:
+                bucket[0] -= 1
+                return True, 0.0
+            return False, (1 - bucket[0]) / refill_rate
+
+    def _evict(self, now):
+        self._buckets = {
+            key: bucket
+            for key, bucket in self._buckets.items()
+            if bucket[0] + (now - bucket[1]) * bucket[3] < bucket[2]
+        }
+        self._next_eviction = now + self.evict_interval
+
+    def __len__(self):
+        return len(self._buckets)
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+class CacheBucketStore:
+    """
+    Token buckets in a Django cache backend (THROTTLING["CACHE_ALIAS"]), shared by the
+    processes using the same backend: one get and one set per request. The read-modify-write
+    is not atomic, two processes racing on the same key may both let a request through,
+    which is fine for rate limiting. Entries expire once the bucket would be full again.
+    """
+
+    @property
+    def backend(self):
+        return caches[getattr(settings, "THROTTLING", {}).get("CACHE_ALIAS", "default")]
+
+    def take(self, key, capacity, refill_rate):
+        backend = self.backend
+        key = f"throttle:{key}"
+        now = time.time()
+        tokens, stamp = backend.get(key, (capacity, now))
+        tokens = min(capacity, tokens + (now - stamp) * refill_rate)
+        allowed = tokens >= 1
+        if allowed:
+            tokens -= 1
+        backend.set(key, (tokens, now), timeout=int((capacity - tokens) / refill_rate) + 1)
+        return allowed, 0.0 if allowed else (1 - tokens) / refill_rate
+
+
+local_buckets = LocalBucketStore()
+cache_buckets = CacheBucketStore()
+
+
+def bucket_store():
+    if getattr(settings, "THROTTLING", {}).get("STORE", "local") == "cache":
+        return cache_buckets
+    return local_buckets
+
+
+# --------------------
+# THROTTLES
+# --------------------
+class TokenBucketThrottle(BaseThrottle):
+    """
+    DRF throttle backed by a token bucket (see bucket_store()): a client may send a burst of
+    up to the rate's number of requests, then one more each time a token comes back.
+    Rates come from REST_FRAMEWORK["DEFAULT_THROTTLE_RATES"] like for the DRF throttles;
+    a refused request is answered 429 with Retry-After. settings.THROTTLING["ENABLED"]
+    switches all of them off (the test suite does, except the throttling tests).
+    """
+
+    scope = None
+    _rates = {}  # Parsed rates, by rate string
+
+    def __init__(self):
+        self._wait = None
+
+    def get_rate(self, view):
+        return api_settings.DEFAULT_THROTTLE_RATES.get(self.scope)
+
+    def get_cache_key(self, request, view):
+        """
+        The bucket of the request, or None when this throttle does not apply to it.
+        """
+        raise NotImplementedError
+
+    def allow_request(self, request, view):
+        config = getattr(settings, "THROTTLING", {})
+        if not config.get("ENABLED", True):
+            return True
+        rate = self.get_rate(view)
+        if rate is None:
+            return True
+        key = self.get_cache_key(request, view)
+        if key is None:
+            return True
+        parsed = self._rates.get(rate)
+        if parsed is None:
+            parsed = self._rates[rate] = parse_rate(rate)
+        allowed, self._wait = bucket_store().take(key, *parsed)
+        return allowed
+
+    def wait(self):
+        return self._wait
+
+    def get_ident(self, request):
+        """
+        BaseThrottle.get_ident, which reads request.META three times through the DRF Request
+        proxy; without X-Forwarded-For the client is simply REMOTE_ADDR.
+        """
+        meta = getattr(request, "_request", request).META
+        if "HTTP_X_FORWARDED_FOR" in meta:
+            return super().get_ident(request)
+        return meta.get("REMOTE_ADDR")
+
+
+class AnonBucketThrottle(TokenBucketThrottle):
+    """
+    Anonymous clients, by IP address (X-Forwarded-For is trusted as configured by NUM_PROXIES).
+    """
+
+    scope = "anon"
+
+    def get_cache_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            return None
+        return f"anon:{self.get_ident(request)}"
+
+
+class UserBucketThrottle(TokenBucketThrottle):
+    """
+    Authenticated users, by user id.
+    """
+
+    scope = "user"
+
+    def get_cache_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            return f"user:{request.user.pk}"
+        return None
+
+
+class ScopedBucketThrottle(TokenBucketThrottle):
+    """
+    Per-route rates: applies to the views with a `throttle_scope` (e.g. "catalog", "token"),
+    on top of the anon/user throttles, per user or per IP address. Anonymous clients get the
+    "<scope>_anon" rate when there is one: a per-route limit only bites when it is stricter
+    than the global one of the same clients.
+    """
+
+    def allow_request(self, request, view):
+        self.anonymous = not (request.user and request.user.is_authenticated)
+        return super().allow_request(request, view)
+
+    def get_rate(self, view):
+        self.scope = getattr(view, "throttle_scope", None)
+        if self.scope is None:
+            return None
+        rates = api_settings.DEFAULT_THROTTLE_RATES
+        if getattr(self, "anonymous", False) and f"{self.scope}_anon" in rates:
+            return rates[f"{self.scope}_anon"]
+        return rates.get(self.scope)
+
+    def get_cache_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            return f"{self.scope}:user:{request.user.pk}"
+        return f"{self.scope}:anon:{self.get_ident(request)}"
@@ -1,11 +1,8 @@
 from rest_framework.routers import (
     DefaultRouter,
 )  # this module provide easyer way to handel endpoints creation
-from .views import ProductViewSet, UserViewSet, OrderViewSet, ReviewViewSet , CategoryViewSet
-from rest_framework_simplejwt.views import (
-    TokenObtainPairView,
-    TokenRefreshView,
-)
+from .views import ProductViewSet, UserViewSet, OrderViewSet, ReservationViewSet, ReviewViewSet , CategoryViewSet, OutboxMetricsView, SalesAnalyticsViewSet, ThrottledTokenObtainPairView, ThrottledTokenRefreshView
+from .async_views import AsyncCategoryView, AsyncProductView
 from django.urls import path
 
 router = (DefaultRouter())  # for django API we use DefaultRouter instead of adding it manualy to urlpttern list
@@ -16,14 +13,22 @@ router.register(r"users", UserViewSet, basename="user")  # the same her for user
 router.register(
     r"orders", OrderViewSet, basename="order"
 )  # here i added a route for the order views
+router.register(r"reservations", ReservationViewSet, basename="reservation")  # checkout holds
 router.register(r"reviews", ReviewViewSet, basename="review")  # here i added a route for the review views
 router.register(r"categorys",CategoryViewSet,basename="category")
+router.register(r"analytics", SalesAnalyticsViewSet, basename="analytics")  # staff sales reports from the daily rollups
 
 urlpatterns = router.urls + [
     path(
-        "token/", TokenObtainPairView.as_view(), name="token_obtain_pair"
-    ),  # for login using jwt , access token and refresh token
+        "token/", ThrottledTokenObtainPairView.as_view(), name="token_obtain_pair"
+    ),  # for login using jwt , access token and refresh token (rate limited, see throttling.py)
     path(
-        "token/refresh/", TokenRefreshView.as_view(), name="token_refresh"
+        "token/refresh/", ThrottledTokenRefreshView.as_view(), name="token_refresh"
     ),  # We use this route to obtain a new access token when the current one expires
+    path("outbox/metrics/", OutboxMetricsView.as_view(), name="outbox-metrics"),  # queue depth and lag, staff only
+    # async (ASGI) read-only versions of the catalog endpoints, see async_views.py
+    path("async/products/", AsyncProductView.as_view(), name="async-product-list"),
+    path("async/products/<int:pk>/", AsyncProductView.as_view(), name="async-product-detail"),
+    path("async/categorys/", AsyncCategoryView.as_view(), name="async-category-list"),
+    path("async/categorys/<int:pk>/", AsyncCategoryView.as_view(), name="async-category-detail"),
 ]
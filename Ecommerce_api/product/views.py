@@ -1,28 +1,62 @@
-from django.shortcuts import render
-from rest_framework import viewsets
-from .models import Product, Order, Review, Category
+from django.shortcuts import render, get_object_or_404
+from rest_framework import mixins, viewsets, status
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.parsers import MultiPartParser
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from .models import Product, Order, Reservation, Review, Category
+from .analytics import category_sales, product_sales
+from .authentication import FastJWTAuthentication
+from .cache import CachedCatalogMixin, ConditionalCatalogMixin, catalog_cache
+from .categories import CategoryFilter
+from .exports import ExportMixin
+from .fieldsets import ValuesListMixin
+from .imports import ProductImporter, read_rows
+from .instrumentation import InstrumentedViewMixin, serializer_timer
+from .outbox import outbox_metrics
+from .pagination import KeysetPagination, KeysetPaginationMixin
+from .routing import ReplicaReadMixin
+from .search import ProductSearchFilter
+from .services import (
+    InsufficientStock,
+    ReservationUnavailable,
+    UnknownProduct,
+    confirm_reservation,
+    place_bulk_order,
+    release_reservation,
+)
 from .serializers import (
+    PRODUCT_CARD_FIELDS,
     ProductSerializer,
+    ProductValuesSerializer,
     UserSerializer,
     OrderSerializer,
+    BulkOrderSerializer,
+    ProductReviewSerializer,
     ReviewSerializer,
     CategorySerializer,
+    ReservationSerializer,
+    SalesQuerySerializer,
+    ProductSalesSerializer,
+    CategorySalesSerializer,
 )
 from django.contrib.auth.models import User
-from rest_framework.permissions import IsAuthenticated, IsAuthenticatedOrReadOnly, BasePermission 
+from rest_framework.permissions import IsAuthenticated, IsAuthenticatedOrReadOnly, IsAdminUser, BasePermission
 from django_filters import rest_framework as django_filters
-from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 
 # --------------------
 # USER VIEWSET
 # --------------------
-class UserViewSet(viewsets.ModelViewSet):
+class UserViewSet(InstrumentedViewMixin, viewsets.ModelViewSet):
 
     # Handles CRUD operations for users. Only authenticated users can view, update, or delete a user,
     # but anyone can create a new account (POST action).
-    authentication_classes = [JWTAuthentication]  # Token-based authentication using JWT
+    authentication_classes = [FastJWTAuthentication]  # Token-based authentication using JWT
     serializer_class = UserSerializer
     permission_classes = [IsAuthenticated]  # Only authenticated users can perform other actions
+    query_budget = 3  # SQL queries per request, enforced in tests (see product/instrumentation.py)
 
     def get_permissions(self):
         """
@@ -40,8 +74,8 @@ class UserViewSet(viewsets.ModelViewSet):
         - Regular users can only view their own account.
         """
         if self.request.user.is_staff:  # Check if the user is an admin
-            return User.objects.all()  # Admin users can see all users
-        return User.objects.filter(id=self.request.user.id)  # Regular users can only see their own data
+            return User.objects.all().order_by('id')  # Admin users can see all users
+        return User.objects.filter(id=self.request.user.id).order_by('id')  # Regular users can only see their own data
 
     def update(self, request, *args, **kwargs):
         user = self.get_object()
@@ -67,10 +101,22 @@ class UserViewSet(viewsets.ModelViewSet):
 # --------------------
 # PRODUCT FILTER
 # --------------------
+class StableOrderingFilter(django_filters.OrderingFilter):
+    """
+    OrderingFilter that always ends the ordering with id, so rows with the same value
+    (e.g. the same rating) keep a stable order across pages.
+    """
+    def filter(self, qs, value):
+        qs = super().filter(qs, value)
+        if value:
+            qs = qs.order_by(*qs.query.order_by, "id")
+        return qs
+
+
 class ProductFilter(django_filters.FilterSet):
     """
     Provides filtering options for products based on various criteria such as price range,
-    category, and stock status.
+    category, stock status and average rating, and sorting with ?ordering= (e.g. -rating).
     """
     min_price = django_filters.NumberFilter(
         field_name="price", lookup_expr="gte"
@@ -78,34 +124,95 @@ class ProductFilter(django_filters.FilterSet):
     max_price = django_filters.NumberFilter(
         field_name="price", lookup_expr="lte"
     )  # Maximum price filter
-    category = django_filters.ModelChoiceFilter(
-        queryset=Category.objects.all()
-    )  # Filter by category
+    category = CategoryFilter(method="filter_category")  # Filter by category, subcategories included
     in_stock = django_filters.BooleanFilter(
-        field_name="stock_quantity", lookup_expr="gt", label="In Stock"
+        method="filter_in_stock", label="In Stock"
     )  # Filter products that are in stock
+    min_rating = django_filters.NumberFilter(
+        field_name="rating_avg", lookup_expr="gte"
+    )  # Minimum average rating filter
+    ordering = StableOrderingFilter(
+        fields=(
+            ("rating_avg", "rating"),
+            ("rating_count", "reviews"),
+            ("price", "price"),
+            ("name", "name"),
+            ("created_date", "created"),
+        )
+    )  # Sort products, e.g. ?ordering=-rating
 
     class Meta:
         model = Product
-        fields = ["category", "min_price", "max_price", "in_stock"]
+        fields = ["category", "min_price", "max_price", "in_stock", "min_rating"]
+
+    def filter_category(self, queryset, name, value):
+        """
+        Products of the category and of all its subcategories: the subtree is one range on the
+        category path index (see CategoryQuerySet.subtree). A category without children keeps
+        the plain equality, served in list order by product_category_name_idx.
+        `value` is the CategoryEntry of the category registry, validating it needs no query.
+        Without a shared catalog cache, has_children may miss a subcategory created by another
+        process for up to CATALOG_CACHE["REGISTRY_MAX_AGE"] seconds.
+        """
+        if not value.has_children:
+            return queryset.filter(category_id=value.id)
+        return queryset.filter(category__in=Category.objects.subtree(value.path).values("id"))
+
+    def filter_in_stock(self, queryset, name, value):
+        """
+        in_stock=true keeps products with stock left (stock_quantity > 0, served by the
+        partial product_in_stock_idx index), in_stock=false keeps the sold out ones.
+        """
+        if value:
+            return queryset.filter(stock_quantity__gt=0)
+        return queryset.filter(stock_quantity=0)
 
 # --------------------
 # PRODUCT VIEWSET
 # --------------------
-class ProductViewSet(viewsets.ModelViewSet):
+class ProductViewSet(InstrumentedViewMixin, ReplicaReadMixin, ConditionalCatalogMixin, CachedCatalogMixin, ValuesListMixin, KeysetPaginationMixin, ExportMixin, viewsets.ModelViewSet):
     """
     Handles CRUD operations for products. Allows read-only access for unauthenticated users
-    and enables filtering and searching by category name.
+    and enables filtering and full-text search (see product/search.py).
+    List and detail responses carry ETag/Last-Modified and are served from the catalog cache
+    (see product/cache.py).
+    ?pagination=cursor switches the list to keyset pagination on (name, id).
+    The list is built from values() rows; ?fields=id,name,... picks the fields and ?view=card
+    returns the compact product card (see product/fieldsets.py).
+    /api/products/export/ streams the whole filtered catalog as NDJSON or CSV.
+    /api/products/import/ creates or updates products in bulk from a CSV or NDJSON file.
+    GET requests read from the replicas when some are configured (see product/routing.py).
     """
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [FastJWTAuthentication]
     permission_classes = [IsAuthenticatedOrReadOnly]
     serializer_class = ProductSerializer
-    queryset = Product.objects.select_related('category').all().order_by('name')    # Optimize query by using select_related for foreign keys
+    queryset = Product.objects.all().order_by('name', 'id')    # No join: the category name comes from the category registry
 
-    # Enable filtering and search by product name and category
+    # Enable filtering and full-text search (?search=) on name, description and category
     filterset_class = ProductFilter
-    search_fields = ['name', 'category__name']  # Search by product name or category name
-    filter_backends = [django_filters.DjangoFilterBackend]
+    filter_backends = [django_filters.DjangoFilterBackend, ProductSearchFilter]  # Search results are ranked by relevance
+    keyset_ordering = ("name", "id")  # Stable key for cursor pagination, id breaks ties between equal names
+    keyset_conflicting_params = ("search", "ordering")  # Relevance or ?ordering= order, not the key
+    values_serializer_class = ProductValuesSerializer  # Fast serializer of the list (no model instances)
+    list_views = {"card": PRODUCT_CARD_FIELDS}
+    # SQL queries per request, enforced in tests; the import grows with the batches of the file
+    query_budget = {"list": 3, "retrieve": 1, "reviews": 2, "bulk_import": None, "*": 4}
+    throttle_scope = "catalog"  # Per-route rate against scrapers (see product/throttling.py)
+    catalog_object_scope = "stock"  # Orders move the stock of a product, see CatalogCache.stock_changed
+    export_fields = {
+        "id": "id",
+        "name": "name",
+        "price": "price",
+        "stock_quantity": "stock_quantity",
+        "category": "category_id",
+        "category_name": "category__name",
+        "image_url": "image_url",
+        "description": "description",
+        "sku": "sku",
+        "rating_avg": "rating_avg",
+        "rating_count": "rating_count",
+        "created_date": "created_date",
+    }  # Columns of /api/products/export/
 
     def get_queryset(self):
         """
@@ -114,6 +221,54 @@ class ProductViewSet(viewsets.ModelViewSet):
         """
         return super().get_queryset()
 
+    @action(detail=False, methods=["get"], url_path="cache-stats", permission_classes=[IsAdminUser])
+    def cache_stats(self, request):
+        """
+        Hit/miss counters of the catalog cache in this process (admin only).
+        """
+        return Response(catalog_cache.stats())
+
+    @action(detail=False, methods=["post"], url_path="import", permission_classes=[IsAdminUser], parser_classes=[MultiPartParser])
+    def bulk_import(self, request):
+        """
+        Upload a supplier file in the `file` field (admin only). Products are matched on sku:
+        known skus are updated, new ones created, in batches (see product/imports.py).
+        The format comes from ?input=csv|ndjson or the file extension, and ?create_categories=true
+        creates the categories that do not exist yet instead of rejecting their rows.
+        """
+        upload = request.FILES.get("file")
+        if upload is None:
+            raise ValidationError({"file": "Upload a CSV or NDJSON file."})
+        input_format = request.query_params.get("input") or ("csv" if upload.name.endswith(".csv") else "ndjson")
+        if input_format not in ("csv", "ndjson"):
+            raise ValidationError({"input": "Choose one of csv, ndjson."})
+
+        importer = ProductImporter(
+            create_categories=request.query_params.get("create_categories") in ("true", "1")
+        )
+        report = importer.run(read_rows(upload.file, input_format))
+        return Response(report, status=status.HTTP_200_OK)
+
+    @action(detail=True, methods=["get"], url_path="reviews", permission_classes=[IsAuthenticatedOrReadOnly])
+    def reviews(self, request, pk=None):
+        """
+        Reviews of one product, newest first, with keyset pagination on (created_date, id)
+        served by the review_product_created_idx index. The reviewer is joined in the same
+        query, so a page costs the same number of queries whatever its size.
+        """
+        get_object_or_404(Product.objects.only("id"), pk=pk)
+        queryset = (
+            Review.objects.filter(product_id=pk)
+            .select_related("user")
+            .only("id", "user__id", "user__username", "rating", "comment", "created_date", "product_id")
+        )
+        paginator = KeysetPagination(("-created_date", "-id"))
+        page = paginator.paginate_queryset(queryset, request, view=self)
+        serializer = ProductReviewSerializer(page, many=True)
+        with serializer_timer():
+            data = serializer.data
+        return paginator.get_paginated_response(data)
+
 
 # --------------------
 # ORDER VIEWSET
@@ -139,8 +294,8 @@ class IsAdminOrReadOnly(BasePermission):
         Object-level permission to only allow owners of the object to view their orders.
         Admin/staff users can modify (PUT, DELETE) any order.
         """
-        # Allow GET for the owner of the order
-        if request.method == 'GET' and obj.user == request.user:
+        # Allow GET for the owner of the order (compare ids, the user row is not loaded)
+        if request.method == 'GET' and obj.user_id == request.user.pk:
             return True
 
         # Allow PUT/DELETE only for admin/staff or the owner
@@ -150,41 +305,175 @@ class IsAdminOrReadOnly(BasePermission):
                 return True
 
             # Regular users can only modify or delete their own orders
-            return obj.user == request.user
+            return obj.user_id == request.user.pk
 
         return False  # Deny access by default
 
 
-class OrderViewSet(viewsets.ModelViewSet):
+class OrderFilter(django_filters.FilterSet):
+    """
+    Date range of the order history: ?ordered_after= and ?ordered_before= take an ISO date or
+    datetime. Served by the (user, ordered_at) index, and by the ordered_at one for staff.
+    """
+    ordered_after = django_filters.IsoDateTimeFilter(field_name="ordered_at", lookup_expr="gte")
+    ordered_before = django_filters.IsoDateTimeFilter(field_name="ordered_at", lookup_expr="lt")
+
+    class Meta:
+        model = Order
+        fields = ["product"]
+
+
+class OrderViewSet(InstrumentedViewMixin, KeysetPaginationMixin, ExportMixin, viewsets.ModelViewSet):
     """
     Handles CRUD operations for orders.
     Provides token-based authentication and allows authenticated users to view and create orders.
     Admin/staff users can modify or delete any order.
+    ?pagination=cursor switches the list to keyset pagination on id.
+    ?ordered_after= / ?ordered_before= filter the history on a date range (see OrderFilter).
+    /api/orders/export/ streams the visible orders as NDJSON or CSV.
     """
-    authentication_classes = [JWTAuthentication]  # Token-based authentication using JWT
+    authentication_classes = [FastJWTAuthentication]  # Token-based authentication using JWT
     permission_classes = [IsAuthenticated, IsAdminOrReadOnly]  # Admin/staff have full control; regular users have limited access
     serializer_class = OrderSerializer
+    filter_backends = [django_filters.DjangoFilterBackend]
+    filterset_class = OrderFilter
+    keyset_ordering = ("id",)
+    # SQL queries per request, enforced in tests. Placing an order costs the lookups of the
+    # user and product, the savepoints, the stock update and the inserts of the order and its
+    # outbox event; a cart the same
+    query_budget = {"list": 2, "retrieve": 2, "create": 12, "bulk": 7, "*": 4}
+    export_fields = {
+        "id": "id",
+        "user": "user_id",
+        "product": "product_id",
+        "quantity": "quantity",
+        "unit_price": "unit_price",
+        "line_total": "line_total",
+        "ordered_at": "ordered_at",
+    }  # Columns of /api/orders/export/
+
+    def create(self, request, *args, **kwargs):
+        """
+        Places the order through the order placement service (via OrderSerializer.create).
+        Running out of stock is a conflict with the current state of the product, so it is
+        answered with 409 instead of a generic validation error.
+        """
+        try:
+            return super().create(request, *args, **kwargs)
+        except InsufficientStock as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_409_CONFLICT)
+
+    @action(detail=False, methods=["post"], url_path="bulk")
+    def bulk(self, request):
+        """
+        Checks out a whole cart for the authenticated user in one request and one transaction.
+        Body: {"lines": [{"product": <id>, "quantity": <n>}, ...]}
+        Either every line becomes an order or none does.
+        """
+        serializer = BulkOrderSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        lines = [(line["product"], line["quantity"]) for line in serializer.validated_data["lines"]]
+        try:
+            orders = place_bulk_order(request.user, lines)
+        except UnknownProduct as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        except InsufficientStock as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_409_CONFLICT)
+        return Response(OrderSerializer(orders, many=True).data, status=status.HTTP_201_CREATED)
+
     def get_queryset(self):
         """
         Allows users to see only their own orders. Admin users can see all orders.
-        Optimizes the query by using select_related for foreign keys 
-        and prefetch_related for related objects.
+        The product name is joined in the same query (select_related) and only the columns
+        of the representation are read, so a page of history is one query whatever its size.
         """
+        queryset = (
+            Order.objects.select_related('product')
+            .only('id', 'user_id', 'product_id', 'quantity', 'unit_price', 'line_total', 'ordered_at', 'product__name')
+            .order_by('id')
+        )
         if self.request.user.is_staff:
-            return Order.objects.select_related('user').all().order_by('id')
-        return Order.objects.filter(user=self.request.user).select_related('user')
+            return queryset
+        return queryset.filter(user=self.request.user)
+
+
+# --------------------
+# RESERVATION VIEWSET
+# --------------------
+class ReservationViewSet(InstrumentedViewMixin, mixins.CreateModelMixin, mixins.ListModelMixin, mixins.RetrieveModelMixin, mixins.DestroyModelMixin, viewsets.GenericViewSet):
+    """
+    Checkout holds of the authenticated user (admin users see everyone's).
+    POST /api/reservations/ {"product": <id>, "quantity": <n>} holds the units for
+    RESERVATIONS["TTL"] seconds, 409 when the stock is short.
+    POST /api/reservations/{id}/confirm/ places the order at the held price, 409 once expired.
+    DELETE /api/reservations/{id}/ releases the hold and gives the units back.
+    Holds nobody confirms expire on their own (see release_expired_reservations).
+    """
+    authentication_classes = [FastJWTAuthentication]
+    permission_classes = [IsAuthenticated]
+    serializer_class = ReservationSerializer
+    # A hold is the product lookup, the stock update and the insert (with savepoints); a
+    # short hold first releases the product's expired holds (a select and three updates) and
+    # retries. Taking the last units or giving units back is one more UPDATE, which tells
+    # whether the product sold out or came back (ProductQuerySet). A confirm also moves the
+    # reserved units and inserts the order and its outbox event
+    query_budget = {"list": 2, "retrieve": 1, "create": 13, "confirm": 8, "destroy": 6, "*": 3}
+
+    def get_queryset(self):
+        """
+        The user's own reservations, newest first. Confirm joins the product, its name is
+        part of the order it returns.
+        """
+        queryset = Reservation.objects.order_by('-id')
+        if self.action == "confirm":
+            queryset = queryset.select_related('product')
+        if self.request.user.is_staff:
+            return queryset
+        return queryset.filter(user=self.request.user)
+
+    def create(self, request, *args, **kwargs):
+        try:
+            return super().create(request, *args, **kwargs)
+        except InsufficientStock as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_409_CONFLICT)
+
+    def perform_create(self, serializer):
+        serializer.save(user=self.request.user)
+
+    def destroy(self, request, *args, **kwargs):
+        try:
+            release_reservation(self.get_object())
+        except ReservationUnavailable as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_409_CONFLICT)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    @action(detail=True, methods=["post"], url_path="confirm")
+    def confirm(self, request, pk=None):
+        """
+        Place the order of the hold. The stock was taken when the hold was placed, so a
+        confirmed checkout can not fail for lack of stock.
+        """
+        try:
+            order = confirm_reservation(self.get_object())
+        except ReservationUnavailable as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_409_CONFLICT)
+        return Response(OrderSerializer(order).data, status=status.HTTP_201_CREATED)
 
 
 # --------------------
 # REVIEW VIEWSET
 # --------------------
-class ReviewViewSet(viewsets.ModelViewSet):
+class ReviewViewSet(InstrumentedViewMixin, ReplicaReadMixin, KeysetPaginationMixin, viewsets.ModelViewSet):
     """
     Handles CRUD operations for reviews. 
     Only authenticated users can post a review, and the user who created the review is automatically assigned.
+    ?pagination=cursor switches the list to keyset pagination on id.
+    GET requests read from the replicas when some are configured.
     """
     queryset = Review.objects.all().order_by('id')  # Fetch all reviews
     serializer_class = ReviewSerializer  # Serializer for converting review objects to and from JSON
+    keyset_ordering = ("id",)
+    query_budget = {"create": 5, "update": 6, "partial_update": 6, "*": 3}  # Writes also update the product rating
     permission_classes = [
         IsAuthenticated  # Only authenticated users can perform actions
     ]
@@ -196,17 +485,114 @@ class ReviewViewSet(viewsets.ModelViewSet):
         """
         serializer.save(user=self.request.user)  # Save the review with the current user as the reviewer
 
-class CategoryViewSet(viewsets.ModelViewSet):
+class CategoryViewSet(InstrumentedViewMixin, ReplicaReadMixin, ConditionalCatalogMixin, viewsets.ModelViewSet):
     """
     Handles CRUD operations for categories. Provides read-only access for unauthenticated users.
+    Categories form a tree (parent), ?category= on products includes the subcategories and
+    /api/categorys/tree/ returns the whole tree at once.
+    List, detail and tree responses carry ETag/Last-Modified and answer conditional GETs with 304.
+    GET requests read from the replicas when some are configured.
     """
-    authentication_classes = [JWTAuthentication]  # Token-based authentication using JWT
+    authentication_classes = [FastJWTAuthentication]  # Token-based authentication using JWT
     permission_classes = [IsAuthenticatedOrReadOnly]  # Unauthenticated users can only view categories
     serializer_class = CategorySerializer  # Serializer for converting category objects to/from JSON
     queryset = Category.objects.all().order_by('id')  # Fetch all categories
+    catalog_scope = "category"  # Only category writes change these responses
+    # Creating or moving a category reads the parent path, then writes the row and the subtree
+    query_budget = {"list": 2, "retrieve": 1, "tree": 1, "*": 6}
+    throttle_scope = "catalog"
 
     def get_queryset(self):
         """
         Return all categories. Additional filters can be added here if needed.
         """
-        return Category.objects.all().order_by('id')
\ No newline at end of file
+        return Category.objects.all().order_by('id')
+
+    @action(detail=False, methods=["get"], url_path="tree")
+    def tree(self, request):
+        """
+        The whole category tree in one response, nested children with their product counts
+        (subcategories included), built from one query and kept in the catalog cache until
+        the next category write or product count change.
+        """
+        return self._conditional(self._tree, request)
+
+    def _tree(self, request):
+        if not catalog_cache.enabled:
+            return Response(self.get_queryset().tree())
+        key = f"category-tree:{catalog_cache.version('category')}"
+        data = catalog_cache.get(key)
+        cache_status = "HIT"
+        if data is None:
+            data = self.get_queryset().tree()
+            catalog_cache.set(key, data)
+            cache_status = "MISS"
+        response = Response(data)
+        response["X-Cache"] = cache_status
+        return response
+
+
+# --------------------
+# SALES ANALYTICS
+# --------------------
+class SalesAnalyticsViewSet(InstrumentedViewMixin, viewsets.GenericViewSet):
+    """
+    Staff-only sales reports, served from the daily rollup tables and never from the orders
+    (see analytics.py), paginated:
+    GET /api/analytics/products/ units sold, revenue and orders per product per day.
+    GET /api/analytics/categories/ the same per category, ?category= sums a whole subtree.
+    ?start=&end= (dates, inclusive, the last 30 days by default), ?product=, ?category= and
+    ?totals=true (one row per product or category over the range) narrow the report.
+    Orders are counted by the outbox workers shortly after they are placed.
+    """
+    authentication_classes = [FastJWTAuthentication]
+    permission_classes = [IsAdminUser]
+    query_budget = 2  # The page and the count of the paginator
+
+    @action(detail=False, methods=["get"])
+    def products(self, request):
+        return self.report(product_sales, ProductSalesSerializer, request.query_params)
+
+    @action(detail=False, methods=["get"])
+    def categories(self, request):
+        return self.report(category_sales, CategorySalesSerializer, request.query_params, exclude=("product",))
+
+    def report(self, query, serializer_class, params, exclude=()):
+        params = SalesQuerySerializer(data=params)
+        params.is_valid(raise_exception=True)
+        filters = {name: value for name, value in params.validated_data.items() if name not in exclude}
+        page = self.paginate_queryset(query(**filters))
+        return self.get_paginated_response(serializer_class(page, many=True).data)
+
+
+# --------------------
+# OUTBOX METRICS
+# --------------------
+class OutboxMetricsView(InstrumentedViewMixin, APIView):
+    """
+    GET /api/outbox/metrics/ (staff only): depth and lag of the outbox queue, for monitoring
+    the workers (see outbox.outbox_metrics).
+    """
+    authentication_classes = [FastJWTAuthentication]
+    permission_classes = [IsAdminUser]
+    query_budget = 1  # One aggregate query
+
+    def get(self, request):
+        return Response(outbox_metrics())
+
+
+# --------------------
+# TOKEN VIEWS
+# --------------------
+class ThrottledTokenObtainPairView(TokenObtainPairView):
+    """
+    /api/token/ (login) with its own strict rate, per IP address, against credential stuffing.
+    """
+    throttle_scope = "token"
+
+
+class ThrottledTokenRefreshView(TokenRefreshView):
+    """
+    /api/token/refresh/ with the same rate as the login.
+    """
+    throttle_scope = "token"
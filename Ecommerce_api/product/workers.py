@@ -0,0 +1,230 @@
+import json
+import logging
+import queue
+import threading
+import time
+import uuid
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import DatabaseError, close_old_connections
+from django.db.models import F
+from django.utils import timezone
+
+from .models import OutboxEvent
+from .outbox import HANDLERS, outbox_metrics, outbox_settings, wakeup
+from .services import RetryPolicy, write_transaction
+
+# Same log stream as the outbox handlers
+logger = logging.getLogger("product.outbox")
+
+
+# --------------------
+# CLAIMING AND HANDLING
+# --------------------
+def claim_events(limit, now=None, retry_policy=None):
+    """
+    Take up to `limit` due pending events, oldest first, for OUTBOX["LEASE"] seconds.
+    One conditional UPDATE stamps the rows with a fresh claim token and pushes their
+    available_at past the lease, then one SELECT reads the rows holding the token. Workers
+    racing for the same rows cannot both win them (the UPDATE re-checks available_at), and
+    no row lock is held while the events are handled.
+    """
+    retry_policy = retry_policy or RetryPolicy.from_settings()
+    now = now or timezone.now()
+    lease = timedelta(seconds=outbox_settings().get("LEASE", 60))
+
+    def _claim():
+        token = uuid.uuid4().hex
+        with write_transaction():
+            due = OutboxEvent.objects.filter(status=OutboxEvent.PENDING, available_at__lte=now)
+            claimed = due.filter(pk__in=due.order_by("available_at", "id").values("pk")[:limit]).update(
+                claim=token, available_at=now + lease, attempts=F("attempts") + 1
+            )
+            if not claimed:
+                return []
+            return list(OutboxEvent.objects.filter(claim=token).order_by("available_at", "id"))
+
+    return retry_policy.run(_claim)
+
+
+def retry_delay(attempts):
+    """
+    Seconds before a failed event is tried again, doubling from OUTBOX["RETRY_BASE_DELAY"].
+    """
+    config = outbox_settings()
+    return min(config.get("RETRY_MAX_DELAY", 600.0), config.get("RETRY_BASE_DELAY", 2.0) * (2 ** (attempts - 1)))
+
+
+def handle_event(event, stats=None, retry_policy=None):
+    """
+    Run the handlers of the event, then delete it. The handlers and the delete share one
+    transaction, so their database writes happen once; anything outside the database (an
+    email) may be repeated. Lock contention is retried like an order placement. Any other
+    failure schedules the event again with backoff, and after OUTBOX["MAX_ATTEMPTS"] attempts
+    it is kept as dead. Returns True when the event was handled.
+    """
+    retry_policy = retry_policy or RetryPolicy.from_settings()
+    # Filtered on the claim: if the lease ran out and another worker took the event, the
+    # bookkeeping is left to that worker
+    claimed = OutboxEvent.objects.filter(pk=event.pk, claim=event.claim)
+
+    def _handle():
+        with write_transaction():
+            for handler in HANDLERS.get(event.topic, ()):
+                handler(event.payload)
+            claimed.delete()
+
+    try:
+        retry_policy.run(_handle)
+    except Exception as exc:
+        dead = event.attempts >= outbox_settings().get("MAX_ATTEMPTS", 8)
+        logger.exception("Outbox event %s (%s) failed, attempt %s", event.pk, event.topic, event.attempts)
+        retry_policy.run(
+            claimed.update,
+            status=OutboxEvent.DEAD if dead else OutboxEvent.PENDING,
+            available_at=timezone.now() + timedelta(seconds=retry_delay(event.attempts)),
+            last_error=f"{type(exc).__name__}: {exc}"[:2000],
+        )
+        if stats:
+            stats.record("dead" if dead else "retried")
+        return False
+    if stats:
+        stats.record("handled", lag=(timezone.now() - event.created_at).total_seconds())
+    return True
+
+
+def drain(now=None, batch_size=None):
+    """
+    Handle every due event in the calling thread, until none is left.
+    Returns the number of events handled (failed ones are not counted).
+    """
+    batch_size = batch_size or outbox_settings().get("BATCH_SIZE", 100)
+    handled = 0
+    while True:
+        events = claim_events(batch_size, now=now)
+        if not events:
+            return handled
+        handled += sum(handle_event(event) for event in events)
+
+
+# --------------------
+# WORKER POOL
+# --------------------
+class OutboxStats:
+    """
+    What one worker pool did since it started: events handled, retried and dead, and the
+    delay between an event being written and being handled (last and worst).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.clear()
+
+    def record(self, outcome, lag=None):
+        with self._lock:
+            self.counts[outcome] += 1
+            if lag is not None:
+                self.last_lag = lag
+                self.max_lag = max(self.max_lag, lag)
+
+    def as_dict(self):
+        with self._lock:
+            return {
+                "handled": self.counts["handled"],
+                "retried": self.counts["retried"],
+                "died": self.counts["dead"],
+                "last_handling_lag_s": round(self.last_lag, 3),
+                "max_handling_lag_s": round(self.max_lag, 3),
+            }
+
+    def clear(self):
+        self.counts = defaultdict(int)
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+
+
+class OutboxWorkerPool:
+    """
+    In-process job queue fed from the outbox table. A dispatcher thread claims due events
+    (keeping at most two per worker in memory, the rest stays claimable by other processes)
+    and puts them on a queue.Queue; `workers` threads take them off and run the handlers.
+    Idle, the dispatcher polls every OUTBOX["POLL_INTERVAL"] seconds, or at once when this
+    process commits new events. Any number of pools, in any number of processes, can share
+    the table: no broker is involved.
+    """
+
+    def __init__(self, workers=None, batch_size=None, poll_interval=None):
+        config = outbox_settings()
+        self.workers = workers or config.get("WORKERS", 4)
+        self.batch_size = batch_size or config.get("BATCH_SIZE", 100)
+        self.poll_interval = poll_interval or config.get("POLL_INTERVAL", 1.0)
+        self.metrics_interval = config.get("METRICS_INTERVAL", 60)
+        self.jobs = queue.Queue()
+        self.stats = OutboxStats()
+        self._stopped = threading.Event()
+        self._threads = []
+
+    def start(self):
+        self._threads = [
+            threading.Thread(target=self._work, name=f"outbox-worker-{index}", daemon=True)
+            for index in range(self.workers)
+        ]
+        self._threads.append(threading.Thread(target=self._dispatch, name="outbox-dispatcher", daemon=True))
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        """
+        Stop claiming, let the workers finish the events already claimed, and wait for them.
+        """
+        self._stopped.set()
+        wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def metrics(self):
+        """
+        The queue metrics of the table (outbox_metrics) with what this pool did and holds.
+        """
+        return {**outbox_metrics(), "in_memory": self.jobs.qsize(), **self.stats.as_dict()}
+
+    def _dispatch(self):
+        reported = time.monotonic()
+        while not self._stopped.is_set():
+            wakeup.clear()
+            claimed = 0
+            try:
+                room = self.workers * 2 - self.jobs.qsize()
+                if room > 0:
+                    for event in claim_events(min(room, self.batch_size)):
+                        self.jobs.put(event)
+                        claimed += 1
+                if time.monotonic() - reported >= self.metrics_interval:
+                    logger.info(json.dumps({"event": "outbox_metrics", **self.metrics()}))
+                    reported = time.monotonic()
+            except DatabaseError:
+                logger.exception("Outbox dispatch failed, retrying in %s seconds", self.poll_interval)
+            finally:
+                close_old_connections()
+            if not claimed:
+                wakeup.wait(self.poll_interval)
+            elif self.jobs.qsize() >= self.workers * 2:
+                time.sleep(0.01)  # Every worker is busy, let them catch up
+
+    def _work(self):
+        while True:
+            try:
+                event = self.jobs.get(timeout=self.poll_interval)
+            except queue.Empty:
+                if self._stopped.is_set():
+                    return
+                continue
+            try:
+                handle_event(event, self.stats)
+            except DatabaseError:
+                # Even the failure could not be written down, the lease brings the event back
+                logger.exception("Outbox event %s could not be updated", event.pk)
+            finally:
+                close_old_connections()